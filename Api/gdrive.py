@@ -1,39 +1,258 @@
+import hashlib
 import json
 import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import requests
 from jose import jwt
+from requests.adapters import HTTPAdapter
+
+DRIVE_FILES_URL = "https://www.googleapis.com/drive/v3/files"
+DRIVE_UPLOAD_URL = "https://www.googleapis.com/upload/drive/v3/files"
+
+# Status que valem nova tentativa (limite de taxa e erros do servidor)
+RETRY_STATUS = {429, 500, 502, 503, 504}
+FOLDER_MIME = "application/vnd.google-apps.folder"
+
+
+# --- Cliente HTTP compartilhado ---
+class BaseDriveClient:
+    """
+    Política comum aos clientes do Drive (síncrono e assíncrono): timeouts,
+    nova tentativa com backoff exponencial limitado em 429/5xx e métricas de
+    latência por operação.
+    """
+
+    def __init__(
+        self,
+        timeout: float = 30.0,
+        connect_timeout: float = 5.0,
+        max_retries: int = 4,
+        backoff: float = 0.5,
+        max_backoff: float = 8.0,
+    ):
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _should_retry(self, status_code: int, attempt: int) -> bool:
+        return status_code in RETRY_STATUS and attempt < self.max_retries
+
+    def _delay(self, attempt: int, retry_after: str = None) -> float:
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.max_backoff)
+        delay = min(self.backoff * (2**attempt), self.max_backoff)
+        return delay * (0.5 + random.random() / 2)
+
+    def _record(
+        self, operation: str, elapsed: float, error: bool = False, retry: bool = False
+    ):
+        with self._lock:
+            m = self._metrics.setdefault(
+                operation,
+                {"calls": 0, "errors": 0, "retries": 0, "total_ms": 0.0, "max_ms": 0.0},
+            )
+            m["calls"] += 1
+            m["errors"] += int(error)
+            m["retries"] += int(retry)
+            m["total_ms"] += elapsed * 1000
+            m["max_ms"] = max(m["max_ms"], elapsed * 1000)
+
+    def stats(self) -> dict:
+        """Métricas por operação: chamadas, erros, retentativas e latência."""
+        with self._lock:
+            return {
+                op: {**m, "avg_ms": m["total_ms"] / m["calls"] if m["calls"] else 0}
+                for op, m in self._metrics.items()
+            }
+
+
+class DriveClient(BaseDriveClient):
+    """
+    Cliente síncrono do Google Drive com sessão HTTP compartilhada (keep-alive
+    e pool de conexões).
+    """
+
+    def __init__(self, pool_size: int = 20, **kwargs):
+        super().__init__(**kwargs)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+
+    def request(
+        self, method: str, url: str, access_token: str, operation: str = None, **kwargs
+    ) -> requests.Response:
+        headers = kwargs.pop("headers", {})
+        headers["Authorization"] = f"Bearer {access_token}"
+        kwargs.setdefault("timeout", (self.connect_timeout, self.timeout))
+        operation = operation or method
+
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+            try:
+                r = self.session.request(method, url, headers=headers, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                self._record(operation, time.perf_counter() - start, error=True)
+                # Um POST pode ter chegado ao Drive: não repetimos para não duplicar
+                if attempt == self.max_retries or method == "POST":
+                    raise
+                time.sleep(self._delay(attempt))
+                continue
+
+            self._record(
+                operation,
+                time.perf_counter() - start,
+                error=r.status_code >= 400,
+                retry=attempt > 0,
+            )
+            if not self._should_retry(r.status_code, attempt):
+                return r
+            time.sleep(self._delay(attempt, r.headers.get("Retry-After")))
+        return r
+
+    def get(self, url: str, access_token: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, access_token, **kwargs)
+
+    def post(self, url: str, access_token: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, access_token, **kwargs)
+
+    def patch(self, url: str, access_token: str, **kwargs) -> requests.Response:
+        return self.request("PATCH", url, access_token, **kwargs)
+
+
+# Instância única usada por todos os helpers (e, através deles, pelas rotas)
+drive = DriveClient(
+    timeout=float(os.getenv("DRIVE_TIMEOUT", "30")),
+    max_retries=int(os.getenv("DRIVE_MAX_RETRIES", "4")),
+)
+
+
+# --- Cache de IDs de pastas ---
+class FolderPathCache:
+    """
+    Cache por usuário de caminho de pastas (tupla de nomes) -> ID no Drive,
+    com TTL. Evita uma busca por segmento a cada chamada de ensure_path.
+    """
+
+    def __init__(self, ttl: float = 600.0):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_key: str, path: tuple):
+        with self._lock:
+            entry = self._entries.get((user_key, path))
+            if not entry:
+                return None
+            folder_id, expires = entry
+            if expires < time.monotonic():
+                del self._entries[(user_key, path)]
+                return None
+            return folder_id
+
+    def put(self, user_key: str, path: tuple, folder_id: str):
+        with self._lock:
+            self._entries[(user_key, path)] = (folder_id, time.monotonic() + self.ttl)
+
+    def invalidate_id(self, folder_id: str):
+        """Remove a pasta e todos os caminhos abaixo dela (ex: após um 404)."""
+        with self._lock:
+            stale = [
+                (user_key, path)
+                for (user_key, path), (cached_id, _) in self._entries.items()
+                if cached_id == folder_id
+            ]
+            for user_key, path in stale:
+                for key in list(self._entries):
+                    if key[0] == user_key and key[1][: len(path)] == path:
+                        del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+folder_cache = FolderPathCache(ttl=float(os.getenv("DRIVE_FOLDER_CACHE_TTL", "600")))
+
+# Hash do token -> email do usuário, preenchido quando o JWT é decodificado
+_user_emails = {}
+MAX_KNOWN_TOKENS = 10000
+
+
+def register_user(access_token: str, email: str):
+    """Associa o token ao email, para que o cache sobreviva à troca de token."""
+    if not access_token or not email:
+        return
+    if len(_user_emails) > MAX_KNOWN_TOKENS:
+        _user_emails.clear()
+    _user_emails[_token_hash(access_token)] = email
+
+
+def user_cache_key(access_token: str) -> str:
+    """Chave do usuário nos caches: o email, se conhecido, ou o hash do token."""
+    token_hash = _token_hash(access_token)
+    return _user_emails.get(token_hash, token_hash)
+
+
+def _token_hash(access_token: str) -> str:
+    return hashlib.sha256((access_token or "").encode("utf-8")).hexdigest()[:32]
+
+
+def _check_not_found(r, folder_id: str):
+    # Pasta em cache que não existe mais: esquece o ID para resolver de novo
+    if r.status_code == 404 and folder_id:
+        folder_cache.invalidate_id(folder_id)
 
 
 # --- Helpers de Navegação ---
-def find_file_by_name(
+def find_file_metadata(
     access_token: str, filename: str, parent_id: str = None, mime_type: str = None
 ):
-    """Busca um arquivo pelo nome, opcionalmente dentro de uma pasta específica."""
-    url = "https://www.googleapis.com/drive/v3/files"
-
+    """
+    Busca um arquivo pelo nome e retorna seus metadados
+    (id, name, mimeType, modifiedTime, md5Checksum, size) ou None.
+    """
     q = f"name = '{filename}' and trashed = false"
     if parent_id:
         q += f" and '{parent_id}' in parents"
     if mime_type:
         q += f" and mimeType = '{mime_type}'"
 
-    params = {"q": q, "fields": "files(id, name, mimeType)", "pageSize": 1}
-    headers = {"Authorization": f"Bearer {access_token}"}
-    r = requests.get(url, headers=headers, params=params)
+    params = {
+        "q": q,
+        "fields": "files(id, name, mimeType, modifiedTime, md5Checksum, size)",
+        "pageSize": 1,
+    }
+    r = drive.get(DRIVE_FILES_URL, access_token, operation="find", params=params)
+    _check_not_found(r, parent_id)
     files = r.json().get("files", [])
-    return files[0]["id"] if files else None
+    return files[0] if files else None
+
+
+def find_file_by_name(
+    access_token: str, filename: str, parent_id: str = None, mime_type: str = None
+):
+    """Busca um arquivo pelo nome, opcionalmente dentro de uma pasta específica."""
+    file = find_file_metadata(access_token, filename, parent_id, mime_type)
+    return file["id"] if file else None
 
 
 def create_folder(access_token: str, folder_name: str, parent_id: str = None):
     """Cria uma pasta e retorna o ID."""
-    url = "https://www.googleapis.com/drive/v3/files"
     metadata = {"name": folder_name, "mimeType": "application/vnd.google-apps.folder"}
     if parent_id:
         metadata["parents"] = [parent_id]
 
-    headers = {"Authorization": f"Bearer {access_token}"}
-    r = requests.post(url, headers=headers, json=metadata)
+    r = drive.post(DRIVE_FILES_URL, access_token, operation="create", json=metadata)
+    _check_not_found(r, parent_id)
     return r.json().get("id")
 
 
@@ -51,53 +270,157 @@ def ensure_path(access_token: str, path_list: list):
     """
     Garante que uma estrutura de pastas exista e retorna o ID da última pasta.
     Ex: ensure_path(token, ["JSONs_and_Dragons", "Characters"])
+    Os IDs resolvidos ficam em cache por usuário (folder_cache).
     """
+    user_key = user_cache_key(access_token)
+    path = tuple(path_list)
+
+    # Parte do maior prefixo do caminho que já está em cache
     parent_id = None
-    for folder in path_list:
+    start = 0
+    for i in range(len(path), 0, -1):
+        cached_id = folder_cache.get(user_key, path[:i])
+        if cached_id:
+            parent_id, start = cached_id, i
+            break
+
+    for i in range(start, len(path)):
+        folder = path[i]
         found_id = find_file_by_name(
             access_token, folder, parent_id, "application/vnd.google-apps.folder"
         )
         if not found_id:
             found_id = create_folder(access_token, folder, parent_id)
+        if found_id:
+            folder_cache.put(user_key, path[: i + 1], found_id)
         parent_id = found_id
     return parent_id
 
 
 def list_folders_in_parent(access_token: str, parent_id: str):
     """Lista todas as pastas dentro de um pai (usado para pegar IDs dos personagens)."""
-    url = "https://www.googleapis.com/drive/v3/files"
     q = f"'{parent_id}' in parents and mimeType = 'application/vnd.google-apps.folder' and trashed = false"
     params = {"q": q, "fields": "files(id, name)"}
-    headers = {"Authorization": f"Bearer {access_token}"}
-    r = requests.get(url, headers=headers, params=params)
+    r = drive.get(DRIVE_FILES_URL, access_token, operation="list", params=params)
+    _check_not_found(r, parent_id)
     return r.json().get("files", [])
 
 
+def list_folder_files(access_token: str, parent_id: str) -> dict:
+    """
+    Lista de uma vez (com paginação) tudo o que está dentro de uma pasta.
+    Retorna {nome: {id, mimeType, modifiedTime, md5Checksum, size}}.
+    """
+    q = f"'{parent_id}' in parents and trashed = false"
+    params = {
+        "q": q,
+        "fields": "nextPageToken, files(id, name, mimeType, modifiedTime, md5Checksum, size)",
+        "pageSize": 1000,
+    }
+
+    files = {}
+    while True:
+        r = drive.get(DRIVE_FILES_URL, access_token, operation="list", params=params)
+        _check_not_found(r, parent_id)
+        payload = r.json()
+        for file in payload.get("files", []):
+            # Com nomes repetidos, mantém o primeiro (como o find_file_by_name)
+            files.setdefault(file["name"], file)
+        page_token = payload.get("nextPageToken")
+        if not page_token:
+            return files
+        params = {**params, "pageToken": page_token}
+
+
 # --- Upload e Download ---
+def content_md5(content) -> str:
+    """md5 do conteúdo como o Drive calcula (md5Checksum), para str ou bytes."""
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    return hashlib.md5(content).hexdigest()
+
+
+def unchanged_upload(existing: dict | None, content) -> dict | None:
+    """
+    Resultado de um upload pulado se o arquivo no Drive (`existing`, vindo de
+    uma busca ou listagem com md5Checksum) já tem exatamente este conteúdo.
+    """
+    if not existing or existing.get("md5Checksum") != content_md5(content):
+        return None
+    size = len(content.encode("utf-8") if isinstance(content, str) else content)
+    return {
+        "status": "unchanged",
+        "file_id": existing["id"],
+        "uploaded_bytes": 0,
+        "skipped_bytes": size,
+    }
+
+
 def upload_or_update(
     access_token: str, filename: str, content: str, parent_id: str = None
 ):
-    """Faz upload de um arquivo JSON ou atualiza se já existir."""
-    file_id = find_file_by_name(access_token, filename, parent_id)
+    """
+    Faz upload de um arquivo JSON ou atualiza se já existir. Conteúdo
+    idêntico ao do Drive não é reenviado.
+    """
+    existing = find_file_metadata(access_token, filename, parent_id)
+    return upload_content(access_token, filename, content, parent_id, existing)
+
+
+def upload_content(
+    access_token: str,
+    filename: str,
+    content: str | bytes,
+    parent_id: str = None,
+    existing: dict = None,
+):
+    """
+    Envia o conteúdo sem procurar o arquivo antes: atualiza `existing`
+    (metadados de uma listagem) se informado ou cria o arquivo em
+    `parent_id`. Para quem já listou a pasta. O resultado informa os bytes
+    enviados e os pulados (arquivo já igual no Drive).
+    """
+    skipped = unchanged_upload(existing, content)
+    if skipped:
+        return skipped
+
+    file_id = existing["id"] if existing else None
     metadata = {"name": filename, "mimeType": "application/json"}
 
     if not file_id and parent_id:
         metadata["parents"] = [parent_id]
 
+    if isinstance(content, str):
+        content = content.encode("utf-8")
     files = {
         "metadata": ("metadata.json", json.dumps(metadata), "application/json"),
         "file": (filename, content, "application/json"),
     }
-    headers = {"Authorization": f"Bearer {access_token}"}
+    params = {"uploadType": "multipart"}
+    sizes = {"uploaded_bytes": len(content), "skipped_bytes": 0}
 
     if file_id:
-        url = f"https://www.googleapis.com/upload/drive/v3/files/{file_id}?uploadType=multipart"
-        r = requests.patch(url, headers=headers, files=files)
-        return {"status": "updated", "file_id": file_id, "google": r.json()}
+        url = f"{DRIVE_UPLOAD_URL}/{file_id}"
+        r = drive.patch(
+            url, access_token, operation="upload", params=params, files=files
+        )
+        return {"status": "updated", "file_id": file_id, "google": r.json(), **sizes}
     else:
-        url = "https://www.googleapis.com/upload/drive/v3/files?uploadType=multipart"
-        r = requests.post(url, headers=headers, files=files)
-        return {"status": "created", "google": r.json()}
+        r = drive.post(
+            DRIVE_UPLOAD_URL,
+            access_token,
+            operation="upload",
+            params=params,
+            files=files,
+        )
+        _check_not_found(r, parent_id)
+        google = r.json()
+        return {
+            "status": "created",
+            "file_id": google.get("id"),
+            "google": google,
+            **sizes,
+        }
 
 
 def get_file_content(
@@ -114,9 +437,8 @@ def get_file_content(
         print(f"Erro: Arquivo '{filename}' não encontrado no Drive.")
         return None
 
-    url = f"https://www.googleapis.com/drive/v3/files/{target_id}?alt=media"
-    headers = {"Authorization": f"Bearer {access_token}"}
-    r = requests.get(url, headers=headers)
+    url = f"{DRIVE_FILES_URL}/{target_id}"
+    r = drive.get(url, access_token, operation="download", params={"alt": "media"})
 
     if r.status_code == 200:
         try:
@@ -130,44 +452,181 @@ def get_file_content(
 
 
 # --- Funções de Setup ---
-def upload_specific_folders(access_token: str, local_bd_path: str, drive_bd_id: str):
+# Módulos oficiais copiados para o Drive do usuário no primeiro login
+SETUP_FOLDERS = ["dnd_2014", "tasha_cauldron", "xanatar_guide"]
+# Quantos uploads rodam ao mesmo tempo no envio em lote
+UPLOAD_CONCURRENCY = int(os.getenv("DRIVE_UPLOAD_CONCURRENCY", "8"))
+
+# Progresso do setup em segundo plano, por usuário (ver setup_status)
+_setup_jobs = {}
+_setup_lock = threading.Lock()
+
+
+def _plan_folder_upload(
+    access_token: str, local_folder: str, drive_folder_id: str
+) -> list:
     """
-    Envia apenas pastas específicas do BD local para o Google Drive.
+    Percorre a pasta local e resolve o destino de cada arquivo com uma
+    listagem por pasta do Drive, criando só as subpastas que faltam.
+    Retorna [(caminho_local, nome, id_da_pasta, metadados_no_drive_ou_None)].
     """
+    uploads = []
+    pending = [(local_folder, drive_folder_id)]
+    while pending:
+        local_dir, folder_id = pending.pop()
+        existing = list_folder_files(access_token, folder_id)
+        for entry in sorted(os.scandir(local_dir), key=lambda e: e.name):
+            found = existing.get(entry.name)
+            if entry.is_dir():
+                if found and found.get("mimeType") == FOLDER_MIME:
+                    sub_id = found["id"]
+                else:
+                    sub_id = create_folder(access_token, entry.name, folder_id)
+                pending.append((entry.path, sub_id))
+            else:
+                uploads.append((entry.path, entry.name, folder_id, found))
+    return uploads
+
+
+def _upload_local_file(
+    access_token: str, local_path: str, filename: str, parent_id: str, existing: dict
+):
+    with open(local_path, "rb") as f:
+        content = f.read()
+    return upload_content(access_token, filename, content, parent_id, existing)
+
 
-    folders_to_upload = ["dnd_2014", "tasha_cauldron", "xanatar_guide"]
+def upload_many(access_token: str, uploads: list, progress=None) -> dict:
+    """
+    Envia em paralelo (até UPLOAD_CONCURRENCY ao mesmo tempo) os arquivos
+    planejados por _plan_folder_upload. `progress(nome, erro)` é chamado a
+    cada arquivo concluído. Retorna {"uploaded", "skipped", "uploaded_bytes",
+    "skipped_bytes", "errors"}; arquivos já iguais no Drive contam como
+    pulados.
+    """
+    totals = {"uploaded": 0, "skipped": 0, "uploaded_bytes": 0, "skipped_bytes": 0}
+    errors = []
+    with ThreadPoolExecutor(max_workers=UPLOAD_CONCURRENCY) as pool:
+        futures = {
+            pool.submit(_upload_local_file, access_token, *upload): upload
+            for upload in uploads
+        }
+        for future in as_completed(futures):
+            local_path = futures[future][0]
+            try:
+                result = future.result()
+                totals[
+                    "skipped" if result["status"] == "unchanged" else "uploaded"
+                ] += 1
+                totals["uploaded_bytes"] += result["uploaded_bytes"]
+                totals["skipped_bytes"] += result["skipped_bytes"]
+                error = None
+            except Exception as e:
+                error = f"{local_path}: {e}"
+                errors.append(error)
+            if progress:
+                progress(local_path, error)
+    return {**totals, "errors": errors}
+
+
+def upload_specific_folders(
+    access_token: str, local_bd_path: str, drive_bd_id: str, progress=None
+) -> dict:
+    """
+    Envia o metadata.json e apenas as pastas específicas do BD local para o
+    Google Drive. Cada pasta do Drive é listada uma vez (em vez de uma busca
+    por arquivo) e os arquivos sobem em paralelo.
+    """
+    bd_entries = list_folder_files(access_token, drive_bd_id)
+
+    uploads = []
+    metadata_path = os.path.join(local_bd_path, "metadata.json")
+    if os.path.exists(metadata_path):
+        uploads.append(
+            (
+                metadata_path,
+                "metadata.json",
+                drive_bd_id,
+                bd_entries.get("metadata.json"),
+            )
+        )
 
-    for folder_name in folders_to_upload:
+    for folder_name in SETUP_FOLDERS:
         local_folder_path = os.path.join(local_bd_path, folder_name)
         if not os.path.exists(local_folder_path):
             continue
 
-        drive_folder_id = find_or_create_folder(
-            access_token, folder_name, parent_id=drive_bd_id
-        )
+        found = bd_entries.get(folder_name)
+        if found and found.get("mimeType") == FOLDER_MIME:
+            drive_folder_id = found["id"]
+        else:
+            drive_folder_id = create_folder(access_token, folder_name, drive_bd_id)
+        uploads += _plan_folder_upload(access_token, local_folder_path, drive_folder_id)
 
-        for root, dirs, files in os.walk(local_folder_path):
-            rel_path = os.path.relpath(root, local_folder_path)
-            current_parent_id = drive_folder_id
+    if progress:
+        progress(None, None, total=len(uploads))
+    return upload_many(access_token, uploads, progress)
 
-            if rel_path != ".":
-                for subfolder in rel_path.split(os.sep):
-                    current_parent_id = find_or_create_folder(
-                        access_token, subfolder, parent_id=current_parent_id
-                    )
 
-            for file in files:
-                file_path = os.path.join(root, file)
-                with open(file_path, "r", encoding="utf-8") as f:
-                    content = f.read()
-                upload_or_update(access_token, file, content, current_parent_id)
+def setup_status(access_token: str) -> dict | None:
+    """Progresso do último setup do usuário (None se nenhum foi iniciado)."""
+    with _setup_lock:
+        job = _setup_jobs.get(user_cache_key(access_token))
+        return {**job, "errors": list(job["errors"])} if job else None
 
 
-def setup_drive_structure(access_token: str):
+def _claim_setup_job(access_token: str) -> dict | None:
+    """
+    Registra um setup novo para o usuário. Retorna None se já houver um em
+    andamento: o progresso dele continua em setup_status.
+    """
+    key = user_cache_key(access_token)
+    with _setup_lock:
+        running = _setup_jobs.get(key)
+        if running and running["state"] == "running":
+            return None
+        job = {"state": "running", "total": None, "done": 0, "errors": []}
+        _setup_jobs[key] = job
+        return job
+
+
+def _run_setup_job(
+    access_token: str, local_bd_path: str, bd_id: str, job: dict | None = None
+):
+    """Envia o BD registrando o progresso em _setup_jobs."""
+    if job is None:
+        job = _claim_setup_job(access_token)
+        if job is None:
+            return
+
+    def progress(local_path, error, total=None):
+        with _setup_lock:
+            if total is not None:
+                job["total"] = total
+                return
+            job["done"] += 1
+            if error:
+                job["errors"].append(error)
+
+    try:
+        upload_specific_folders(access_token, local_bd_path, bd_id, progress)
+        state, error = "done", None
+    except Exception as e:
+        print(f"Erro no setup do Drive: {e}")
+        state, error = "error", str(e)
+    with _setup_lock:
+        job["state"] = state
+        if error:
+            job["errors"].append(error)
+
+
+def setup_drive_structure(access_token: str, background: bool = False):
     """
     Cria pasta raiz e subpastas principais.
     Copia o BD local para o Drive apenas se a pasta BD ainda não existir.
     Inclui o upload do metadata.json do BD.
+    Com `background`, a cópia roda em uma thread depois do retorno e o
+    progresso fica disponível em setup_status.
     """
     root_id = find_or_create_folder(access_token, "JSONs_and_Dragons")
 
@@ -178,22 +637,24 @@ def setup_drive_structure(access_token: str):
     ROOT_DIR = os.path.abspath(os.path.join(ROOT_DIR, ".."))
     local_bd_path = os.path.join(ROOT_DIR, "BD")
 
-    url = "https://www.googleapis.com/drive/v3/files"
-    headers = {"Authorization": f"Bearer {access_token}"}
     params = {
         "q": f"name='BD' and '{root_id}' in parents and trashed=false",
         "fields": "files(id, name)",
     }
-    r = requests.get(url, headers=headers, params=params)
+    r = drive.get(DRIVE_FILES_URL, access_token, operation="list", params=params)
     files = r.json().get("files", [])
 
     if files and len(files) == 1:
-        metadata_path = os.path.join(local_bd_path, "metadata.json")
-        if os.path.exists(metadata_path):
-            with open(metadata_path, "r", encoding="utf-8") as f:
-                metadata_content = f.read()
-            upload_or_update(access_token, "metadata.json", metadata_content, bd_id)
-
-        upload_specific_folders(access_token, local_bd_path, bd_id)
+        if background:
+            # Registrado antes da thread: logins seguidos não enviam o BD duas vezes
+            job = _claim_setup_job(access_token)
+            if job is not None:
+                threading.Thread(
+                    target=_run_setup_job,
+                    args=(access_token, local_bd_path, bd_id, job),
+                    daemon=True,
+                ).start()
+        else:
+            upload_specific_folders(access_token, local_bd_path, bd_id)
 
     return {"root": root_id, "bd": bd_id, "characters": char_id}
@@ -0,0 +1,301 @@
+import asyncio
+import json
+import os
+import time
+
+import httpx
+
+from Api.gdrive import (
+    DRIVE_FILES_URL,
+    DRIVE_UPLOAD_URL,
+    BaseDriveClient,
+    _check_not_found,
+    folder_cache,
+    unchanged_upload,
+    user_cache_key,
+)
+
+FOLDER_MIME = "application/vnd.google-apps.folder"
+
+
+# --- Cliente HTTP assíncrono ---
+class AsyncDriveClient(BaseDriveClient):
+    """
+    Versão assíncrona do DriveClient (httpx.AsyncClient), com a mesma política
+    de timeouts, retentativas e métricas.
+    """
+
+    def __init__(self, max_connections: int = 100, **kwargs):
+        super().__init__(**kwargs)
+        self.max_connections = max_connections
+        # Um cliente por event loop: o pool de conexões do httpx fica preso
+        # ao loop que o criou
+        self._clients = {}
+
+    async def _get_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            # Consulta e troca sem await no meio: duas corrotinas chegando
+            # juntas usam o mesmo cliente
+            client = self._clients[loop] = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=20,
+                ),
+            )
+            # Só depois da troca: fecha os clientes de loops já encerrados
+            for other in [other for other in list(self._clients) if other.is_closed()]:
+                await self._close(self._clients.pop(other, None))
+        return client
+
+    async def aclose(self):
+        """Fecha os clientes HTTP (fim da aplicação)."""
+        while self._clients:
+            await self._close(self._clients.popitem()[1])
+
+    @staticmethod
+    async def _close(client: httpx.AsyncClient | None):
+        if client is None:
+            return
+        try:
+            await client.aclose()
+        except RuntimeError:
+            # As conexões eram de um loop já encerrado: não há o que fechar nele
+            pass
+
+    async def request(
+        self, method: str, url: str, access_token: str, operation: str = None, **kwargs
+    ) -> httpx.Response:
+        headers = kwargs.pop("headers", {})
+        headers["Authorization"] = f"Bearer {access_token}"
+        operation = operation or method
+        client = await self._get_client()
+
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+            try:
+                r = await client.request(method, url, headers=headers, **kwargs)
+            except httpx.TransportError:
+                self._record(operation, time.perf_counter() - start, error=True)
+                # Um POST pode ter chegado ao Drive: não repetimos para não duplicar
+                if attempt == self.max_retries or method == "POST":
+                    raise
+                await asyncio.sleep(self._delay(attempt))
+                continue
+
+            self._record(
+                operation,
+                time.perf_counter() - start,
+                error=r.status_code >= 400,
+                retry=attempt > 0,
+            )
+            if not self._should_retry(r.status_code, attempt):
+                return r
+            await asyncio.sleep(self._delay(attempt, r.headers.get("Retry-After")))
+        return r
+
+    async def get(self, url: str, access_token: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, access_token, **kwargs)
+
+    async def post(self, url: str, access_token: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, access_token, **kwargs)
+
+    async def patch(self, url: str, access_token: str, **kwargs) -> httpx.Response:
+        return await self.request("PATCH", url, access_token, **kwargs)
+
+
+drive = AsyncDriveClient(
+    timeout=float(os.getenv("DRIVE_TIMEOUT", "30")),
+    max_retries=int(os.getenv("DRIVE_MAX_RETRIES", "4")),
+)
+
+
+# --- Helpers de Navegação ---
+async def find_file_metadata(
+    access_token: str, filename: str, parent_id: str = None, mime_type: str = None
+):
+    """Versão assíncrona de gdrive.find_file_metadata."""
+    q = f"name = '{filename}' and trashed = false"
+    if parent_id:
+        q += f" and '{parent_id}' in parents"
+    if mime_type:
+        q += f" and mimeType = '{mime_type}'"
+
+    params = {
+        "q": q,
+        "fields": "files(id, name, mimeType, modifiedTime, md5Checksum, size)",
+        "pageSize": 1,
+    }
+    r = await drive.get(DRIVE_FILES_URL, access_token, operation="find", params=params)
+    _check_not_found(r, parent_id)
+    files = r.json().get("files", [])
+    return files[0] if files else None
+
+
+async def find_file_by_name(
+    access_token: str, filename: str, parent_id: str = None, mime_type: str = None
+):
+    file = await find_file_metadata(access_token, filename, parent_id, mime_type)
+    return file["id"] if file else None
+
+
+async def create_folder(access_token: str, folder_name: str, parent_id: str = None):
+    metadata = {"name": folder_name, "mimeType": FOLDER_MIME}
+    if parent_id:
+        metadata["parents"] = [parent_id]
+
+    r = await drive.post(
+        DRIVE_FILES_URL, access_token, operation="create", json=metadata
+    )
+    _check_not_found(r, parent_id)
+    return r.json().get("id")
+
+
+async def find_or_create_folder(
+    access_token: str, folder_name: str, parent_id: str = None
+):
+    folder_id = await find_file_by_name(
+        access_token, folder_name, parent_id, FOLDER_MIME
+    )
+    if folder_id:
+        return folder_id
+    return await create_folder(access_token, folder_name, parent_id)
+
+
+async def ensure_path(access_token: str, path_list: list):
+    """Versão assíncrona de gdrive.ensure_path (usa o mesmo cache de pastas)."""
+    user_key = user_cache_key(access_token)
+    path = tuple(path_list)
+
+    parent_id = None
+    start = 0
+    for i in range(len(path), 0, -1):
+        cached_id = folder_cache.get(user_key, path[:i])
+        if cached_id:
+            parent_id, start = cached_id, i
+            break
+
+    for i in range(start, len(path)):
+        found_id = await find_or_create_folder(access_token, path[i], parent_id)
+        if found_id:
+            folder_cache.put(user_key, path[: i + 1], found_id)
+        parent_id = found_id
+    return parent_id
+
+
+async def list_folders_in_parent(access_token: str, parent_id: str):
+    q = f"'{parent_id}' in parents and mimeType = '{FOLDER_MIME}' and trashed = false"
+    params = {"q": q, "fields": "files(id, name)"}
+    r = await drive.get(DRIVE_FILES_URL, access_token, operation="list", params=params)
+    _check_not_found(r, parent_id)
+    return r.json().get("files", [])
+
+
+async def list_folder_files(access_token: str, parent_id: str) -> dict:
+    """Versão assíncrona de gdrive.list_folder_files."""
+    q = f"'{parent_id}' in parents and trashed = false"
+    params = {
+        "q": q,
+        "fields": "nextPageToken, files(id, name, mimeType, modifiedTime, md5Checksum, size)",
+        "pageSize": 1000,
+    }
+
+    files = {}
+    while True:
+        r = await drive.get(
+            DRIVE_FILES_URL, access_token, operation="list", params=params
+        )
+        _check_not_found(r, parent_id)
+        payload = r.json()
+        for file in payload.get("files", []):
+            files.setdefault(file["name"], file)
+        page_token = payload.get("nextPageToken")
+        if not page_token:
+            return files
+        params = {**params, "pageToken": page_token}
+
+
+# --- Upload e Download ---
+async def upload_or_update(
+    access_token: str, filename: str, content: str, parent_id: str = None
+):
+    """Versão assíncrona de gdrive.upload_or_update."""
+    existing = await find_file_metadata(access_token, filename, parent_id)
+    return await upload_content(access_token, filename, content, parent_id, existing)
+
+
+async def upload_content(
+    access_token: str,
+    filename: str,
+    content: str | bytes,
+    parent_id: str = None,
+    existing: dict = None,
+):
+    """Versão assíncrona de gdrive.upload_content."""
+    skipped = unchanged_upload(existing, content)
+    if skipped:
+        return skipped
+
+    file_id = existing["id"] if existing else None
+    metadata = {"name": filename, "mimeType": "application/json"}
+
+    if not file_id and parent_id:
+        metadata["parents"] = [parent_id]
+
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    files = {
+        "metadata": ("metadata.json", json.dumps(metadata), "application/json"),
+        "file": (filename, content, "application/json"),
+    }
+    params = {"uploadType": "multipart"}
+    sizes = {"uploaded_bytes": len(content), "skipped_bytes": 0}
+
+    if file_id:
+        r = await drive.patch(
+            f"{DRIVE_UPLOAD_URL}/{file_id}",
+            access_token,
+            operation="upload",
+            params=params,
+            files=files,
+        )
+        return {"status": "updated", "file_id": file_id, "google": r.json(), **sizes}
+
+    r = await drive.post(
+        DRIVE_UPLOAD_URL, access_token, operation="upload", params=params, files=files
+    )
+    _check_not_found(r, parent_id)
+    google = r.json()
+    return {"status": "created", "file_id": google.get("id"), "google": google, **sizes}
+
+
+async def get_file_content(
+    access_token: str, file_id: str = None, filename: str = None, parent_id: str = None
+):
+    """Versão assíncrona de gdrive.get_file_content."""
+    target_id = file_id
+    if not target_id and filename:
+        target_id = await find_file_by_name(access_token, filename, parent_id)
+
+    if not target_id:
+        print(f"Erro: Arquivo '{filename}' não encontrado no Drive.")
+        return None
+
+    r = await drive.get(
+        f"{DRIVE_FILES_URL}/{target_id}",
+        access_token,
+        operation="download",
+        params={"alt": "media"},
+    )
+
+    if r.status_code == 200:
+        try:
+            return r.json()
+        except json.JSONDecodeError:
+            return r.text
+    else:
+        print(f"Erro ao baixar '{filename or target_id}': Status {r.status_code}")
+        print(f"Detalhe do erro: {r.text}")
+        return None
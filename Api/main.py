@@ -1,16 +1,26 @@
 import os
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
 
+from Api.gdrive_async import drive
 from Api.routes.auth import router as auth_router
 from Api.routes.criar_ficha import router_ficha
 from Api.routes.dados_base import router as base_router
 from Api.routes.homebrew import router_homebrew
 from Api.routes.pegar_ficha import router_coleta_ficha
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Fecha o pool de conexões do cliente assíncrono do Drive
+    await drive.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
 
 origins = [
     "http://localhost:4200",
@@ -5,11 +5,18 @@ from datetime import datetime, timedelta
 
 from authlib.integrations.starlette_client import OAuth
 from dotenv import load_dotenv
-from fastapi import APIRouter, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import RedirectResponse
 from jose import jwt
 
-from Api.gdrive import find_file_by_name, setup_drive_structure, upload_or_update
+from Api.gdrive import (
+    find_file_by_name,
+    register_user,
+    setup_drive_structure,
+    setup_status,
+    upload_or_update,
+)
+from Api.routes.criar_ficha import get_access_token, obter_token_auth
 
 load_dotenv()
 
@@ -111,9 +118,11 @@ async def callback(request: Request):
                 status_code=400, detail="Failed to fetch user info from Google"
             )
 
-        # Configura a estrutura inicial do Drive
+        # Configura a estrutura inicial do Drive. As pastas são criadas agora;
+        # a cópia do BD roda em segundo plano (ver /auth/setup/status)
         if access_token:
-            pastas_ids = setup_drive_structure(access_token)
+            register_user(access_token, user_info["email"])
+            pastas_ids = setup_drive_structure(access_token, background=True)
 
         jwt_token = jwt.encode(
             {
@@ -158,3 +167,13 @@ async def callback(request: Request):
         _, frontend_base = detect_environment(request)
         error_url = f"{frontend_base}/login-error?error={str(e)}"
         return RedirectResponse(error_url)
+
+
+@router.get("/setup/status")
+async def status_setup(authorization: str = Depends(obter_token_auth)):
+    """
+    Progresso da cópia do BD para o Drive iniciada no login:
+    {"state": "running" | "done" | "error", "total", "done", "errors"}.
+    """
+    access_token = get_access_token(authorization)
+    return setup_status(access_token) or {"state": "idle"}
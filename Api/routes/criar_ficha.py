@@ -1,13 +1,19 @@
+import asyncio
 import json
 import os
+import weakref
+from collections import OrderedDict
 from typing import Any, List, Union
 
 from fastapi import APIRouter, Body, Depends, File, HTTPException, UploadFile
+from fastapi.encoders import jsonable_encoder
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from jose import jwt
 from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
 
-from Api.gdrive import (
+from Api.gdrive import content_md5, register_user, user_cache_key
+from Api.gdrive_async import (
     ensure_path,
     get_file_content,
     list_folders_in_parent,
@@ -20,7 +26,17 @@ router_ficha = APIRouter()
 # --- Configuração ---
 ROOT_FOLDER = "JSONs_and_Dragons"
 CHARACTERS_FOLDER = "Characters"
-FILENAME_PKL = "character_state.pkl"
+FILENAME_STATE = "character_state.json"
+# Checkpoints do personagem, fora do estado: só o retroceder_ficha os lê
+FILENAME_CHECKPOINTS = "checkpoints.json"
+# Resumo (get_basic_infos) de todas as fichas do usuário, em Characters/
+INDEX_FILE = "index.json"
+INDEX_VERSION = 1
+# Ficha já renderizada (get_all), gravada junto com o estado
+FILENAME_SHEET = "sheet.json"
+SHEET_VERSION = 1
+# Quantas fichas renderizadas ficam em memória
+MAX_CACHED_SHEETS = int(os.getenv("FICHAS_CACHE", "256"))
 
 security = HTTPBearer()
 
@@ -48,51 +64,237 @@ def get_access_token(auth_header: str):
             raise HTTPException(
                 status_code=401, detail="Token do Google não encontrado no JWT"
             )
+        # Permite que os caches do Drive usem o email como chave do usuário
+        register_user(access_token, payload.get("sub"))
         return access_token
     except Exception as e:
         raise HTTPException(status_code=401, detail=f"Erro de autenticação: {str(e)}")
 
 
-def get_character_folder_id(access_token: str, char_id: int):
+async def get_character_folder_id(access_token: str, char_id: int):
     """Busca a pasta do personagem pelo ID numérico"""
-    return ensure_path(access_token, [ROOT_FOLDER, CHARACTERS_FOLDER, str(char_id)])
+    return await ensure_path(
+        access_token, [ROOT_FOLDER, CHARACTERS_FOLDER, str(char_id)]
+    )
+
+
+# --- Índice de fichas ---
+# Uma escrita por vez por usuário, para duas fichas salvas ao mesmo tempo não
+# sobrescreverem a entrada uma da outra. Referências fracas: o lock some
+# quando ninguém mais o usa, em vez de ficar um por usuário para sempre
+_index_locks = weakref.WeakValueDictionary()
+
 
+def index_lock(access_token: str) -> asyncio.Lock:
+    return _index_locks.setdefault(user_cache_key(access_token), asyncio.Lock())
 
-def save_character_state(access_token: str, char_folder_id: str, character: Character):
-    """Salva a classe Python serializada no Drive"""
-    json_export = character.to_json()
-    upload_or_update(
-        access_token, "decisions.json", json_export, parent_id=char_folder_id
+
+def empty_index() -> dict:
+    return {"version": INDEX_VERSION, "characters": {}}
+
+
+async def load_character_index(access_token: str) -> dict | None:
+    """Baixa o Characters/index.json. Retorna None se ausente ou de outra versão."""
+    chars_root_id = await ensure_path(access_token, [ROOT_FOLDER, CHARACTERS_FOLDER])
+    index = await get_file_content(
+        access_token, filename=INDEX_FILE, parent_id=chars_root_id
+    )
+    if not isinstance(index, dict) or index.get("version") != INDEX_VERSION:
+        return None
+    return index
+
+
+async def save_character_index(access_token: str, index: dict):
+    chars_root_id = await ensure_path(access_token, [ROOT_FOLDER, CHARACTERS_FOLDER])
+    await upload_or_update(
+        access_token,
+        INDEX_FILE,
+        json.dumps(index, ensure_ascii=False),
+        parent_id=chars_root_id,
     )
 
-    content_str = character.to_pickle_string()
-    upload_or_update(access_token, FILENAME_PKL, content_str, parent_id=char_folder_id)
 
+async def update_character_index(access_token: str, char_id: int, summary: dict):
+    """Atualiza (ou cria) a entrada de uma ficha no índice do usuário."""
+    async with index_lock(access_token):
+        index = await load_character_index(access_token) or empty_index()
+        index["characters"][str(char_id)] = summary
+        await save_character_index(access_token, index)
 
-def load_character_state(access_token: str, char_id: int) -> Character:
-    """Baixa e restaura a classe Python do Drive"""
-    folder_id = get_character_folder_id(access_token, char_id)
 
-    try:
-        content_base64 = get_file_content(
-            access_token, filename=FILENAME_PKL, parent_id=folder_id
+def character_summary(character: Character) -> dict:
+    """Resumo da ficha como fica no índice (já convertido para JSON)."""
+    return jsonable_encoder(character.get_basic_infos())
+
+
+# --- Ficha renderizada ---
+# Cache em memória das fichas renderizadas, por (usuário, ficha, versão)
+_sheet_cache = OrderedDict()
+
+
+def state_stamp(content: str) -> str:
+    """
+    Versão do estado salvo: o md5 do conteúdo, o mesmo que o Drive informa
+    em md5Checksum ao listar a pasta da ficha.
+    """
+    return content_md5(content)
+
+
+def render_sheet(character: Character) -> dict:
+    """Ficha completa (get_all) já convertida para JSON."""
+    return jsonable_encoder(character.get_all())
+
+
+def cached_sheet(access_token: str, char_id: int, stamp: str) -> dict | None:
+    key = (user_cache_key(access_token), char_id, stamp)
+    sheet = _sheet_cache.get(key)
+    if sheet is not None:
+        _sheet_cache.move_to_end(key)
+    return sheet
+
+
+def cache_sheet(access_token: str, char_id: int, stamp: str, sheet: dict):
+    _sheet_cache[(user_cache_key(access_token), char_id, stamp)] = sheet
+    while len(_sheet_cache) > MAX_CACHED_SHEETS:
+        _sheet_cache.popitem(last=False)
+
+
+async def save_character_state(
+    access_token: str, char_folder_id: str, character: Character
+) -> dict:
+    """
+    Salva a classe Python serializada no Drive, a ficha renderizada (com a
+    versão do estado de onde saiu) e atualiza o índice de fichas (os uploads
+    rodam em paralelo). Retorna a ficha renderizada.
+    O sheet.json e o checkpoints.json sobem antes do estado: quem lê o estado
+    novo já encontra a ficha e os checkpoints dele.
+    """
+    if not character.checkpoints_loaded and character.checkpoints:
+        # Pausas novas: juntadas aos checkpoints guardados antes de salvar
+        await load_character_checkpoints(access_token, char_folder_id, character)
+
+    json_export, content_str, summary, sheet, checkpoints_str = await run_in_threadpool(
+        lambda: (
+            character.to_json(),
+            character.to_state_string(),
+            character_summary(character),
+            render_sheet(character),
+            (
+                json.dumps(
+                    character.checkpoints_state(),
+                    separators=(",", ":"),
+                    ensure_ascii=False,
+                )
+                if character.checkpoints_loaded
+                else None
+            ),
         )
-        if content_base64:
-            character = Character.from_pickle_string(content_base64, access_token)
-        else:
-            decisoes = get_file_content(
-                access_token, filename="decisions.json", parent_id=folder_id
+    )
+    stamp = state_stamp(content_str)
+    sheet_str = json.dumps(
+        {"version": SHEET_VERSION, "state": stamp, "sheet": sheet},
+        ensure_ascii=False,
+    )
+
+    async def upload_sheet_and_state():
+        uploads = [
+            upload_or_update(
+                access_token, FILENAME_SHEET, sheet_str, parent_id=char_folder_id
             )
-            character = Character(
-                id=char_id, access_token=access_token, decisions=decisoes
+        ]
+        if checkpoints_str is not None:
+            uploads.append(
+                upload_or_update(
+                    access_token,
+                    FILENAME_CHECKPOINTS,
+                    checkpoints_str,
+                    parent_id=char_folder_id,
+                )
             )
-            if character.n < len(decisoes) and decisoes[character.n] == "Raça":
-                character.add_race()
-            if character.n < len(decisoes) and decisoes[character.n] == "Background":
-                character.add_background()
-            while character.n < len(decisoes) and decisoes[character.n] == "Classe":
-                character.add_class()
-            save_character_state(access_token, folder_id, character)
+        await asyncio.gather(*uploads)
+        await upload_or_update(
+            access_token, FILENAME_STATE, content_str, parent_id=char_folder_id
+        )
+
+    await asyncio.gather(
+        upload_or_update(
+            access_token, "decisions.json", json_export, parent_id=char_folder_id
+        ),
+        upload_sheet_and_state(),
+        update_character_index(access_token, character.id, summary),
+    )
+    cache_sheet(access_token, character.id, stamp, sheet)
+    return sheet
+
+
+def build_character(access_token: str, char_id: int, decisoes: list) -> Character:
+    """Recria o personagem do zero reprocessando a lista de decisões"""
+    character = Character(id=char_id, access_token=access_token, decisions=decisoes)
+    character.process_decisions()
+    return character
+
+
+async def restore_character(access_token: str, folder_id: str) -> Character | None:
+    """
+    Restaura o personagem do estado salvo (character_state.json). Retorna None
+    se não houver estado ou se ele for de outra versão do formato.
+    """
+    state = await get_file_content(
+        access_token, filename=FILENAME_STATE, parent_id=folder_id
+    )
+    if not isinstance(state, dict):
+        return None
+    try:
+        return await run_in_threadpool(Character.from_state, state, access_token)
+    except (ValueError, KeyError) as e:
+        print(f"Estado salvo ignorado: {e}")
+        return None
+
+
+async def load_character_checkpoints(
+    access_token: str, folder_id: str, character: Character
+):
+    """
+    Baixa os checkpoints guardados e os junta ao personagem. Ausentes ou de
+    outro save, eles são descartados (o rewind refaz do zero).
+    """
+    if character.checkpoints_loaded:
+        return
+    state = await get_file_content(
+        access_token, filename=FILENAME_CHECKPOINTS, parent_id=folder_id
+    )
+    await run_in_threadpool(character.load_checkpoints, state)
+
+
+async def read_character(
+    access_token: str, char_id: int, folder_id: str
+) -> tuple[Character, bool]:
+    """
+    Restaura o personagem do estado salvo ou, sem estado utilizável, refaz a
+    partir das decisões. Não grava nada; retorna (personagem, refeito).
+    """
+    character = await restore_character(access_token, folder_id)
+    if character is not None:
+        return character, False
+    decisoes = await get_file_content(
+        access_token, filename="decisions.json", parent_id=folder_id
+    )
+    character = await run_in_threadpool(
+        build_character, access_token, char_id, decisoes
+    )
+    return character, True
+
+
+async def load_character_state(access_token: str, char_id: int) -> Character:
+    """Baixa e restaura a classe Python do Drive"""
+    folder_id = await get_character_folder_id(access_token, char_id)
+
+    try:
+        character, rebuilt = await read_character(access_token, char_id, folder_id)
+        if rebuilt:
+            # Salva já no formato atual (migra as fichas antigas em
+            # character_state.pkl)
+            await save_character_state(access_token, folder_id, character)
         return character, folder_id
     except Exception as e:
         raise HTTPException(
@@ -122,7 +324,7 @@ class NextDecisionRequest(BaseModel):
 
 # --- Endpoints ---
 @router_ficha.post("/ficha/")
-def iniciar_ficha(
+async def iniciar_ficha(
     dados: CriarFichaRequest, authorization: str = Depends(obter_token_auth)
 ):
     """
@@ -133,8 +335,8 @@ def iniciar_ficha(
     access_token = get_access_token(authorization)
 
     # 1. Encontrar próximo ID
-    chars_root_id = ensure_path(access_token, [ROOT_FOLDER, CHARACTERS_FOLDER])
-    existing_folders = list_folders_in_parent(access_token, chars_root_id)
+    chars_root_id = await ensure_path(access_token, [ROOT_FOLDER, CHARACTERS_FOLDER])
+    existing_folders = await list_folders_in_parent(access_token, chars_root_id)
     ids = [int(f["name"]) for f in existing_folders if f["name"].isdigit()]
     next_id = max(ids) + 1 if ids else 1
 
@@ -149,19 +351,21 @@ def iniciar_ficha(
         dados.atributos.carisma,
     ]
 
-    # 3. Instancia o Personagem
-    character = Character(
-        id=next_id, access_token=access_token, decisions=decisoes_iniciais
+    # 3. Instancia o Personagem e cria a pasta (em paralelo)
+    character, char_folder_id = await asyncio.gather(
+        run_in_threadpool(
+            Character,
+            id=next_id,
+            access_token=access_token,
+            decisions=decisoes_iniciais,
+        ),
+        ensure_path(access_token, [ROOT_FOLDER, CHARACTERS_FOLDER, str(next_id)]),
     )
 
     print("Rodou character")
 
-    # 4. Cria a pasta e Salva o Estado
-    char_folder_id = ensure_path(
-        access_token, [ROOT_FOLDER, CHARACTERS_FOLDER, str(next_id)]
-    )
-    print("Rodou char_folder_id")
-    save_character_state(access_token, char_folder_id, character)
+    # 4. Salva o Estado
+    await save_character_state(access_token, char_folder_id, character)
 
     print("Rodou save_character_state (rodou tudo)")
     print(character)
@@ -174,7 +378,7 @@ def iniciar_ficha(
 
 
 @router_ficha.post("/ficha/{char_id}/next")
-def avancar_ficha(
+async def avancar_ficha(
     char_id: int,
     payload: NextDecisionRequest,
     authorization: str = Depends(obter_token_auth),
@@ -184,13 +388,15 @@ def avancar_ficha(
     """
     access_token = get_access_token(authorization)
 
-    character, folder_id = load_character_state(access_token, char_id)
+    character, folder_id = await load_character_state(access_token, char_id)
 
-    character.data["decisions"].append(payload.decision)
+    def decidir():
+        character.data["decisions"].append(payload.decision)
+        character.process_queue()
 
-    character.process_queue()
+    await run_in_threadpool(decidir)
 
-    save_character_state(access_token, folder_id, character)
+    await save_character_state(access_token, folder_id, character)
 
     return {
         "required_decision": character.required_decision,
@@ -199,32 +405,23 @@ def avancar_ficha(
 
 
 @router_ficha.post("/ficha/{char_id}/prev/{n}")
-def retroceder_ficha(
+async def retroceder_ficha(
     char_id: int, n: int, authorization: str = Depends(obter_token_auth)
 ):
 
     access_token = get_access_token(authorization)
-    folder_id = ensure_path(
-        access_token, [ROOT_FOLDER, CHARACTERS_FOLDER, str(char_id)]
-    )
+    character, folder_id = await load_character_state(access_token, char_id)
+    await load_character_checkpoints(access_token, folder_id, character)
 
-    decisoes = get_file_content(
-        access_token, filename="decisions.json", parent_id=folder_id
-    )
-    print(decisoes)
-    # decisoes = json.loads(decisoes)
-    decisoes = decisoes[:-n]
+    decisoes = character.data["decisions"][:-n]
 
-    character = Character(id=char_id, access_token=access_token, decisions=decisoes)
-
-    if character.n < len(decisoes) and decisoes[character.n] == "Raça":
-        character.add_race()
-    if character.n < len(decisoes) and decisoes[character.n] == "Background":
-        character.add_background()
-    while character.n < len(decisoes) and decisoes[character.n] == "Classe":
-        character.add_class()
+    # Parte do checkpoint mais próximo; sem checkpoint, refaz do zero
+    if not await run_in_threadpool(character.rewind, decisoes):
+        character = await run_in_threadpool(
+            build_character, access_token, char_id, decisoes
+        )
 
-    save_character_state(access_token, folder_id, character)
+    await save_character_state(access_token, folder_id, character)
 
     return {
         "required_decision": character.required_decision,  # Se {}, acabou
@@ -233,16 +430,16 @@ def retroceder_ficha(
 
 
 @router_ficha.post("/ficha/{char_id}/raca/{raca}")
-def definir_raca(
+async def definir_raca(
     char_id: int, raca: str, authorization: str = Depends(obter_token_auth)
 ):
     """Adiciona a Raça e processa"""
     access_token = get_access_token(authorization)
-    character, folder_id = load_character_state(access_token, char_id)
+    character, folder_id = await load_character_state(access_token, char_id)
 
     character.data["decisions"] += ["Raça", raca]
-    character.add_race()
-    save_character_state(access_token, folder_id, character)
+    await run_in_threadpool(character.add_race)
+    await save_character_state(access_token, folder_id, character)
 
     return {
         "message": f"Raça {raca} adicionada.",
@@ -251,7 +448,7 @@ def definir_raca(
 
 
 @router_ficha.post("/ficha/{char_id}/background/{background}")
-def definir_background(
+async def definir_background(
     char_id: int, background: str, authorization: str = Depends(obter_token_auth)
 ):
     """
@@ -259,11 +456,11 @@ def definir_background(
     """
     access_token = get_access_token(authorization)
 
-    character, folder_id = load_character_state(access_token, char_id)
+    character, folder_id = await load_character_state(access_token, char_id)
 
     character.data["decisions"] += ["Background", background]
-    character.add_background()
-    save_character_state(access_token, folder_id, character)
+    await run_in_threadpool(character.add_background)
+    await save_character_state(access_token, folder_id, character)
 
     return {
         "message": f"Background {background} adicionado.",
@@ -272,7 +469,7 @@ def definir_background(
 
 
 @router_ficha.post("/ficha/{char_id}/classe/{classe}/{nivel}")
-def definir_classe(
+async def definir_classe(
     char_id: int,
     classe: str,
     nivel: int,
@@ -283,11 +480,11 @@ def definir_classe(
     """
     access_token = get_access_token(authorization)
 
-    character, folder_id = load_character_state(access_token, char_id)
+    character, folder_id = await load_character_state(access_token, char_id)
     character.data["decisions"] += ["Classe", classe, nivel]
-    character.add_class()
+    await run_in_threadpool(character.add_class)
 
-    save_character_state(access_token, folder_id, character)
+    await save_character_state(access_token, folder_id, character)
 
     return {
         "message": f"Classe {classe} (Nível {nivel}) adicionada.",
@@ -323,8 +520,8 @@ async def importar_ficha(
         raise HTTPException(status_code=400, detail="Arquivo JSON inválido.")
 
     # 2. Encontrar próximo ID (mesma lógica do iniciar_ficha)
-    chars_root_id = ensure_path(access_token, [ROOT_FOLDER, CHARACTERS_FOLDER])
-    existing_folders = list_folders_in_parent(access_token, chars_root_id)
+    chars_root_id = await ensure_path(access_token, [ROOT_FOLDER, CHARACTERS_FOLDER])
+    existing_folders = await list_folders_in_parent(access_token, chars_root_id)
     ids = [int(f["name"]) for f in existing_folders if f["name"].isdigit()]
     next_id = max(ids) + 1 if ids else 1
 
@@ -332,27 +529,15 @@ async def importar_ficha(
 
     try:
         # 3. Processar o personagem com as decisões do arquivo
-        character = Character(
-            id=next_id, access_token=access_token, decisions=decisions
+        # (Raça, Background e Classes, se estiverem na lista), criando a
+        # pasta em paralelo
+        character, char_folder_id = await asyncio.gather(
+            run_in_threadpool(build_character, access_token, next_id, decisions),
+            ensure_path(access_token, [ROOT_FOLDER, CHARACTERS_FOLDER, str(next_id)]),
         )
 
-        # === CORREÇÃO: Executar o fluxo de decisões ===
-        # Verifica e processa Raça, Background e Classes se estiverem na lista
-        if character.n < len(decisions) and decisions[character.n] == "Raça":
-            character.add_race()
-
-        if character.n < len(decisions) and decisions[character.n] == "Background":
-            character.add_background()
-
-        while character.n < len(decisions) and decisions[character.n] == "Classe":
-            character.add_class()
-        # ===============================================
-
-        # 4. Salvar no Drive (Cria a pasta e salva os arquivos)
-        char_folder_id = ensure_path(
-            access_token, [ROOT_FOLDER, CHARACTERS_FOLDER, str(next_id)]
-        )
-        save_character_state(access_token, char_folder_id, character)
+        # 4. Salvar no Drive
+        await save_character_state(access_token, char_folder_id, character)
 
         return {
             "id": next_id,
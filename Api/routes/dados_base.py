@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Body, Depends
+from starlette.concurrency import run_in_threadpool
 
 from Api.routes.criar_ficha import get_access_token, obter_token_auth
-from jsons_and_dragons import db_handler
+from jsons_and_dragons import db_handler, get_db_handler
 
 router = APIRouter()
 
@@ -9,16 +10,17 @@ router = APIRouter()
 # --- Dependência de Banco de Dados ---
 def get_db(authorization: str = Depends(obter_token_auth)) -> db_handler:
     """
-    Instancia o handler do banco de dados usando o token do usuário.
-    Isso conecta ao Drive do usuário para buscar os dados.
+    Handler do banco de dados do usuário. Montá-lo conecta ao Drive do
+    usuário (metadata.json e pastas dos módulos), então o mesmo handler é
+    reaproveitado entre requisições (ver HandlerRegistry).
     """
     access_token = get_access_token(authorization)
-    return db_handler(access_token)
+    return get_db_handler(access_token)
 
 
 # --- Rota Genérica de Query ---
 @router.get("/query")
-def execute_query(query: str, db: db_handler = Depends(get_db)):
+async def execute_query(query: str, db: db_handler = Depends(get_db)):
     """
     Executa qualquer query suportada pelo parser no banco de dados.
     Exemplos:
@@ -26,30 +28,33 @@ def execute_query(query: str, db: db_handler = Depends(get_db)):
     - "items/metadata.type == armor"
     - "spells/Bola de Fogo"
     """
-    return db.query(query)
+    return await run_in_threadpool(db.query, query)
 
 
 # --- Rotas Específicas (Refatoradas para usar o Drive) ---
+# As leituras do banco são síncronas (cache de módulos), então rodam no
+# threadpool para não bloquear o event loop.
 
 
 @router.get("/classes/keys")
-def list_classes(db: db_handler = Depends(get_db)):
-    return db.query("classes/keys")
+async def list_classes(db: db_handler = Depends(get_db)):
+    return await run_in_threadpool(db.query, "classes/keys")
 
 
 @router.get("/racas/keys")
-def list_racas(db: db_handler = Depends(get_db)):
-    return db.query("races/keys")
+async def list_racas(db: db_handler = Depends(get_db)):
+    return await run_in_threadpool(db.query, "races/keys")
 
 
 @router.get("/backgrounds/keys")
-def list_backgrounds(db: db_handler = Depends(get_db)):
-    return db.query("backgrounds/keys")
+async def list_backgrounds(db: db_handler = Depends(get_db)):
+    return await run_in_threadpool(db.query, "backgrounds/keys")
 
 
 @router.get("/magias/{classe}/{level}/keys")
-def list_magias(classe: str, level: int, db: db_handler = Depends(get_db)):
+async def list_magias(classe: str, level: int, db: db_handler = Depends(get_db)):
     # Filtra magias onde a classe está na lista de classes E o nível é igual
-    return db.query(
-        f"spells/{classe} in metadata.classes AND metadata.level == {level}/keys"
+    return await run_in_threadpool(
+        db.query,
+        f"spells/{classe} in metadata.classes AND metadata.level == {level}/keys",
     )
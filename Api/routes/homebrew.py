@@ -1,20 +1,27 @@
-import io
+import asyncio
 import json
 import os
-import shutil
 import zipfile
 
 from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from jose import jwt
+from starlette.concurrency import run_in_threadpool
 
-from Api.gdrive import (
+from Api.gdrive import UPLOAD_CONCURRENCY, content_md5, register_user
+from Api.gdrive_async import (
+    FOLDER_MIME,
+    create_folder,
     ensure_path,
-    find_file_by_name,
     find_or_create_folder,
     get_file_content,
+    list_folder_files,
+    upload_content,
     upload_or_update,
 )
+from jsons_and_dragons import db_registry
+from jsons_and_dragons.data import base_modules, preload_drive_file
+from jsons_and_dragons.operations import validate_operations
 
 router_homebrew = APIRouter()
 security = HTTPBearer()
@@ -42,46 +49,139 @@ def get_access_token(auth_header: str):
             raise HTTPException(
                 status_code=401, detail="Token do Google não encontrado."
             )
+        # Permite que os caches do Drive usem o email como chave do usuário
+        register_user(access_token, payload.get("sub"))
         return access_token
     except Exception as e:
         raise HTTPException(status_code=401, detail=f"Erro de autenticação: {str(e)}")
 
 
-# --- Lógica de Upload Recursivo ---
-def upload_extracted_files(
-    access_token: str, base_folder_id: str, zip_ref: zipfile.ZipFile
-):
-    """
-    Percorre os arquivos do ZIP e os envia para o Google Drive,
-    recriando a estrutura de pastas.
-    """
-    # Lista todos os arquivos no zip
+# --- Leitura e validação do ZIP ---
+def zip_entries(zip_ref: zipfile.ZipFile) -> list:
+    """Arquivos do ZIP a enviar, sem ler o conteúdo: [(info, pastas, nome)]."""
+    entries = []
     for file_info in zip_ref.infolist():
         if file_info.is_dir():
             continue
 
         path_parts = file_info.filename.split("/")
         filename = path_parts[-1]
-        folders = path_parts[:-1]
-
         if filename.startswith(".") or filename == "":
             continue
+        entries.append((file_info, tuple(path_parts[:-1]), filename))
+    return entries
+
+
+def validate_homebrew_zip(
+    zip_ref: zipfile.ZipFile, module_name: str = None
+) -> tuple[list, list]:
+    """
+    Valida os JSONs do ZIP contra as operações conhecidas, lendo um arquivo
+    por vez (nada fica guardado). Retorna (erros, avisos).
+    Um módulo com o nome de um oficial é recusado: o catálogo oficial
+    sempre vence e a homebrew nunca seria lida.
+    """
+    if module_name in base_modules():
+        return [
+            f"{module_name!r} é o nome de um módulo oficial: escolha outro nome"
+        ], []
+    errors = []
+    warnings = []
+    for file_info, _, filename in zip_entries(zip_ref):
+        if not filename.endswith(".json"):
+            continue
+        try:
+            data = json.loads(zip_ref.read(file_info))
+        except ValueError as e:
+            errors.append(f"{file_info.filename}: JSON inválido ({e})")
+            continue
+        file_errors, file_warnings = validate_operations(data)
+        errors += [f"{file_info.filename}: {e}" for e in file_errors]
+        warnings += [f"{file_info.filename}: {w}" for w in file_warnings]
+    return errors, warnings
+
 
-        current_parent_id = base_folder_id
-        for folder_name in folders:
-            current_parent_id = find_or_create_folder(
-                access_token, folder_name, parent_id=current_parent_id
+def _read_entry(zip_ref: zipfile.ZipFile, file_info, parse: bool):
+    raw = zip_ref.read(file_info)
+    return raw, json.loads(raw) if parse else None
+
+
+# --- Lógica de Upload ---
+async def _plan_folders(
+    access_token: str, base_folder_id: str, folder_paths: set
+) -> dict:
+    """
+    Resolve cada pasta do ZIP uma única vez, nível a nível: a pasta pai é
+    listada uma vez (subpastas e arquivos existentes) e só as subpastas que
+    faltam são criadas. Retorna {caminho: (id_da_pasta, listagem)}.
+    """
+    all_paths = {path[:i] for path in folder_paths for i in range(1, len(path) + 1)}
+    folders = {
+        (): (base_folder_id, await list_folder_files(access_token, base_folder_id))
+    }
+
+    async def resolve(path):
+        parent_id, parent_files = folders[path[:-1]]
+        found = parent_files.get(path[-1])
+        if found and found.get("mimeType") == FOLDER_MIME:
+            return path, (
+                found["id"],
+                await list_folder_files(access_token, found["id"]),
             )
+        return path, (await create_folder(access_token, path[-1], parent_id), {})
 
-        # Lê o conteúdo do arquivo
-        with zip_ref.open(file_info) as f:
-            content = f.read().decode(
-                "utf-8", errors="replace"
-            )  # Assume UTF-8 para JSONs
+    for depth in sorted({len(path) for path in all_paths}):
+        level = [path for path in all_paths if len(path) == depth]
+        folders.update(await asyncio.gather(*(resolve(path) for path in level)))
+    return folders
 
-        # Faz o upload
-        print(f"Enviando {file_info.filename}...")
-        upload_or_update(access_token, filename, content, parent_id=current_parent_id)
+
+async def upload_extracted_files(
+    access_token: str,
+    module_name: str,
+    base_folder_id: str,
+    zip_ref: zipfile.ZipFile,
+) -> dict:
+    """
+    Envia os arquivos do ZIP para o Google Drive, recriando a estrutura de
+    pastas. Cada arquivo só é lido do ZIP quando chega a vez dele, com até
+    UPLOAD_CONCURRENCY envios (e arquivos em memória) ao mesmo tempo.
+    Arquivos já iguais no Drive são pulados, e os JSONs da raiz do módulo
+    entram no cache de módulos já indexados para a primeira query não
+    precisar baixá-los.
+    """
+    entries = zip_entries(zip_ref)
+    folders = await _plan_folders(
+        access_token, base_folder_id, {entry[1] for entry in entries}
+    )
+    semaphore = asyncio.Semaphore(UPLOAD_CONCURRENCY)
+
+    async def send(file_info, folder_path, filename):
+        folder_id, existing = folders[folder_path]
+        preload = not folder_path and filename.endswith(".json")
+        async with semaphore:
+            raw, data = await run_in_threadpool(
+                _read_entry, zip_ref, file_info, preload
+            )
+            result = await upload_content(
+                access_token, filename, raw, folder_id, existing.get(filename)
+            )
+        if preload and result.get("file_id"):
+            file = {"id": result["file_id"], "md5Checksum": content_md5(raw)}
+            # Montar os índices do módulo é CPU: fora do event loop
+            await run_in_threadpool(
+                preload_drive_file, file, module_name, filename, data, len(raw)
+            )
+        return result
+
+    results = await asyncio.gather(*(send(*entry) for entry in entries))
+    skipped = [r for r in results if r["status"] == "unchanged"]
+    return {
+        "uploaded": len(results) - len(skipped),
+        "skipped": len(skipped),
+        "uploaded_bytes": sum(r["uploaded_bytes"] for r in results),
+        "skipped_bytes": sum(r["skipped_bytes"] for r in results),
+    }
 
 
 @router_homebrew.post("/upload")
@@ -92,9 +192,10 @@ async def upload_homebrew(
 ):
     """
     Recebe um ZIP e um Nome.
-    1. Atualiza metadata.json no Drive (adiciona o módulo se não existir).
-    2. Cria a pasta do módulo em BD/.
-    3. Descompacta e envia os arquivos do ZIP para essa pasta.
+    1. Valida os JSONs do ZIP (nada é enviado se algum for inválido).
+    2. Atualiza metadata.json no Drive (adiciona o módulo se não existir).
+    3. Cria a pasta do módulo em BD/.
+    4. Envia os arquivos do ZIP para essa pasta.
     """
     access_token = get_access_token(authorization)
 
@@ -102,16 +203,42 @@ async def upload_homebrew(
     if not file.filename.endswith(".zip"):
         raise HTTPException(status_code=400, detail="O arquivo deve ser um ZIP.")
 
+    # O UploadFile já é um arquivo temporário (vai para o disco se for grande):
+    # o ZIP é lido direto dele, um arquivo por vez e fora do event loop
+    try:
+        zip_ref = await run_in_threadpool(zipfile.ZipFile, file.file)
+    except zipfile.BadZipFile:
+        raise HTTPException(
+            status_code=400, detail="Arquivo ZIP inválido ou corrompido."
+        )
+
+    with zip_ref:
+        errors, warnings = await run_in_threadpool(validate_homebrew_zip, zip_ref, name)
+        if errors:
+            raise HTTPException(
+                status_code=400,
+                detail={
+                    "message": "Homebrew inválida.",
+                    "errors": errors,
+                },
+            )
+        return await _store_homebrew(access_token, name, zip_ref, warnings)
+
+
+async def _store_homebrew(
+    access_token: str, name: str, zip_ref: zipfile.ZipFile, warnings: list
+):
+    """Passos 2 a 4 do upload_homebrew, com o ZIP já validado."""
     try:
         # 2. Localizar pasta BD no Drive
-        bd_folder_id = ensure_path(access_token, [ROOT_FOLDER, BD_FOLDER])
+        bd_folder_id = await ensure_path(access_token, [ROOT_FOLDER, BD_FOLDER])
         if not bd_folder_id:
             raise HTTPException(
                 status_code=500,
                 detail="Pasta do Banco de Dados não encontrada no Drive.",
             )
 
-        metadata_content = get_file_content(
+        metadata_content = await get_file_content(
             access_token, filename=METADATA_FILE, parent_id=bd_folder_id
         )
 
@@ -127,7 +254,7 @@ async def upload_homebrew(
             modules_list.append(name)
             metadata_json["modules"] = modules_list
             # Atualiza o metadata.json no Drive
-            upload_or_update(
+            await upload_or_update(
                 access_token,
                 METADATA_FILE,
                 json.dumps(metadata_json, indent=4),
@@ -135,25 +262,28 @@ async def upload_homebrew(
             )
 
         # 4. Preparar pasta do Módulo (Sobrescreve conteúdo se já existir, pois o upload faz update)
-        module_folder_id = find_or_create_folder(
+        module_folder_id = await find_or_create_folder(
             access_token, name, parent_id=bd_folder_id
         )
 
-        # 5. Processar o ZIP em memória
-        content = await file.read()
-        with zipfile.ZipFile(io.BytesIO(content)) as zip_ref:
-            upload_extracted_files(access_token, module_folder_id, zip_ref)
+        # 5. Enviar os arquivos do ZIP
+        files = await upload_extracted_files(
+            access_token, name, module_folder_id, zip_ref
+        )
+
+        # Os módulos do usuário mudaram: o próximo acesso monta o handler de novo
+        db_registry.invalidate(access_token)
 
         return {
             "message": f"Homebrew '{name}' processada com sucesso.",
             "status": "created" if is_new_module else "updated",
             "modules": modules_list,
+            "files": files,
+            "warnings": warnings,
         }
 
-    except zipfile.BadZipFile:
-        raise HTTPException(
-            status_code=400, detail="Arquivo ZIP inválido ou corrompido."
-        )
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Erro no upload de homebrew: {str(e)}")
         raise HTTPException(
@@ -1,22 +1,47 @@
+import asyncio
 import json
 import os
 
 import requests
 from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from jose import jwt
+from starlette.concurrency import run_in_threadpool
 
 from jsons_and_dragons import Character
 
-from ..gdrive import ensure_path, get_file_content, list_folders_in_parent
-from .criar_ficha import get_access_token, get_character_folder_id, load_character_state
+from ..gdrive_async import (
+    ensure_path,
+    get_file_content,
+    list_folder_files,
+    list_folders_in_parent,
+)
+from .criar_ficha import (
+    FILENAME_SHEET,
+    SHEET_VERSION,
+    cache_sheet,
+    cached_sheet,
+    empty_index,
+    get_access_token,
+    get_character_folder_id,
+    index_lock,
+    load_character_index,
+    load_character_state,
+    read_character,
+    render_sheet,
+    save_character_index,
+)
 
 router_coleta_ficha = APIRouter()
 
 # --- Configuração ---
 ROOT_FOLDER = "JSONs_and_Dragons"
 CHARACTERS_FOLDER = "Characters"
-FILENAME_PKL = "character_state.pkl"
+FILENAME_STATE = "character_state.json"
+# Quantas fichas são carregadas do Drive ao mesmo tempo na listagem
+MAX_CONCURRENT_LOADS = int(os.getenv("FICHAS_CONCORRENCIA", "8"))
 
 # --- Segurança para o Swagger ---
 # Isso faz aparecer o botão de cadeado no Swagger e garante que o token venha corretamente
@@ -32,43 +57,184 @@ def obter_token_auth(creds: HTTPAuthorizationCredentials = Depends(security)):
     return f"Bearer {creds.credentials}"
 
 
+async def carregar_resumo(
+    access_token: str, folder: dict, semaforo: asyncio.Semaphore
+) -> dict:
+    """
+    Carrega uma ficha e devolve {"id", "ficha"} com o resumo básico ou
+    {"id", "erro"} se ela não pôde ser carregada.
+    """
+    async with semaforo:
+        try:
+            character, _ = await load_character_state(access_token, int(folder["name"]))
+            infos = await run_in_threadpool(character.get_basic_infos)
+            return {"id": int(folder["name"]), "ficha": jsonable_encoder(infos)}
+        except Exception as e:
+            detalhe = getattr(e, "detail", None) or str(e)
+            print(f"Erro ao carregar ficha {folder['name']}: {detalhe}")
+            return {"id": int(folder["name"]), "erro": detalhe}
+
+
+async def carregar_resumos(access_token: str, reconstruir: bool = False):
+    """
+    Gera os resumos das fichas do usuário. Os que estão no índice
+    (Characters/index.json) saem direto; as fichas ausentes do índice são
+    carregadas em paralelo e o índice é regravado no final. Com `reconstruir`
+    o índice é ignorado e refeito a partir de todas as fichas.
+    """
+    chars_root_id = await ensure_path(access_token, [ROOT_FOLDER, CHARACTERS_FOLDER])
+    existing_folders, index = await asyncio.gather(
+        list_folders_in_parent(access_token, chars_root_id),
+        load_character_index(access_token),
+    )
+    if reconstruir:
+        index = None
+
+    resumos = (index or empty_index())["characters"]
+    pastas = [folder for folder in existing_folders if folder["name"].isdigit()]
+    for folder in pastas:
+        if folder["name"] in resumos:
+            yield {"id": int(folder["name"]), "ficha": resumos[folder["name"]]}
+
+    semaforo = asyncio.Semaphore(MAX_CONCURRENT_LOADS)
+    tarefas = [
+        asyncio.create_task(carregar_resumo(access_token, folder, semaforo))
+        for folder in pastas
+        if folder["name"] not in resumos
+    ]
+    carregados = {}
+    try:
+        for tarefa in asyncio.as_completed(tarefas):
+            resultado = await tarefa
+            if "ficha" in resultado:
+                carregados[str(resultado["id"])] = resultado["ficha"]
+            yield resultado
+    finally:
+        # Se o cliente desconectar no meio do stream, não deixa downloads órfãos
+        for tarefa in tarefas:
+            tarefa.cancel()
+
+    # Índice ausente, incompleto ou com fichas que já foram apagadas
+    nomes = {folder["name"] for folder in pastas}
+    if index is None or carregados or set(resumos) - nomes:
+        await reconstruir_indice(access_token, nomes, carregados, index is None)
+
+
+async def reconstruir_indice(
+    access_token: str, nomes: set, carregados: dict, do_zero: bool
+):
+    """Regrava o índice com as fichas recém-carregadas e sem as apagadas."""
+    async with index_lock(access_token):
+        index = None
+        if not do_zero:
+            # Relê o índice: um save pode ter atualizado alguma entrada
+            index = await load_character_index(access_token)
+        index = index or empty_index()
+        atuais = index["characters"]
+        for nome in list(atuais):
+            if nome not in nomes:
+                del atuais[nome]
+        for nome, resumo in carregados.items():
+            atuais.setdefault(nome, resumo)
+        await save_character_index(access_token, index)
+
+
 @router_coleta_ficha.get("/fichas/")
-def listar_todas_fichas(authorization: str = Depends(obter_token_auth)):
+async def listar_todas_fichas(
+    reconstruir: bool = False, authorization: str = Depends(obter_token_auth)
+):
+    """
+    Lista o resumo de todas as fichas a partir do índice (um download só);
+    fichas fora do índice são carregadas em paralelo. Fichas com erro ficam de
+    fora (os erros individuais aparecem em /fichas/stream).
+    """
     access_token = get_access_token(authorization)
 
-    chars_root_id = ensure_path(access_token, [ROOT_FOLDER, CHARACTERS_FOLDER])
-    existing_folders = list_folders_in_parent(access_token, chars_root_id)
+    resultados = [r async for r in carregar_resumos(access_token, reconstruir)]
+    resultados.sort(key=lambda r: r["id"])
+    return [r["ficha"] for r in resultados if "ficha" in r]
 
-    infos = []
-    for folder in existing_folders:
-        try:
-            character, _ = load_character_state(access_token, int(folder["name"]))
-            infos.append(character.get_basic_infos())
-        except Exception as e:
-            print(f"Erro ao carregar ficha {folder['name']}: {e}")
-            continue
 
-    return infos
+@router_coleta_ficha.get("/fichas/stream")
+async def listar_fichas_stream(
+    reconstruir: bool = False, authorization: str = Depends(obter_token_auth)
+):
+    """
+    Mesma listagem em NDJSON: uma linha por ficha assim que ela é carregada
+    ({"id", "ficha"} ou {"id", "erro"}) e uma linha final com os totais.
+    """
+    access_token = get_access_token(authorization)
+
+    async def linhas():
+        total = erros = 0
+        async for resultado in carregar_resumos(access_token, reconstruir):
+            total += 1
+            erros += "erro" in resultado
+            yield json.dumps(resultado, ensure_ascii=False) + "\n"
+        yield json.dumps({"fim": True, "total": total, "erros": erros}) + "\n"
+
+    return StreamingResponse(linhas(), media_type="application/x-ndjson")
+
+
+async def carregar_ficha_renderizada(access_token: str, char_id: int) -> dict:
+    """
+    Ficha completa a partir do sheet.json gravado no save, sem restaurar o
+    personagem. A listagem da pasta traz o md5 do estado salvo, que é a
+    versão da ficha: com ele a ficha sai do cache em memória ou do sheet.json,
+    desde que este tenha sido gerado a partir do mesmo estado.
+    """
+    folder_id = await get_character_folder_id(access_token, char_id)
+    files = await list_folder_files(access_token, folder_id)
+    stamp = files.get(FILENAME_STATE, {}).get("md5Checksum")
+
+    if stamp:
+        sheet = cached_sheet(access_token, char_id, stamp)
+        if sheet is not None:
+            return sheet
+        if FILENAME_SHEET in files:
+            saved = await get_file_content(
+                access_token, file_id=files[FILENAME_SHEET]["id"]
+            )
+            if (
+                isinstance(saved, dict)
+                and saved.get("version") == SHEET_VERSION
+                and saved.get("state") == stamp
+            ):
+                cache_sheet(access_token, char_id, stamp, saved["sheet"])
+                return saved["sheet"]
+
+    # Ficha sem sheet.json ou com um de outro estado: renderiza só em memória.
+    # Uma leitura não grava no Drive; o sheet.json é refeito no próximo save
+    try:
+        character, _ = await read_character(access_token, char_id, folder_id)
+        sheet = await run_in_threadpool(render_sheet, character)
+    except Exception as e:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Personagem {char_id} não encontrado ou arquivo corrompido.",
+        )
+    if stamp:
+        cache_sheet(access_token, char_id, stamp, sheet)
+    return sheet
 
 
 @router_coleta_ficha.get("/fichas/{id}")
-def pegar_ficha(id: int, authorization: str = Depends(obter_token_auth)):
+async def pegar_ficha(id: int, authorization: str = Depends(obter_token_auth)):
     access_token = get_access_token(authorization)
 
-    character, _ = load_character_state(access_token, id)
-    return character.get_all()
+    return await carregar_ficha_renderizada(access_token, id)
 
 
 @router_coleta_ficha.get("/fichas/{char_id}/export")
-def exportar_ficha(char_id: int, authorization: str = Depends(obter_token_auth)):
+async def exportar_ficha(char_id: int, authorization: str = Depends(obter_token_auth)):
     """
     Retorna o conteúdo bruto do decisions.json para download.
     """
     access_token = get_access_token(authorization)
-    folder_id = get_character_folder_id(access_token, char_id)
+    folder_id = await get_character_folder_id(access_token, char_id)
 
     # Baixa o conteúdo (que já vem como dict/list do get_file_content se for json)
-    decisions_content = get_file_content(
+    decisions_content = await get_file_content(
         access_token, filename="decisions.json", parent_id=folder_id
     )
 
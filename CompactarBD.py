@@ -1,6 +1,16 @@
 import json
 import os
 import shutil
+import time
+
+from jsons_and_dragons.compiled import (
+    COMPILED_FOLDER,
+    artifact_path,
+    load_compiled,
+    offset_index_path,
+    write_artifact,
+    write_offset_index,
+)
 
 
 def compactar_diretorio(pasta_origem, pasta_destino):
@@ -70,6 +80,66 @@ def compactar_diretorio(pasta_origem, pasta_destino):
     print(f"Redução de tamanho: {porcentagem:.2f}%")
 
 
+def _tempo_medio(funcao, repeticoes):
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        funcao()
+    return (time.perf_counter() - inicio) / repeticoes
+
+
+def compilar_modulos(pasta_bd, repeticoes=20):
+    """
+    Gera o artefato pré-compilado (BD/_compilado/{módulo}.bin) e o índice de
+    offsets por entidade (BD/_compilado/{módulo}.idx) de cada módulo, e compara
+    o tempo de carga do artefato com o caminho atual em JSON.
+    """
+    print(f"\n--- Compilando módulos de '{pasta_bd}' ---\n")
+
+    total_json = 0.0
+    total_compilado = 0.0
+
+    for modulo in sorted(os.listdir(pasta_bd)):
+        pasta_modulo = os.path.join(pasta_bd, modulo)
+        if modulo == COMPILED_FOLDER or not os.path.isdir(pasta_modulo):
+            continue
+
+        destino = artifact_path(pasta_bd, modulo)
+        arquivos = write_artifact(pasta_modulo, destino)
+        indice = write_offset_index(pasta_modulo, offset_index_path(pasta_bd, modulo))
+        entidades = sum(len(info["entities"]) for info in indice.values())
+
+        conteudos = {}
+        for nome in arquivos:
+            with open(os.path.join(pasta_modulo, nome), "rb") as f:
+                conteudos[nome] = f.read()
+
+        # Carga via JSON (caminho atual) x carga via artefato (inclui o hash)
+        tempo_json = _tempo_medio(
+            lambda: [json.loads(raw) for raw in conteudos.values()], repeticoes
+        )
+        tempo_compilado = _tempo_medio(
+            lambda: [
+                load_compiled(destino, nome, raw) for nome, raw in conteudos.items()
+            ],
+            repeticoes,
+        )
+        total_json += tempo_json
+        total_compilado += tempo_compilado
+
+        print(
+            f"[OK] {modulo}: {len(arquivos)} arquivos, {entidades} entidades, "
+            f"{os.path.getsize(destino) / 1024:.1f} KB | "
+            f"JSON {tempo_json * 1000:.2f} ms x "
+            f"compilado {tempo_compilado * 1000:.2f} ms"
+        )
+
+    if total_compilado > 0:
+        print(f"\n--- Benchmark de carga ---")
+        print(f"JSON: {total_json * 1000:.2f} ms")
+        print(f"Compilado: {total_compilado * 1000:.2f} ms")
+        print(f"Speedup: {total_json / total_compilado:.2f}x")
+
+
 # --- Configuração ---
 if __name__ == "__main__":
     # Defina os nomes das pastas aqui
@@ -79,5 +149,6 @@ if __name__ == "__main__":
     # Verifica se a pasta de origem existe antes de começar
     if os.path.exists(PASTA_ENTRADA):
         compactar_diretorio(PASTA_ENTRADA, PASTA_SAIDA)
+        compilar_modulos(PASTA_SAIDA)
     else:
         print(f"A pasta '{PASTA_ENTRADA}' não foi encontrada.")
@@ -0,0 +1,71 @@
+"""
+Micro-benchmark do motor de regras: monta um Paladino do nível 1 ao 10 com o
+banco local (BD/), respondendo cada decisão pendente com a primeira opção.
+
+Uso: python benchmarks/build_paladino.py [repetições]
+"""
+
+import contextlib
+import io
+import os
+import statistics
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from jsons_and_dragons import Character  # noqa: E402
+
+
+def responder_pendentes(personagem: Character):
+    """Responde as decisões pendentes com a primeira opção disponível."""
+    while personagem.required_decision:
+        pedido = personagem.required_decision
+        if pedido.get("type") == "input":
+            escolha = "X"
+        else:
+            opcoes = pedido.get("options")
+            n = pedido.get("n", 1)
+            escolha = opcoes[0] if n == 1 else opcoes[:n]
+        personagem.data["decisions"].append(escolha)
+        personagem.process_queue()
+
+
+def montar_paladino() -> Character:
+    personagem = Character(
+        1, None, ["Paladino de Teste", 15, 12, 14, 8, 8, 14], use_local=True
+    )
+    responder_pendentes(personagem)
+    personagem.data["decisions"] += ["Raça", "Anão"]
+    personagem.add_race()
+    responder_pendentes(personagem)
+    personagem.data["decisions"] += ["Background", "Acólito"]
+    personagem.add_background()
+    responder_pendentes(personagem)
+    for nivel in range(0, 11):
+        personagem.data["decisions"] += ["Classe", "Paladino", nivel]
+        personagem.add_class()
+        responder_pendentes(personagem)
+    return personagem
+
+
+def main():
+    repeticoes = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    os.chdir(RAIZ)
+
+    tempos = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        personagem = montar_paladino()  # Aquece o cache de módulos
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            montar_paladino()
+            tempos.append(time.perf_counter() - inicio)
+
+    print(f"Decisões: {len(personagem.data['decisions'])}")
+    print(f"Mediana: {statistics.median(tempos) * 1000:.2f} ms")
+    print(f"Mínimo: {min(tempos) * 1000:.2f} ms ({repeticoes} repetições)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Micro-benchmark das fórmulas da ficha: coleta as fórmulas do banco local
+(BD/, com {THIS} trocado pelos seis atributos) e as avalia contra um Paladino
+nível 10. Compara a avaliação compilada (compile_formula) com a textual
+(substituir os valores no texto e avaliar, como era antes) e mede o custo
+de compilar e o interpolate_and_eval completo, resolvendo pelo grafo de stats.
+
+Uso: python benchmarks/formula_eval.py [repetições]
+"""
+
+import contextlib
+import io
+import json
+import os
+import sys
+import timeit
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from build_paladino import montar_paladino  # noqa: E402
+
+from jsons_and_dragons.formula import REFERENCE, compile_formula  # noqa: E402
+from jsons_and_dragons.utils import interpolate_and_eval  # noqa: E402
+
+ATRIBUTOS = ["str", "dex", "con", "int", "wis", "cha"]
+
+
+def coletar_formulas(valor, formulas: set):
+    """Strings com referências {caminho} em qualquer lugar dos módulos."""
+    if isinstance(valor, dict):
+        for item in valor.values():
+            coletar_formulas(item, formulas)
+    elif isinstance(valor, list):
+        for item in valor:
+            coletar_formulas(item, formulas)
+    elif isinstance(valor, str) and REFERENCE.search(valor):
+        for texto in {valor.replace("{THIS}", a) for a in ATRIBUTOS}:
+            # "{THIS}" sozinho é só um nome (ex: "feats/{THIS}"), não fórmula
+            if REFERENCE.search(texto):
+                formulas.add(texto)
+
+
+def formulas_do_bd() -> list:
+    formulas = set()
+    for pasta, _, arquivos in os.walk(os.path.join(RAIZ, "BD")):
+        for nome in arquivos:
+            if nome.endswith(".json") and nome != "metadata.json":
+                with open(os.path.join(pasta, nome), encoding="utf-8") as f:
+                    coletar_formulas(json.load(f), formulas)
+    return sorted(formulas)
+
+
+def por_formula_us(funcao, total: int, repeticoes: int) -> float:
+    tempo = min(timeit.repeat(funcao, number=repeticoes, repeat=5))
+    return tempo / repeticoes / total * 1e6
+
+
+def main():
+    repeticoes = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    os.chdir(RAIZ)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        personagem = montar_paladino()
+    contexto = personagem.data
+    formulas = formulas_do_bd()
+    compiladas = [compile_formula(texto) for texto in formulas]
+    valores = [
+        [personagem.get_stat(path) for path in formula.paths] for formula in compiladas
+    ]
+
+    diferentes = 0
+    for formula, vals in zip(compiladas, valores):
+        textual, compilado = formula.evaluate_text(vals), formula.evaluate(vals)
+        if textual != compilado or type(textual) is not type(compilado):
+            diferentes += 1
+            print(f"Diferença em {formula.text!r}: {textual!r} != {compilado!r}")
+    textuais = sum(
+        formula.expression is None and not formula.is_reference()
+        for formula in compiladas
+    )
+
+    def compilar():
+        compile_formula.cache_clear()
+        for texto in formulas:
+            compile_formula(texto)
+
+    def avaliar_textual():
+        for formula, vals in zip(compiladas, valores):
+            formula.evaluate_text(vals)
+
+    def avaliar_compilado():
+        for formula, vals in zip(compiladas, valores):
+            formula.evaluate(vals)
+
+    def interpolar():
+        for texto in formulas:
+            interpolate_and_eval(texto, contexto, personagem.get_stat)
+
+    total = len(formulas)
+    print(f"Fórmulas: {total} ({textuais} só com avaliação textual, ex: dados)")
+    print(f"Resultados diferentes: {diferentes}")
+    print(f"compile_formula (sem cache): {por_formula_us(compilar, total, 20):.2f} us")
+    print(f"Textual: {por_formula_us(avaliar_textual, total, repeticoes):.2f} us")
+    print(f"Compilada: {por_formula_us(avaliar_compilado, total, repeticoes):.2f} us")
+    print(
+        f"interpolate_and_eval: {por_formula_us(interpolar, total, repeticoes):.2f} us"
+    )
+    compile_formula.cache_clear()
+
+
+if __name__ == "__main__":
+    main()
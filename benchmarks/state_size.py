@@ -0,0 +1,88 @@
+"""
+Tamanho e tempo do estado salvo de um Paladino nível 10 (banco local): o
+estado JSON (to_state_string) contra o snapshot antigo em dill + base64, e o
+tamanho dos checkpoints, salvos à parte.
+O dill saiu das dependências; sem ele, só o estado JSON é medido.
+
+Uso: python benchmarks/state_size.py [repetições]
+"""
+
+import base64
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from build_paladino import montar_paladino  # noqa: E402
+
+from jsons_and_dragons import Character  # noqa: E402
+
+
+def mediana_ms(funcao, repeticoes: int) -> float:
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos) * 1000
+
+
+def medir(nome: str, dump, load, repeticoes: int):
+    conteudo = dump()
+    tempo_dump = mediana_ms(dump, repeticoes)
+    tempo_load = mediana_ms(lambda: load(conteudo), repeticoes)
+    print(
+        f"{nome}: {len(conteudo.encode('utf-8')):,} bytes, "
+        f"dump {tempo_dump:.2f} ms, load {tempo_load:.2f} ms"
+    )
+
+
+def main():
+    repeticoes = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    os.chdir(RAIZ)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        personagem = montar_paladino()
+
+    # O caminho normal (ler a ficha, tomar uma decisão) só carrega o estado;
+    # os checkpoints ficam no checkpoints.json, lido só para voltar decisões
+    medir(
+        "Estado JSON (character_state.json)",
+        personagem.to_state_string,
+        lambda texto: Character.from_state_string(texto, None),
+        repeticoes,
+    )
+    checkpoints = json.dumps(
+        personagem.checkpoints_state(), separators=(",", ":"), ensure_ascii=False
+    )
+    print(
+        f"Checkpoints (checkpoints.json): {len(checkpoints.encode('utf-8')):,} bytes "
+        f"({len(personagem.checkpoints)} pausas)"
+    )
+
+    try:
+        import dill
+    except ImportError:
+        print("dill não instalado: comparação com o snapshot antigo ignorada")
+        return
+
+    # Como o snapshot antigo: o personagem inteiro, sem o handler do banco e
+    # sem checkpoints (que não existiam quando o dill era usado)
+    personagem._db = None
+    personagem.checkpoints = []
+    medir(
+        "dill + base64",
+        lambda: base64.b64encode(dill.dumps(personagem)).decode("ascii"),
+        lambda texto: dill.loads(base64.b64decode(texto)),
+        repeticoes,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,3 @@
 from .character import Character
-from .data import db_handler, db_homebrew
+from .data import db_handler, db_homebrew, db_registry, get_db_handler
 from .utils import get_nested, interpolate_and_eval, resolve_value, set_nested
@@ -0,0 +1,117 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+# Limites padrão do cache compartilhado (por processo)
+MAX_ENTRIES = 128
+MAX_BYTES = 64 * 1024 * 1024
+
+
+class ModuleCache:
+    """
+    Cache LRU de arquivos de módulo já parseados, compartilhado pelo processo.
+
+    A chave é uma tupla (origem, módulo, arquivo, versão), onde a versão é o
+    mtime local ou o md5/modifiedTime do Drive. Quando um arquivo muda de
+    versão, a entrada antiga é descartada no próximo `put`.
+    """
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, max_bytes: int = MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+        self._versions: Dict[Hashable, Hashable] = {}
+        self._bytes = 0
+        self._lock = threading.RLock()
+
+    def get(self, key: Tuple) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def peek(self, key: Tuple) -> Any:
+        """Consulta sem alterar a ordem LRU nem os contadores."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[0] if entry else None
+
+    def put(self, key: Tuple, value: Any, size: int = 0) -> None:
+        with self._lock:
+            # Remove versões antigas do mesmo arquivo
+            file_key, version = key[:-1], key[-1]
+            old_version = self._versions.get(file_key)
+            if old_version is not None and old_version != version:
+                self._discard(file_key + (old_version,))
+            self._discard(key)
+
+            self._entries[key] = (value, size)
+            self._versions[file_key] = version
+            self._bytes += size
+
+            while self._entries and (
+                len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+            ):
+                old_key, _ = next(iter(self._entries.items()))
+                self._discard(old_key)
+                self.evictions += 1
+
+    def get_or_load(self, key: Tuple, loader: Callable[[], Tuple[Any, int]]) -> Any:
+        """
+        Retorna o valor em cache ou chama `loader`, que deve devolver
+        (valor, tamanho_em_bytes). Valores vazios não são guardados.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+        value, size = loader()
+        if value:
+            self.put(key, value, size)
+        return value
+
+    def size_of(self, key: Tuple) -> int:
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[1] if entry else 0
+
+    def invalidate(self, predicate: Callable[[Tuple], bool]) -> int:
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                self._discard(key)
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+            self._bytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _discard(self, key: Tuple) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+            if self._versions.get(key[:-1]) == key[-1]:
+                del self._versions[key[:-1]]
+
+
+# Instância única usada por todos os db_homebrew do processo
+module_cache = ModuleCache()
@@ -1,19 +1,58 @@
-import base64
 import json
-from typing import Any, List
+from collections import deque
+from types import MappingProxyType
+from typing import Any, List, Mapping, Sequence
 
-import dill as pickle
-
-from .data import db_handler
+from .computed import StatGraph, decode_state, encode_state, find_computed
+from .data import copy_data, db_handler, get_db_handler
 from .operations import operations  # Importa o dicionário de operações
-from .utils import get_nested, interpolate_and_eval, resolve_value, set_nested
+from .utils import get_nested, interpolate_and_eval, set_nested
+
+# Formato do estado salvo (to_state_string). Mudanças incompatíveis no formato
+# devem incrementar a versão; estados de outra versão são refeitos a partir
+# das decisões.
+STATE_FORMAT = "jsons_and_dragons.character"
+STATE_VERSION = 3
+
+# Quantos checkpoints (pausas em required_decision) ficam guardados; além
+# disso, os mais antigos são juntados no primeiro. Eles ficam fora do estado
+# (checkpoints_state): só o rewind precisa deles
+MAX_CHECKPOINTS = 32
+
+# Marcadores na lista de decisões tratados fora da fila de operações
+DECISION_MARKERS = {
+    "Raça": "add_race",
+    "Background": "add_background",
+    "Classe": "add_class",
+}
+
+
+def _queue_delta(queue: list, previous: list) -> dict:
+    """
+    Fila de um checkpoint em relação à do anterior: quantas operações do fim
+    são as mesmas ("keep") e as do início, codificadas ("head").
+    """
+    keep = 0
+    while (
+        keep < min(len(queue), len(previous))
+        and queue[-1 - keep] == previous[-1 - keep]
+    ):
+        keep += 1
+    return {"keep": keep, "head": encode_state(queue[: len(queue) - keep])}
 
 
 class Character:
-    def __init__(self, id: int, access_token: str, decisions: List[Any] = None):
+    def __init__(
+        self,
+        id: int,
+        access_token: str,
+        decisions: List[Any] = None,
+        use_local: bool = False,
+    ):
         self.id = id
         self.access_token = access_token
-        self.db = db_handler(self.access_token)
+        self.use_local = use_local
+        self._db = None
 
         self.data = {
             "decisions": decisions if decisions else [],
@@ -25,8 +64,20 @@ class Character:
             "inventory": {},
         }
         self.n = 0
-        self.ficha = [{"action": "IMPORT", "query": "metadata/character"}]
+        # Fila de operações: consumida pela esquerda e com inserções no início
+        self.ficha = deque([{"action": "IMPORT", "query": "metadata/character"}])
         self.required_decision = None
+        self.checkpoints = []
+        # Checkpoints guardados à parte e ainda não carregados (load_checkpoints):
+        # (quantidade, n do último). None se `checkpoints` está completa
+        self._stored_checkpoints = None
+        # Caminhos escritos desde o último checkpoint, na ordem da primeira
+        # escrita (None: ficha inteira)
+        self._dirty = None
+        self._last_queue = None
+        self.stats = StatGraph()
+        self._computed_paths = set()
+        self._snapshot = None
 
         print(f"--- Iniciando processamento Character ID {id} ---")
         self.process_queue()
@@ -96,7 +147,7 @@ class Character:
 
     def process_queue(self):
         self.required_decision = {}
-        while len(self.ficha) > 0:
+        while self.ficha:
             if self.required_decision != {}:
                 # print(f"(!) Processamento pausado. Aguardando: {self.required_decision['label']}")
                 break
@@ -106,6 +157,7 @@ class Character:
             if isinstance(result, dict):
                 self.required_decision = result
                 print(f"(!) Decisão Necessária detectada: {result['label']}")
+                self.save_checkpoint()
                 break
 
             if result == -1:
@@ -115,11 +167,266 @@ class Character:
         if not self.ficha and not self.required_decision:
             print("(v) Fila vazia. Processamento concluído.")
 
+    def process_decisions(self):
+        """
+        Continua o processamento consumindo os marcadores de Raça, Background e
+        Classe que já estão na lista de decisões (ex: ao refazer uma ficha).
+        """
+        decisions = self.data["decisions"]
+        while (
+            not self.required_decision
+            and self.n < len(decisions)
+            and decisions[self.n] in DECISION_MARKERS
+        ):
+            getattr(self, DECISION_MARKERS[decisions[self.n]])()
+
+    # --- Checkpoints ---
+    # Cada checkpoint guarda só o que mudou desde o anterior: os caminhos
+    # escritos por set_stat com o valor atual codificado ("changes"), ou só os
+    # itens novos de listas que cresceram ("appends"); as operações novas no
+    # início da fila (o fim dela é o mesmo do checkpoint anterior) e a decisão
+    # pedida. O primeiro checkpoint guarda a ficha inteira (caminho "").
+    def _previous_list(self, path: str) -> list | None:
+        """
+        Lista guardada em `path` no último checkpoint (codificada), montada a
+        partir dos checkpoints. None se ela não pode ser reconstruída.
+        """
+        added = []
+        for checkpoint in reversed(self.checkpoints):
+            if path in checkpoint["appends"]:
+                added = checkpoint["appends"][path] + added
+                continue
+            for changed, value in checkpoint["changes"].items():
+                if changed.startswith(path + "."):
+                    return None
+                if changed == path:
+                    base = value
+                elif changed == "" or path.startswith(changed + "."):
+                    base = get_nested(value, path[len(changed) :].lstrip("."))
+                else:
+                    continue
+                return base + added if isinstance(base, list) else None
+        return None
+
+    def _changed_state(self) -> tuple[dict, dict]:
+        """Caminhos escritos desde o último checkpoint: (changes, appends)."""
+        if self._dirty is None or "" in self._dirty:
+            return {"": encode_state(self.data)}, {}
+        replaced = set()
+        appends = {}
+        for path in sorted(self._dirty, key=lambda p: p.count(".")):
+            # Um caminho dentro de outro já guardado vem junto com ele
+            parents = path.split(".")
+            if any(".".join(parents[:i]) in replaced for i in range(1, len(parents))):
+                continue
+            value = encode_state(get_nested(self.data, path))
+            previous = self._previous_list(path) if isinstance(value, list) else None
+            if previous is not None and value[: len(previous)] == previous:
+                if len(value) > len(previous):
+                    appends[path] = value[len(previous) :]
+            else:
+                replaced.add(path)
+        # Na ordem das escritas: o rewind recria as chaves novas na mesma ordem
+        # em que a ficha original as criou
+        changes = {
+            path: encode_state(get_nested(self.data, path))
+            for path in self._dirty
+            if path in replaced
+        }
+        return changes, appends
+
+    def _checkpoint_queue(self, index: int) -> list:
+        """Fila de operações do checkpoint `index` (decodificada)."""
+        ficha = []
+        for checkpoint in self.checkpoints[: index + 1]:
+            queue = checkpoint["ficha"]
+            kept = ficha[len(ficha) - queue["keep"] :] if queue["keep"] else []
+            ficha = decode_state(queue["head"]) + kept
+        return ficha
+
+    def _merge_first_checkpoints(self):
+        """Junta os dois primeiros checkpoints em um, com a ficha inteira."""
+        first, second = self.checkpoints[0], self.checkpoints[1]
+        data = copy_data(first["changes"][""])
+        for path, value in second["changes"].items():
+            if path == "":
+                data = value
+            else:
+                set_nested(data, path, value)
+        for path, items in second["appends"].items():
+            get_nested(data, path).extend(items)
+        queue = encode_state(self._checkpoint_queue(1))
+        self.checkpoints[:2] = [
+            {
+                **second,
+                "changes": {"": data},
+                "appends": {},
+                "ficha": {"keep": 0, "head": queue},
+            }
+        ]
+
+    def save_checkpoint(self):
+        """
+        Guarda o estado da pausa atual (ficha, fila e n). Checkpoints de pausas
+        iguais ou posteriores a esta pertencem a um histórico descartado e saem
+        da lista; o que eles guardavam passa para este.
+        """
+        while self.checkpoints and self.checkpoints[-1]["n"] >= self.n:
+            dropped = self.checkpoints.pop()
+            if self._dirty is not None:
+                # Escritas do checkpoint descartado vieram antes das atuais
+                self._dirty = {
+                    **dict.fromkeys(dropped["changes"]),
+                    **dict.fromkeys(dropped["appends"]),
+                    **self._dirty,
+                }
+            self._last_queue = None
+
+        if self._last_queue is None and self.checkpoints:
+            self._last_queue = self._checkpoint_queue(len(self.checkpoints) - 1)
+        queue = list(self.ficha)
+
+        changes, appends = self._changed_state()
+        self.checkpoints.append(
+            {
+                "n": self.n,
+                "changes": changes,
+                "appends": appends,
+                "ficha": _queue_delta(queue, self._last_queue or []),
+                "required_decision": encode_state(self.required_decision),
+            }
+        )
+        self._dirty = {}
+        self._last_queue = queue
+        if self.checkpoints_loaded and len(self.checkpoints) > MAX_CHECKPOINTS:
+            self._merge_first_checkpoints()
+
+    def _rebase_checkpoint(self, checkpoint: dict) -> dict:
+        """
+        Refaz as diferenças de uma pausa salva sem os checkpoints guardados
+        em cima do último deles: listas que só cresceram viram "appends" e a
+        fila guarda só o início novo.
+        """
+        changes = {}
+        appends = dict(checkpoint["appends"])
+        for path, value in checkpoint["changes"].items():
+            previous = (
+                self._previous_list(path) if path and isinstance(value, list) else None
+            )
+            if previous is not None and value[: len(previous)] == previous:
+                if len(value) > len(previous):
+                    appends[path] = value[len(previous) :]
+            else:
+                changes[path] = value
+        ficha = checkpoint["ficha"]
+        if not ficha["keep"] and self.checkpoints:
+            previous = self._checkpoint_queue(len(self.checkpoints) - 1)
+            ficha = _queue_delta(decode_state(ficha["head"]), previous)
+        return {**checkpoint, "changes": changes, "appends": appends, "ficha": ficha}
+
+    @property
+    def checkpoints_loaded(self) -> bool:
+        """
+        Se `checkpoints` tem a lista completa. Sem ela (personagem restaurado
+        do estado), `checkpoints` tem só as pausas novas, diferenças em cima
+        dos checkpoints guardados.
+        """
+        return self._stored_checkpoints is None
+
+    def checkpoints_state(self) -> dict:
+        """Checkpoints em dados simples, para guardar fora do estado."""
+        if not self.checkpoints_loaded:
+            raise ValueError("Checkpoints guardados não carregados")
+        return {
+            "format": STATE_FORMAT,
+            "version": STATE_VERSION,
+            "id": self.id,
+            "checkpoints": self.checkpoints,
+        }
+
+    def load_checkpoints(self, state: dict | None):
+        """
+        Junta os checkpoints guardados (checkpoints_state) às pausas novas.
+        Se eles não são os esperados pelo estado (ausentes, de outra versão ou
+        de outro save), todos são descartados: o rewind refaz do zero e o
+        próximo checkpoint guarda a ficha inteira.
+        """
+        if self.checkpoints_loaded:
+            return
+        count, n = self._stored_checkpoints
+        stored = None
+        if (
+            isinstance(state, dict)
+            and state.get("format") == STATE_FORMAT
+            and state.get("version") == STATE_VERSION
+        ):
+            stored = state.get("checkpoints")
+        self._stored_checkpoints = None
+        if isinstance(stored, list) and len(stored) == count and stored[-1]["n"] == n:
+            self.checkpoints, new = stored, self.checkpoints
+            for checkpoint in new:
+                self.checkpoints.append(self._rebase_checkpoint(checkpoint))
+            while len(self.checkpoints) > MAX_CHECKPOINTS:
+                self._merge_first_checkpoints()
+        else:
+            self.checkpoints = []
+            self._dirty = None
+            self._last_queue = None
+
+    def rewind(self, decisions: List[Any]) -> bool:
+        """
+        Leva o personagem para o resultado da lista `decisions` partindo do
+        checkpoint mais recente compatível com ela e reprocessando só o resto.
+        Retorna False se nenhum checkpoint serve (é preciso refazer do zero).
+        Precisa dos checkpoints guardados (load_checkpoints).
+        """
+        if not self.checkpoints_loaded:
+            return False
+        # Os checkpoints são do histórico atual: as decisões já consumidas em
+        # cada um são o início da lista de decisões do personagem
+        current = self.data["decisions"]
+        for index in range(len(self.checkpoints) - 1, -1, -1):
+            n = self.checkpoints[index]["n"]
+            if n <= len(decisions) and current[:n] == decisions[:n]:
+                break
+        else:
+            return False
+
+        data = {}
+        for checkpoint in self.checkpoints[: index + 1]:
+            for path, value in checkpoint["changes"].items():
+                if path == "":
+                    data = decode_state(value)
+                else:
+                    set_nested(data, path, decode_state(value))
+            for path, items in checkpoint["appends"].items():
+                get_nested(data, path).extend(decode_state(items))
+        checkpoint = self.checkpoints[index]
+
+        self.data = data
+        self.data["decisions"] = list(decisions)
+        self.stats = StatGraph()
+        self._computed_paths = None
+        self._snapshot = None
+        self.ficha = deque(self._checkpoint_queue(index))
+        self.n = n
+        self.required_decision = decode_state(checkpoint["required_decision"])
+        self.checkpoints = self.checkpoints[: index + 1]
+        self._dirty = {}
+        self._last_queue = list(self.ficha)
+        self.process_queue()
+        self.process_decisions()
+        return True
+
+    def prepend_ops(self, ops: Sequence[dict]):
+        """Coloca as operações no início da fila, mantendo a ordem delas."""
+        self.ficha.extendleft(reversed(ops))
+
     def run_operation(self):
         if not self.ficha:
             return 1
 
-        op_data = self.ficha.pop(0)
+        op_data = self.ficha.popleft()
         op_args = op_data.copy()
         action = op_args.pop("action", None)
 
@@ -136,7 +443,7 @@ class Character:
 
         if isinstance(result, dict):
             # print(f"    -> Pausando em {action} (Falta decisão {self.n})")
-            self.ficha.insert(0, op_data)
+            self.ficha.appendleft(op_data)
 
         return result
 
@@ -146,11 +453,11 @@ class Character:
 
         return {
             "id": self.id,
-            "name": self.get_stat("personal.name"),
-            "race": self.get_stat("personal.subrace"),
-            "background": self.get_stat("personal.background"),
+            "name": self.read_stat("personal.name"),
+            "race": self.read_stat("personal.subrace"),
+            "background": self.read_stat("personal.background"),
             "class": classes,
-            "level": self.get_stat("properties.level"),
+            "level": self.read_stat("properties.level"),
         }
 
     def get_all(self):
@@ -162,20 +469,20 @@ class Character:
         stats = {}
         for attr in ["str", "dex", "con", "int", "wis", "cha"]:
             stats[attr] = {
-                "score": self.get_stat(f"attributes.{attr}.score"),
-                "modifier": self.get_stat(f"attributes.{attr}.modifier"),
-                "save": self.get_stat(f"attributes.{attr}.save"),
+                "score": self.read_stat(f"attributes.{attr}.score"),
+                "modifier": self.read_stat(f"attributes.{attr}.modifier"),
+                "save": self.read_stat(f"attributes.{attr}.save"),
             }
         print("Atributos Carregados")
 
         # 3. Skills
         skills = []
-        proficiency_bonus = self.get_stat("properties.proficiency")
+        proficiency_bonus = self.read_stat("properties.proficiency")
         all_skills = self.data["proficiency"].get("skill", {})
         for skill_name, data in all_skills.items():
-            total_bonus = self.get_stat(f"proficiency.skill.{skill_name}.bonus")
-            roll = self.get_stat(f"proficiency.skill.{skill_name}.roll")
-            multiplier = self.get_stat(f"proficiency.skill.{skill_name}.multiplier")
+            total_bonus = self.read_stat(f"proficiency.skill.{skill_name}.bonus")
+            roll = self.read_stat(f"proficiency.skill.{skill_name}.roll")
+            multiplier = self.read_stat(f"proficiency.skill.{skill_name}.multiplier")
             skills.append(
                 {
                     "name": skill_name,
@@ -190,10 +497,10 @@ class Character:
 
         # 4. Combate
         combat = {
-            "hp_max": self.get_stat("properties.hit_points"),
-            "ac": self.get_stat("properties.ac"),
-            "initiative": self.get_stat("attributes.initiative"),
-            "speed": self.get_stat("attributes.speed"),
+            "hp_max": self.read_stat("properties.hit_points"),
+            "ac": self.read_stat("properties.ac"),
+            "initiative": self.read_stat("attributes.initiative"),
+            "speed": self.read_stat("attributes.speed"),
             "proficiency_bonus": proficiency_bonus,
         }
         print("Combate Carregado")
@@ -213,8 +520,12 @@ class Character:
                 raw_dano = meta.get("Dano", "0")
 
                 # Resolve valores dinâmicos ({attributes.str.modifier}, etc)
-                val_acerto_str = interpolate_and_eval(raw_acerto, self.data)
-                val_dano = interpolate_and_eval(raw_dano, self.data).replace("+ -", "-")
+                val_acerto_str = interpolate_and_eval(
+                    raw_acerto, self.data, self.read_stat
+                )
+                val_dano = interpolate_and_eval(
+                    raw_dano, self.data, self.read_stat
+                ).replace("+ -", "-")
 
                 # Truque: Para pegar o bônus fixo (ex: +5) de uma string "1d20 + 5",
                 # podemos substituir '1d20' por '0' e avaliar a matemática.
@@ -264,7 +575,7 @@ class Character:
             if resource_path:
                 print(f"Resource path: {resource_path}")
                 # Precisamos buscar o valor real nesse caminho
-                counter_val = self.get_stat(resource_path)
+                counter_val = self.read_stat(resource_path)
 
                 # Se o valor é uma função lambda (comum no seu parser), get_stat já resolve.
                 # Mas se o recurso não foi inicializado corretamente, pode vir None.
@@ -283,11 +594,11 @@ class Character:
         return {
             "header": {
                 "id": self.id,
-                "name": self.get_stat("personal.name"),
-                "race": self.get_stat("personal.subrace")
-                or self.get_stat("personal.race"),
+                "name": self.read_stat("personal.name"),
+                "race": self.read_stat("personal.subrace")
+                or self.read_stat("personal.race"),
                 "class_level": self.data["properties"]["classes"].items(),
-                "background": self.get_stat("personal.background"),
+                "background": self.read_stat("personal.background"),
             },
             "attributes": stats,
             "skills": skills,
@@ -297,8 +608,53 @@ class Character:
             "features": features_list,
         }
 
+    @property
+    def db(self) -> db_handler:
+        # Criado só quando alguma operação precisa consultar o banco: carregar
+        # uma ficha salva para leitura não conecta ao Drive
+        if self._db is None:
+            self._db = get_db_handler(self.access_token, use_local=self.use_local)
+        return self._db
+
     def get_stat(self, path: str) -> Any:
-        return resolve_value(get_nested(self.data, path), self.data)
+        return self.stats.get(self.data, path)
+
+    def set_stat(self, path: str, value: Any):
+        """Escreve na ficha e invalida os stats calculados que dependem do caminho"""
+        set_nested(self.data, path, value)
+        self.stats.invalidate(path)
+        self._snapshot = None
+        if self._dirty is not None:
+            self._dirty.setdefault(path)
+        if self._computed_paths is not None:
+            self._computed_paths = {
+                p
+                for p in self._computed_paths
+                if p != path and not p.startswith(path + ".")
+            }
+            self._computed_paths.update(find_computed(value, path))
+
+    def snapshot(self) -> Mapping[str, Any]:
+        """
+        Valor de todas as propriedades calculadas da ficha, por caminho,
+        resolvidas de uma vez. Fica guardado (somente leitura) até a próxima
+        escrita; get_all e get_basic_infos leem dele em vez de avaliar cada
+        stat de novo.
+        """
+        if self._snapshot is None:
+            if self._computed_paths is None:
+                self._computed_paths = set(find_computed(self.data))
+            self._snapshot = MappingProxyType(
+                {path: self.get_stat(path) for path in sorted(self._computed_paths)}
+            )
+        return self._snapshot
+
+    def read_stat(self, path: str) -> Any:
+        """Como get_stat, mas lendo as propriedades calculadas do snapshot."""
+        values = self.snapshot()
+        if path in values:
+            return values[path]
+        return get_nested(self.data, path)
 
     def update_token(self, new_token: str):
         """
@@ -306,31 +662,86 @@ class Character:
         Essencial ao carregar um personagem salvo, pois o token antigo terá expirado.
         """
         self.access_token = new_token
-        if self.db:
-            self.db.token = new_token
-            # Atualiza tokens dos sub-bancos também
-            for db in self.db.db_list:
-                db.token = new_token
+        if self._db and not self.use_local:
+            self._db.update_token(new_token)
 
     def to_json(self) -> str:
         """Serializa as decisões do personagem para uma string JSON"""
         return json.dumps(self.data["decisions"], indent=4, ensure_ascii=False)
 
-    def to_pickle_string(self) -> str:
-        """Serializa o personagem inteiro para uma string base64"""
-        # Removemos temporariamente o required_decision para economizar espaço ou evitar recursão, se necessário
-        # mas com dill geralmente é tranquilo.
-        binary_data = pickle.dumps(self)
-        return base64.b64encode(binary_data).decode("utf-8")
+    def to_state(self) -> dict:
+        """
+        Estado do personagem em dados simples: a ficha (com as propriedades
+        calculadas guardadas como fórmulas), a fila de operações restante e a
+        posição nas decisões. O banco de dados não entra no estado.
+        """
+        return {
+            "format": STATE_FORMAT,
+            "version": STATE_VERSION,
+            "id": self.id,
+            "n": self.n,
+            "data": encode_state(self.data),
+            "ficha": list(self.ficha),
+            "required_decision": self.required_decision,
+            # Os checkpoints ficam em checkpoints_state; aqui só o que é
+            # preciso para conferir e continuar a lista guardada
+            "checkpoints": self._checkpoints_summary(),
+            "checkpoint_paths": (
+                list(self._dirty) if self._dirty is not None else None
+            ),
+            # Valores calculados no momento do save: ler a ficha carregada
+            # não precisa reavaliar as fórmulas
+            "stats": dict(self.snapshot()),
+        }
+
+    def _checkpoints_summary(self) -> dict:
+        """Quantidade de checkpoints e o n do último, guardados ou novos."""
+        count, n = self._stored_checkpoints or (0, None)
+        if self.checkpoints:
+            n = self.checkpoints[-1]["n"]
+        return {"count": count + len(self.checkpoints), "n": n}
+
+    def to_state_string(self) -> str:
+        """Serializa o estado do personagem para uma string JSON compacta"""
+        return json.dumps(self.to_state(), separators=(",", ":"), ensure_ascii=False)
 
     @staticmethod
-    def from_pickle_string(pickle_str: str, new_token: str) -> "Character":
-        """Recria o personagem a partir da string base64 e atualiza o token"""
-        binary_data = base64.b64decode(pickle_str.encode("utf-8"))
-        char = pickle.loads(binary_data)
-        char.update_token(new_token)
+    def from_state(state: dict, new_token: str) -> "Character":
+        """Recria o personagem a partir do estado, sem reprocessar a fila"""
+        if state.get("format") != STATE_FORMAT or state.get("version") != STATE_VERSION:
+            raise ValueError(
+                f"Versão de estado não suportada: {state.get('version')!r}"
+            )
+        char = Character.__new__(Character)
+        char.id = state["id"]
+        char.access_token = new_token
+        char.use_local = False
+        char._db = None
+        char.data = decode_state(state["data"])
+        char.stats = StatGraph()
+        char._computed_paths = None
+        char._snapshot = None
+        if "stats" in state:
+            char.stats.preload(state["stats"])
+            char._computed_paths = set(state["stats"])
+        char.n = state["n"]
+        char.ficha = deque(state["ficha"])
+        char.required_decision = state["required_decision"]
+        # Os checkpoints guardados só são lidos para o rewind (load_checkpoints)
+        stored = state["checkpoints"]
+        char.checkpoints = []
+        char._stored_checkpoints = (
+            (stored["count"], stored["n"]) if stored["count"] else None
+        )
+        paths = state["checkpoint_paths"]
+        char._dirty = dict.fromkeys(paths) if paths is not None else None
+        char._last_queue = None
         return char
 
+    @staticmethod
+    def from_state_string(state_str: str, new_token: str) -> "Character":
+        return Character.from_state(json.loads(state_str), new_token)
+
 
 # Main =======================================================
 def main():
@@ -413,7 +824,7 @@ def main():
     print(f'Bônus de Proficiência: {personagem.get_stat("properties.proficiency")}')
 
     print("-> Tornando proficiente em Atletismo...")
-    personagem.data["proficiency"]["skill"]["Atletismo"]["multiplier"] = 1
+    personagem.set_stat("proficiency.skill.Atletismo.multiplier", 1)
     atletismo_bonus_novo = personagem.get_stat("proficiency.skill.Atletismo.bonus")
     print(
         f"Bônus Atletismo (Proficiente): {atletismo_bonus_novo}"
@@ -0,0 +1,214 @@
+import hashlib
+import json
+import mmap
+import os
+import pickle
+import struct
+from functools import lru_cache
+from typing import Any, Dict
+
+# Artefato pré-compilado por módulo, gerado pelo CompactarBD:
+#   BD/_compilado/{módulo}.bin = MAGIC + tamanho do cabeçalho + cabeçalho + blobs
+# O cabeçalho indexa cada arquivo JSON do módulo (hash do conteúdo, offset e
+# tamanho do blob pickle). Se o hash não bater com o JSON atual, quem carrega
+# volta a usar o JSON.
+#
+# Junto dele fica o índice de offsets BD/_compilado/{módulo}.idx, que mapeia
+# cada entidade do JSON compacto (chave de 1º nível) para o intervalo de bytes
+# do seu valor, permitindo decodificar só uma entidade via mmap.
+COMPILED_FOLDER = "_compilado"
+MAGIC = b"JDB1"
+FORMAT_VERSION = 1
+PICKLE_PROTOCOL = 5
+
+_PREFIX = struct.Struct("<4sI")
+
+
+def content_hash(raw: bytes) -> str:
+    return hashlib.sha256(raw).hexdigest()
+
+
+def artifact_path(bd_path: str, module: str) -> str:
+    return os.path.join(bd_path, COMPILED_FOLDER, f"{module}.bin")
+
+
+def offset_index_path(bd_path: str, module: str) -> str:
+    return os.path.join(bd_path, COMPILED_FOLDER, f"{module}.idx")
+
+
+def write_artifact(module_path: str, output_path: str) -> Dict[str, Any]:
+    """Gera o artefato de um módulo a partir dos seus arquivos JSON."""
+    files = {}
+    blobs = []
+    offset = 0
+    for filename in sorted(os.listdir(module_path)):
+        if not filename.lower().endswith(".json"):
+            continue
+        with open(os.path.join(module_path, filename), "rb") as f:
+            raw = f.read()
+        blob = pickle.dumps(json.loads(raw), protocol=PICKLE_PROTOCOL)
+        files[filename] = {
+            "sha256": content_hash(raw),
+            "offset": offset,
+            "length": len(blob),
+        }
+        blobs.append(blob)
+        offset += len(blob)
+
+    header = pickle.dumps(
+        {"version": FORMAT_VERSION, "files": files}, protocol=PICKLE_PROTOCOL
+    )
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, "wb") as f:
+        f.write(_PREFIX.pack(MAGIC, len(header)))
+        f.write(header)
+        for blob in blobs:
+            f.write(blob)
+    return files
+
+
+@lru_cache(maxsize=64)
+def _read_header(path: str, mtime_ns: int, size: int) -> Dict[str, Any] | None:
+    # mtime/size fazem parte da chave: o cabeçalho é relido se o artefato mudar
+    with open(path, "rb") as f:
+        magic, header_len = _PREFIX.unpack(f.read(_PREFIX.size))
+        if magic != MAGIC:
+            return None
+        header = pickle.loads(f.read(header_len))
+    if header.get("version") != FORMAT_VERSION:
+        return None
+    header["data_start"] = _PREFIX.size + header_len
+    return header
+
+
+def read_header(path: str) -> Dict[str, Any] | None:
+    try:
+        stat = os.stat(path)
+        return _read_header(path, stat.st_mtime_ns, stat.st_size)
+    except (OSError, pickle.UnpicklingError, struct.error, EOFError):
+        return None
+
+
+def load_compiled(path: str, filename: str, raw: bytes) -> Any:
+    """
+    Carrega `filename` do artefato se o hash registrado bater com o conteúdo
+    JSON atual (`raw`). Retorna None quando o artefato não serve.
+    """
+    header = read_header(path)
+    if not header:
+        return None
+    entry = header["files"].get(filename)
+    if not entry or entry["sha256"] != content_hash(raw):
+        return None
+    try:
+        with open(path, "rb") as f:
+            f.seek(header["data_start"] + entry["offset"])
+            return pickle.loads(f.read(entry["length"]))
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+
+
+# --- Índice de offsets (leitura preguiçosa por entidade) ---
+def _key_prefix(key: str) -> bytes:
+    return (json.dumps(key, ensure_ascii=False) + ":").encode("utf-8")
+
+
+def build_offsets(raw: bytes) -> Dict[str, list] | None:
+    """
+    Calcula chave -> [início, fim] do valor de cada entidade no JSON compacto
+    (gerado com separators=(",", ":") e ensure_ascii=False). Retorna None se o
+    arquivo não estiver nesse formato.
+    """
+    data = json.loads(raw)
+    if not isinstance(data, dict):
+        return None
+
+    offsets = {}
+    position = 1  # pula o "{"
+    for key, value in data.items():
+        start = position + len(_key_prefix(key))
+        encoded = json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+        end = start + len(encoded.encode("utf-8"))
+        offsets[key] = [start, end]
+        position = end + 1  # pula a "," (ou o "}" final)
+
+    # Confere se a reconstrução bate com o arquivo real
+    if position != len(raw.rstrip()):
+        return None
+    for key, (start, end) in offsets.items():
+        if raw[start - len(_key_prefix(key)) : start] != _key_prefix(key):
+            return None
+    return offsets
+
+
+def write_offset_index(module_path: str, output_path: str) -> Dict[str, Any]:
+    """Gera o índice de offsets de todos os arquivos JSON de um módulo."""
+    index = {}
+    for filename in sorted(os.listdir(module_path)):
+        if not filename.lower().endswith(".json"):
+            continue
+        with open(os.path.join(module_path, filename), "rb") as f:
+            raw = f.read()
+        offsets = build_offsets(raw)
+        if offsets is not None:
+            index[filename] = {
+                "sha256": content_hash(raw),
+                "size": len(raw),
+                "entities": offsets,
+            }
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, separators=(",", ":"), ensure_ascii=False)
+    return index
+
+
+@lru_cache(maxsize=64)
+def _read_offset_index(path: str, mtime_ns: int, size: int) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+@lru_cache(maxsize=256)
+def _matches_hash(path: str, mtime_ns: int, size: int, expected: str) -> bool:
+    # O hash do JSON é conferido uma vez por versão (mtime/size) do arquivo
+    with open(path, "rb") as f:
+        return content_hash(f.read()) == expected
+
+
+def read_entity(index_path: str, json_path: str, filename: str, key: str):
+    """
+    Lê uma única entidade do JSON compacto usando o índice de offsets.
+    Retorna (True, valor), (True, None) se a entidade não existe no arquivo, ou
+    (False, None) se o índice não pode ser usado (ausente ou desatualizado).
+    """
+    try:
+        stat = os.stat(index_path)
+        index = _read_offset_index(index_path, stat.st_mtime_ns, stat.st_size)
+    except (OSError, ValueError):
+        return False, None
+
+    entry = index.get(filename)
+    json_stat = os.stat(json_path)
+    if not entry or json_stat.st_size != entry["size"]:
+        return False, None
+    if not _matches_hash(
+        json_path, json_stat.st_mtime_ns, json_stat.st_size, entry["sha256"]
+    ):
+        return False, None
+
+    span = entry["entities"].get(key)
+    if span is None:
+        return True, None
+
+    start, end = span
+    prefix = _key_prefix(key)
+    with open(json_path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            # O prefixo "chave": antes do valor confirma que o offset é válido
+            if view[start - len(prefix) : start] != prefix:
+                return False, None
+            try:
+                return True, json.loads(view[start:end])
+            except ValueError:
+                return False, None
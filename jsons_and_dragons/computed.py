@@ -0,0 +1,298 @@
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Iterator, List, Set
+
+from .utils import get_nested, interpolate_and_eval, resolve_value
+
+# Propriedades calculadas da ficha.
+# Antes eram closures criadas pelas operações (SET, INCREMENT, INIT_PROFICIENCY),
+# que só podiam ser salvas com dill. Aqui cada tipo de cálculo é uma classe
+# chamável que guarda apenas dados simples (texto da fórmula, valor base...),
+# então pode ser convertida para JSON e reconstruída ao carregar a ficha.
+
+STATE_KEY = "$computed"
+
+Resolver = Callable[[str], Any]
+
+
+class Computed(ABC):
+    """
+    Base das propriedades calculadas. `evaluate` recebe a função que busca o
+    valor de cada caminho referenciado (o StatGraph passa a sua, com cache);
+    chamar a propriedade diretamente lê os caminhos do próprio contexto.
+    """
+
+    kind: str = ""
+
+    def __call__(self, context: Dict) -> Any:
+        return self.evaluate(
+            context, lambda path: resolve_value(get_nested(context, path), context)
+        )
+
+    @abstractmethod
+    def evaluate(self, context: Dict, resolve: Resolver) -> Any: ...
+
+    @abstractmethod
+    def to_state(self) -> Dict[str, Any]: ...
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_state()})"
+
+
+class Formula(Computed):
+    """Fórmula com referências `{caminho}` avaliada a cada leitura."""
+
+    kind = "formula"
+
+    def __init__(self, source: str):
+        self.source = source
+
+    def evaluate(self, context: Dict, resolve: Resolver) -> Any:
+        return interpolate_and_eval(self.source, context, resolve)
+
+    def to_state(self) -> Dict[str, Any]:
+        return {STATE_KEY: self.kind, "source": self.source}
+
+
+class Increment(Computed):
+    """
+    Soma um valor fixo ou uma fórmula a um valor base, que pode ser um número
+    ou outra propriedade calculada (INCREMENT sobre um valor já existente).
+    """
+
+    kind = "increment"
+
+    def __init__(self, base: Any, value: Any = None, formula: str = None):
+        self.base = base
+        self.value = value
+        self.formula = formula
+
+    def evaluate(self, context: Dict, resolve: Resolver) -> Any:
+        # Vários níveis de INCREMENT formam uma cadeia: soma iterativamente,
+        # do valor mais antigo para o mais novo, sem recursão
+        chain = []
+        node = self
+        while isinstance(node, Increment):
+            chain.append(node)
+            node = node.base
+
+        if isinstance(node, Computed):
+            total = node.evaluate(context, resolve)
+        else:
+            total = node(context) if callable(node) else node
+        for increment in reversed(chain):
+            if increment.formula is None:
+                total = total + increment.value
+            else:
+                total = total + interpolate_and_eval(
+                    increment.formula, context, resolve
+                )
+        return total
+
+    def to_state(self) -> Dict[str, Any]:
+        return {
+            STATE_KEY: self.kind,
+            "base": encode_state(self.base),
+            "value": self.value,
+            "formula": self.formula,
+        }
+
+
+class ProficiencyBonus(Computed):
+    """Bônus de uma proficiência: modificador do atributo + PB * multiplicador."""
+
+    kind = "proficiency_bonus"
+
+    def __init__(self, category: str, name: str):
+        self.category = category
+        self.name = name
+
+    def evaluate(self, context: Dict, resolve: Resolver) -> Any:
+        # 1. Recupera o objeto da perícia atual do contexto (multiplier atualizado)
+        p_data = resolve(f"proficiency.{self.category}.{self.name}")
+        if not p_data:
+            return 0
+
+        # 2. Descobre qual atributo usar e qual o multiplicador atual
+        attr_key = p_data.get("attribute")
+        mult = p_data.get("multiplier", 0)
+
+        # 3. Busca o modificador do atributo (resolvendo recursivamente)
+        attr_mod = 0
+        if attr_key:
+            attr_mod = resolve(f"attributes.{attr_key}.modifier")
+
+        # 4. Busca o bônus de proficiência global
+        pb = resolve("properties.proficiency")
+
+        # 5. Calcula: Mod + (PB * Multiplier)
+        try:
+            return int(int(attr_mod) + (int(pb) * float(mult)))
+        except (ValueError, TypeError):
+            return 0
+
+    def to_state(self) -> Dict[str, Any]:
+        return {STATE_KEY: self.kind, "category": self.category, "name": self.name}
+
+
+COMPUTED_TYPES = {cls.kind: cls for cls in (Formula, Increment, ProficiencyBonus)}
+
+
+# --- Grafo de stats ---
+def _overlaps(path: str, other: str) -> bool:
+    """Um caminho contém o outro (ou são iguais)."""
+    return path == other or path.startswith(other + ".") or other.startswith(path + ".")
+
+
+class StatGraph:
+    """
+    Avalia as propriedades calculadas da ficha com cache.
+
+    Cada valor calculado fica memorizado junto dos caminhos que ele leu (as
+    arestas do grafo, descobertas durante a avaliação). Escrever em um caminho
+    (Character.set_stat) invalida só os valores que dependem dele, direta ou
+    indiretamente. Uma referência circular vale 0 em vez de estourar a pilha.
+
+    Valores vindos do estado salvo (`preload`) não têm arestas conhecidas:
+    valem até a primeira escrita, que descarta todos eles.
+    """
+
+    def __init__(self):
+        self.values: Dict[str, Any] = {}
+        self.dependencies: Dict[str, Set[str]] = {}
+        self.dependents: Dict[str, Set[str]] = {}
+        self.saved: Dict[str, Any] = {}
+        self._evaluating: List[str] = []
+
+    def preload(self, values: Dict[str, Any]):
+        self.saved = dict(values)
+
+    def resolved(self) -> Dict[str, Any]:
+        """Todos os valores calculados conhecidos, por caminho."""
+        return {**self.saved, **self.values}
+
+    def get(self, data: Dict, path: str) -> Any:
+        if path in self.values:
+            return self.values[path]
+        if path in self.saved:
+            return self.saved[path]
+
+        raw = get_nested(data, path)
+        if not callable(raw):
+            return raw
+        if path in self._evaluating:
+            cycle = " -> ".join(self._evaluating + [path])
+            print(f"(X) Referência circular entre stats: {cycle}")
+            return 0
+
+        read = set()
+
+        def resolve(dependency: str) -> Any:
+            read.add(dependency)
+            return self.get(data, dependency)
+
+        self._evaluating.append(path)
+        try:
+            if isinstance(raw, Computed):
+                value = raw.evaluate(data, resolve)
+            else:
+                value = raw(data)
+        finally:
+            self._evaluating.pop()
+
+        self.values[path] = value
+        self.dependencies[path] = read
+        for dependency in read:
+            self.dependents.setdefault(dependency, set()).add(path)
+        return value
+
+    def invalidate(self, path: str):
+        """Descarta os valores afetados por uma escrita em `path`."""
+        self.saved.clear()
+        if not self.values:
+            return
+        pending = [path]
+        visited = set()
+        while pending:
+            changed = pending.pop()
+            if changed in visited:
+                continue
+            visited.add(changed)
+
+            stale = {p for p in self.values if _overlaps(p, changed)}
+            for dependency, nodes in self.dependents.items():
+                if _overlaps(dependency, changed):
+                    stale |= nodes
+            for node in stale:
+                self._forget(node)
+                pending.append(node)
+
+    def _forget(self, path: str):
+        self.values.pop(path, None)
+        for dependency in self.dependencies.pop(path, ()):
+            nodes = self.dependents.get(dependency)
+            if nodes:
+                nodes.discard(path)
+                if not nodes:
+                    del self.dependents[dependency]
+
+    def clear(self):
+        self.saved.clear()
+        self.values.clear()
+        self.dependencies.clear()
+        self.dependents.clear()
+
+
+# --- Conversão para dados simples ---
+def find_computed(value: Any, path: str = "") -> Iterator[str]:
+    """
+    Caminhos de todas as propriedades calculadas dentro de `value`. Uma
+    estrutura que contém a si mesma é visitada uma vez só.
+    """
+    if callable(value):
+        yield path
+    if not isinstance(value, (dict, list)):
+        return
+    stack = [(value, path)]
+    visited = set()
+    while stack:
+        node, node_path = stack.pop()
+        if id(node) in visited:
+            continue
+        visited.add(id(node))
+        prefix = f"{node_path}." if node_path else ""
+        items = node.items() if isinstance(node, dict) else enumerate(node)
+        for key, item in items:
+            if isinstance(item, (dict, list)):
+                stack.append((item, f"{prefix}{key}"))
+            elif callable(item):
+                yield f"{prefix}{key}"
+
+
+def encode_state(value: Any) -> Any:
+    """Troca as propriedades calculadas por dicts {"$computed": tipo, ...}."""
+    if isinstance(value, Computed):
+        return value.to_state()
+    if isinstance(value, dict):
+        return {key: encode_state(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [encode_state(item) for item in value]
+    if callable(value):
+        raise TypeError(f"Propriedade calculada sem formato serializável: {value!r}")
+    return value
+
+
+def decode_state(value: Any) -> Any:
+    """Inverso de encode_state: reconstrói as propriedades calculadas."""
+    if isinstance(value, dict):
+        kind = value.get(STATE_KEY)
+        if kind is None:
+            return {key: decode_state(item) for key, item in value.items()}
+        if kind == Increment.kind:
+            return Increment(
+                decode_state(value["base"]), value["value"], value["formula"]
+            )
+        args = {key: item for key, item in value.items() if key != STATE_KEY}
+        return COMPUTED_TYPES[kind](**args)
+    if isinstance(value, list):
+        return [decode_state(item) for item in value]
+    return value
@@ -1,174 +1,365 @@
 import json
+import marshal
 import os
-from typing import Any, Dict, List
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
 
-from Api.gdrive import ensure_path, get_file_content
+from Api.gdrive import (
+    ensure_path,
+    get_file_content,
+    list_folder_files,
+    user_cache_key,
+)
 
-from .utils import get_nested
+from .cache import module_cache
+from .compiled import (
+    artifact_path,
+    load_compiled,
+    offset_index_path,
+    read_entity,
+)
+from .index import CatalogFile
+from .query import check_in, compile_filter, compile_query, compile_step
 
 # Configuração
 ROOT_FOLDER = "JSONs_and_Dragons"
 DB_FOLDER = "BD"
+# Tempo (s) em que a listagem de uma pasta de módulo no Drive é reaproveitada
+LISTING_TTL = 30.0
+# Tempo (s) em que o db_handler de um usuário é reaproveitado entre requisições
+HANDLER_TTL = float(os.getenv("DB_HANDLER_TTL", "300"))
+MAX_HANDLERS = 1000
+
+
+def copy_data(data: Any) -> Any:
+    """Cópia profunda e rápida de dados JSON (dict, list, str, números)."""
+    return marshal.loads(marshal.dumps(data))
+
+
+def _merge_into(target: Dict[str, Any], source: Dict[str, Any]) -> None:
+    """
+    Mescla `source` em `target` com as mesmas regras do db_handler.query:
+    listas de "operations" são concatenadas e o resto é sobrescrito pelo
+    módulo mais recente. Dicionários são mesclados recursivamente, para que
+    a regra valha em qualquer profundidade da query (ex: classes/X/level_3).
+    """
+    for key, value in source.items():
+        current = target.get(key)
+        if (
+            key == "operations"
+            and isinstance(value, list)
+            and isinstance(current, list)
+        ):
+            target[key] = current + copy_data(value)
+        elif isinstance(value, dict) and isinstance(current, dict):
+            _merge_into(current, value)
+        else:
+            target[key] = copy_data(value)
+
+
+def drive_file_key(file: Dict[str, Any], endereço: str, filename: str) -> Tuple:
+    """Chave no module_cache de um arquivo do Drive (metadados da listagem)."""
+    version = file.get("md5Checksum") or file.get("modifiedTime")
+    return (file["id"], endereço, filename, version)
+
+
+def preload_drive_file(
+    file: Dict[str, Any], endereço: str, filename: str, data: Any, size: int
+) -> None:
+    """
+    Coloca no module_cache um arquivo que acabou de ser enviado ao Drive,
+    com os índices já montados; a primeira query não precisa baixá-lo.
+    """
+    catalog = CatalogFile(data)
+    if catalog:
+        module_cache.put(drive_file_key(file, endereço, filename), catalog, size)
 
 
 class db_homebrew:
     def __init__(
-        self, endereço: str, access_token: str | None = None, use_local: bool = False
+        self,
+        endereço: str,
+        access_token: str | None = None,
+        use_local: bool = False,
+        folder_id: str | None = None,
     ):
         self.endereço = endereço
         self.token = access_token
         self.use_local = use_local
-        self.folder_id = None
+        self.folder_id = folder_id
+        self._drive_files = None
+        self._drive_files_expires = 0.0
 
         # Se NÃO for local, precisamos garantir que a pasta existe no Drive
-        if not self.use_local and self.token:
+        if not self.use_local and self.token and not self.folder_id:
             self.folder_id = ensure_path(
                 self.token, [ROOT_FOLDER, DB_FOLDER, self.endereço]
             )
 
     def _check_in_filter(self, target_value: Any, expected_value: str) -> bool:
-        if not target_value:
-            return False
-        if isinstance(target_value, list):
-            return any(
-                (isinstance(item, dict) and item.get("name") == expected_value)
-                or (isinstance(item, str) and item == expected_value)
-                for item in target_value
-            )
-        if isinstance(target_value, str):
-            return target_value == expected_value
-        return False
+        return check_in(target_value, expected_value)
 
     def _apply_filter(self, data: Dict[str, Any], filter_str: str) -> Dict[str, Any]:
-        if " AND " in filter_str:
-            subparts = filter_str.split(" AND ")
-            filtered_data = data
-            for subpart in subparts:
-                filtered_data = self._apply_filter(filtered_data, subpart.strip())
-            return filtered_data
-        elif " == " in filter_str:
-            path, expected_value_raw = filter_str.split(" == ", 1)
-            expected_value = expected_value_raw.strip().strip("'")
-            return {
-                key: value
-                for key, value in data.items()
-                if str(get_nested(value, path.strip())) == expected_value
-            }
-        elif " in " in filter_str:
-            expected_value_raw, path_raw = filter_str.split(" in ", 1)
-            expected_value = expected_value_raw.strip().strip("'")
-            return {
-                key: value
-                for key, value in data.items()
-                if self._check_in_filter(
-                    get_nested(value, path_raw.strip()), expected_value
-                )
-            }
-        return data
+        return compile_filter(filter_str).apply(data)
 
     def query_parts(self, part: str, dados: Dict[str, Any]) -> Dict[str, Any]:
-        if "==" in part or " in " in part:
-            parts = part.rsplit("/", 1)
-            filter_only = parts[0]
-            return_field = parts[1] if len(parts) > 1 else None
-            filtered_data = self._apply_filter(dados, filter_only)
-            if return_field == "keys":
-                return {key: key for key in filtered_data.keys()}
-            if return_field:
-                return {
-                    key: get_nested(value, return_field.strip())
-                    for key, value in filtered_data.items()
-                    if get_nested(value, return_field.strip()) is not None
-                }
-            return filtered_data
-        return dados.get(part, {})
+        return compile_step(part).apply(dados)
 
-    def _fetch_content(self, filename: str) -> Dict[str, Any]:
-        """Método helper para abstrair a fonte do dado (Local vs Drive)"""
+    def _local_path(self, filename: str) -> str | None:
+        # Assume que a pasta BD está na raiz do projeto ou no diretório de execução
+        # Caminho: ./BD/{endereço}/{filename}
+        local_path = os.path.join(DB_FOLDER, self.endereço, filename)
+
+        if not os.path.exists(local_path):
+            # Fallback: Tentar achar em relação ao arquivo atual se o path relativo falhar
+            base_dir = os.path.dirname(os.path.abspath(__file__))  # jsons_and_dragons/
+            root_dir = os.path.dirname(base_dir)  # Raiz do projeto
+            local_path = os.path.join(root_dir, DB_FOLDER, self.endereço, filename)
+
+        return local_path if os.path.exists(local_path) else None
+
+    def _locate(self, filename: str):
+        """
+        Resolve a chave de cache do arquivo (origem, módulo, arquivo, versão)
+        e a função que o carrega. Retorna None se o arquivo não existe.
+        A versão é o mtime local ou o md5/modifiedTime do Drive.
+        """
 
         # --- MODO LOCAL ---
         if self.use_local:
-            # Assume que a pasta BD está na raiz do projeto ou no diretório de execução
-            # Caminho: ./BD/{endereço}/{filename}
-            local_path = os.path.join(DB_FOLDER, self.endereço, filename)
-
-            # Tenta buscar, se não achar retorna vazio (igual ao comportamento da API)
-            if not os.path.exists(local_path):
-                # Fallback: Tentar achar em relação ao arquivo atual se o path relativo falhar
-                base_dir = os.path.dirname(
-                    os.path.abspath(__file__)
-                )  # jsons_and_dragons/
-                root_dir = os.path.dirname(base_dir)  # Raiz do projeto
-                local_path = os.path.join(root_dir, DB_FOLDER, self.endereço, filename)
-
-            if os.path.exists(local_path):
+            local_path = self._local_path(filename)
+            # Se não achar retorna vazio (igual ao comportamento da API)
+            if not local_path:
+                return None
+
+            stat = os.stat(local_path)
+            version = (stat.st_mtime_ns, stat.st_size)
+
+            def load_local():
                 try:
-                    with open(local_path, "r", encoding="utf-8") as f:
-                        return json.load(f)
+                    with open(local_path, "rb") as f:
+                        raw = f.read()
+                    # Usa o artefato pré-compilado se ele corresponder ao JSON
+                    bd_path = os.path.dirname(os.path.dirname(local_path))
+                    data = load_compiled(
+                        artifact_path(bd_path, self.endereço), filename, raw
+                    )
+                    if data is None:
+                        data = json.loads(raw)
+                    return CatalogFile(data), stat.st_size
                 except Exception as e:
                     print(f"Erro ao ler arquivo local {local_path}: {e}")
-                    return {}
-            return {}
+                    return None, 0
+
+            key = (os.path.abspath(local_path), self.endereço, filename, version)
+            return key, load_local
 
         # --- MODO DRIVE ---
-        return get_file_content(self.token, filename=filename, parent_id=self.folder_id)
+        file = self._list_drive_files().get(filename)
+        if not file:
+            print(f"Erro: Arquivo '{filename}' não encontrado no Drive.")
+            return None
+
+        def load_drive():
+            content = get_file_content(self.token, file_id=file["id"])
+            if not isinstance(content, dict):
+                return None, 0
+            return CatalogFile(content), int(file.get("size", 0))
+
+        return drive_file_key(file, self.endereço, filename), load_drive
+
+    def _list_drive_files(self) -> Dict[str, Any]:
+        """
+        Lista a pasta do módulo uma vez (nome -> id, md5, modifiedTime) e
+        reaproveita a listagem por alguns segundos; assim cada arquivo custa
+        no máximo o download.
+        """
+        if self._drive_files is None or time.monotonic() > self._drive_files_expires:
+            self._drive_files = list_folder_files(self.token, self.folder_id)
+            self._drive_files_expires = time.monotonic() + LISTING_TTL
+        return self._drive_files
+
+    def _fetch_file(self, filename: str) -> CatalogFile | None:
+        """
+        Método helper para abstrair a fonte do dado (Local vs Drive).
+        O conteúdo parseado (e seus índices) fica no cache compartilhado do
+        processo, indexado pela versão do arquivo.
+        """
+        located = self._locate(filename)
+        if not located:
+            return None
+        return module_cache.get_or_load(*located)
+
+    def _read_entity(self, local_path: str, plan: Any):
+        bd_path = os.path.dirname(os.path.dirname(local_path))
+        usable, entity = read_entity(
+            offset_index_path(bd_path, self.endereço),
+            local_path,
+            plan.filename,
+            plan.entity,
+        )
+        if not usable:
+            return False, None
+        if entity is None:
+            return True, {}
+        # O valor acabou de ser decodificado: não precisa de cópia
+        return True, plan.run({plan.entity: entity})
+
+    def _fetch_content(self, filename: str) -> Dict[str, Any]:
+        file = self._fetch_file(filename)
+        return file.data if file else {}
 
     def query(self, query: str) -> Dict[str, Any]:
-        parts = query.split("/")
-        filename = f"{parts[0]}.json"
+        # O plano compilado fica em cache: a string só é parseada na 1ª vez
+        plan = compile_query(query)
+
+        located = self._locate(plan.filename)
+        if not located:
+            return {}
+
+        # Busca de uma entidade só: se o arquivo ainda não está em cache,
+        # decodifica apenas o trecho dela usando o índice de offsets
+        if self.use_local and plan.entity is not None:
+            if module_cache.peek(located[0]) is None:
+                found, result = self._read_entity(located[0][0], plan)
+                if found:
+                    return result
 
         # Usa o helper para pegar o conteúdo (seja do Drive ou Local)
-        current_data = self._fetch_content(filename)
+        file = module_cache.get_or_load(*located)
 
-        if not current_data:
+        if not file:
             return {}
 
-        for i in range(1, len(parts)):
-            part = parts[i]
-            if part == "keys":
-                return list(current_data.keys())
-            current_data = self.query_parts(part, current_data)
-            if not current_data and i < len(parts) - 1:
-                return {}
-        return current_data if isinstance(current_data, dict) else {}
+        result = plan.run(file.data, file.index)
+        # O conteúdo vem do cache compartilhado: devolve uma cópia para que
+        # quem chamou possa alterar o resultado sem corromper o cache
+        return copy_data(result) if isinstance(result, dict) else result
+
+
+def read_local_modules() -> List[str]:
+    """Lista de módulos do metadata.json do BD/ local."""
+    local_meta_path = os.path.join(DB_FOLDER, "metadata.json")
+    if not os.path.exists(local_meta_path):
+        # Fallback de caminho
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        root_dir = os.path.dirname(base_dir)
+        local_meta_path = os.path.join(root_dir, DB_FOLDER, "metadata.json")
+
+    if not os.path.exists(local_meta_path):
+        return []
+    with open(local_meta_path, "r", encoding="utf-8") as f:
+        return json.load(f).get("modules", [])
+
+
+@lru_cache(maxsize=1)
+def base_modules() -> Tuple[str, ...]:
+    """Módulos oficiais (dnd_2014, tasha_cauldron...), distribuídos no BD/ local."""
+    return tuple(read_local_modules())
+
+
+@lru_cache(maxsize=None)
+def base_catalog(endereço: str) -> db_homebrew:
+    """
+    Módulo lido do BD/ local, uma instância por processo compartilhada por
+    todos os usuários. Somente leitura: as queries devolvem cópias e o
+    conteúdo fica uma vez só no module_cache.
+    """
+    return db_homebrew(endereço, use_local=True)
 
 
 class db_handler(db_homebrew):
-    def __init__(self, access_token: str = None, use_local: bool = False):
+    def __init__(
+        self, access_token: str = None, use_local: bool = False, merged: bool = False
+    ):
+        """
+        Com `merged=True`, cada categoria (spells, feats, classes...) é
+        mesclada uma única vez entre todos os módulos e as queries rodam
+        sobre esse catálogo único, em vez de rodar uma vez por módulo.
+        """
         self.token = access_token
         self.use_local = use_local
+        self.merged = merged
         self.db_list = []
 
         list_endereços = []
 
         if self.use_local:
             # Lógica Local: Lê metadata.json direto do disco
-            local_meta_path = os.path.join(DB_FOLDER, "metadata.json")
-            if not os.path.exists(local_meta_path):
-                # Fallback de caminho
-                base_dir = os.path.dirname(os.path.abspath(__file__))
-                root_dir = os.path.dirname(base_dir)
-                local_meta_path = os.path.join(root_dir, DB_FOLDER, "metadata.json")
-
-            if os.path.exists(local_meta_path):
-                with open(local_meta_path, "r", encoding="utf-8") as f:
-                    meta_content = json.load(f)
-                    list_endereços = meta_content.get("modules", [])
+            list_endereços = read_local_modules()
         else:
-            # Lógica Drive: Busca via API
+            # Lógica Drive: uma listagem da pasta BD traz o metadata.json e as
+            # pastas de todos os módulos
             bd_root_id = ensure_path(self.token, [ROOT_FOLDER, DB_FOLDER])
-            meta_content = get_file_content(
-                self.token, filename="metadata.json", parent_id=bd_root_id
+            bd_entries = list_folder_files(self.token, bd_root_id)
+            meta_file = bd_entries.get("metadata.json")
+            meta_content = (
+                get_file_content(self.token, file_id=meta_file["id"])
+                if meta_file
+                else None
             )
             list_endereços = meta_content.get("modules", []) if meta_content else []
 
-        # Instancia os sub-bancos propagando a flag use_local
+        # Instancia os sub-bancos propagando a flag use_local. Os módulos
+        # oficiais vêm sempre do catálogo local compartilhado; só a homebrew
+        # do usuário é lida do Drive, na ordem do metadata.json dele
+        oficiais = set(base_modules())
         for endereço in list_endereços:
+            if self.use_local or endereço in oficiais:
+                self.db_list.append(base_catalog(endereço))
+                continue
+            folder_id = bd_entries.get(endereço, {}).get("id")
             self.db_list.append(
-                db_homebrew(endereço, self.token, use_local=self.use_local)
+                db_homebrew(endereço, self.token, use_local=False, folder_id=folder_id)
             )
 
+    def update_token(self, access_token: str):
+        """Troca o token (ex: renovado pelo login) do handler e dos sub-bancos."""
+        self.token = access_token
+        for db in self.db_list:
+            # O catálogo oficial é compartilhado entre usuários e não usa token
+            if not db.use_local:
+                db.token = access_token
+
+    def _fetch_merged(self, filename: str) -> CatalogFile | None:
+        """Catálogo mesclado de um arquivo entre todos os módulos (em cache)."""
+        located = [db._locate(filename) for db in self.db_list]
+        located = [item for item in located if item]
+        if not located:
+            return None
+
+        # A chave combina a identidade e a versão de cada arquivo mesclado
+        keys = [key for key, _ in located]
+        cache_key = (
+            "merged",
+            tuple(key[:-1] for key in keys),
+            filename,
+            tuple(key[-1] for key in keys),
+        )
+
+        def load_merged():
+            catalog = {}
+            size = 0
+            for key, loader in located:
+                file = module_cache.get_or_load(key, loader)
+                if file and isinstance(file.data, dict):
+                    _merge_into(catalog, file.data)
+                    size += module_cache.size_of(key)
+            return CatalogFile(catalog), size
+
+        return module_cache.get_or_load(cache_key, load_merged)
+
     def query(self, query: str):
+        if self.merged:
+            plan = compile_query(query)
+            file = self._fetch_merged(plan.filename)
+            if not file:
+                return {}
+            result = plan.run(file.data, file.index)
+            return copy_data(result) if isinstance(result, dict) else result
+
         response = {}
         for db in self.db_list:
             resultado_parcial = db.query(query)
@@ -195,3 +386,65 @@ class db_handler(db_homebrew):
                 elif isinstance(response, list) and isinstance(resultado_parcial, list):
                     response.extend(resultado_parcial)
         return response
+
+
+class HandlerRegistry:
+    """
+    db_handlers já montados (metadata.json lido, pastas dos módulos
+    resolvidas), um por usuário, reaproveitados por `ttl` segundos. Um token
+    novo do mesmo usuário é repassado com update_token; `invalidate` descarta
+    o handler quando os módulos do usuário mudam (ex: upload de homebrew).
+    """
+
+    def __init__(self, ttl: float = HANDLER_TTL, max_entries: int = MAX_HANDLERS):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: Dict[Any, Any] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(access_token: str, use_local: bool):
+        # O banco local é o mesmo para todos os usuários
+        return "local" if use_local else user_cache_key(access_token)
+
+    def get(self, access_token: str = None, use_local: bool = False) -> db_handler:
+        key = self._key(access_token, use_local)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] < time.monotonic():
+                del self._entries[key]
+                entry = None
+        if entry:
+            handler = entry[0]
+            if not use_local and handler.token != access_token:
+                handler.update_token(access_token)
+            return handler
+
+        # Montado fora do lock: acessa o Drive
+        handler = db_handler(access_token, use_local=use_local)
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                now = time.monotonic()
+                for old_key in [k for k, e in self._entries.items() if e[1] < now]:
+                    del self._entries[old_key]
+                while len(self._entries) >= self.max_entries:
+                    del self._entries[next(iter(self._entries))]
+            self._entries[key] = (handler, time.monotonic() + self.ttl)
+        return handler
+
+    def invalidate(self, access_token: str):
+        with self._lock:
+            self._entries.pop(self._key(access_token, False), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Instância única usada pelas rotas e pelos personagens do processo
+db_registry = HandlerRegistry()
+
+
+def get_db_handler(access_token: str = None, use_local: bool = False) -> db_handler:
+    """db_handler do usuário, reaproveitado do registro enquanto válido."""
+    return db_registry.get(access_token, use_local=use_local)
@@ -0,0 +1,170 @@
+import ast
+import math
+import operator
+import re
+from functools import lru_cache
+from typing import Any, Callable, List, Sequence, Tuple
+
+# Compilador das fórmulas da ficha (ex: "floor(({attributes.str.score} - 10) / 2)").
+# A fórmula é analisada uma única vez: as referências {caminho} viram variáveis
+# com o caminho já separado em chaves, e a expressão vira uma árvore de funções
+# avaliada direto sobre os valores, sem montar texto nem chamar eval.
+#
+# O resultado tem que ser o mesmo da avaliação textual (substituir os valores no
+# texto e avaliar). Quando isso não é garantido — valores que não são números,
+# fórmulas com dados ("1d8 + ...") ou com sintaxe fora do suportado — a fórmula
+# cai na avaliação textual.
+
+REFERENCE = re.compile(r"\{([^}]+)\}")
+OPERATOR_CHARS = "+-*/"
+MAX_FORMULAS = 4096
+
+SAFE_FUNCTIONS = {
+    "floor": math.floor,
+    "ceil": math.ceil,
+    "max": max,
+    "min": min,
+    "abs": abs,
+}
+
+_BINARY = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+}
+_UNARY = {ast.USub: operator.neg, ast.UAdd: operator.pos}
+
+Node = Callable[[Sequence[Any]], Any]
+
+
+class Unsupported(Exception):
+    """A expressão usa algo que o compilador não reproduz com fidelidade."""
+
+
+def _compile_node(node: ast.AST, variables: dict) -> Node:
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        value = node.value
+        return lambda values: value
+
+    if isinstance(node, ast.Name) and node.id in variables:
+        index = variables[node.id]
+        return lambda values: values[index]
+
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY:
+        op = _BINARY[type(node.op)]
+        left = _compile_node(node.left, variables)
+        right = _compile_node(node.right, variables)
+        return lambda values: op(left(values), right(values))
+
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY:
+        op = _UNARY[type(node.op)]
+        operand = _compile_node(node.operand, variables)
+        return lambda values: op(operand(values))
+
+    if (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Name)
+        and node.func.id in SAFE_FUNCTIONS
+        and not node.keywords
+    ):
+        function = SAFE_FUNCTIONS[node.func.id]
+        args = [_compile_node(arg, variables) for arg in node.args]
+        return lambda values: function(*[arg(values) for arg in args])
+
+    # Potência fica de fora: "-3 ** 2" no texto não é o mesmo que (-3) ** 2
+    raise Unsupported(ast.dump(node))
+
+
+def _is_number(value: Any) -> bool:
+    if type(value) in (int, bool):
+        return True
+    return type(value) is float and math.isfinite(value)
+
+
+def _parse_number(text: str) -> Any:
+    try:
+        if "." in text:
+            return float(text)
+        return int(text)
+    except ValueError:
+        return text
+
+
+class CompiledFormula:
+    """
+    Fórmula pré-processada. `paths`/`keys` são as referências na ordem em que
+    aparecem; `evaluate(values)` recebe os valores já resolvidos delas.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.literals: List[str] = REFERENCE.split(text)[::2]
+        self.paths: Tuple[str, ...] = tuple(REFERENCE.findall(text))
+        self.keys: Tuple[Tuple[str, ...], ...] = tuple(
+            tuple(path.split(".")) for path in self.paths
+        )
+        self.expression = self._compile_expression()
+
+    def _compile_expression(self) -> Node | None:
+        literal_text = "".join(self.literals)
+        # A avaliação textual só roda eval se houver operador ou floor no texto
+        # final; sem isso nos literais, o resultado depende do texto dos valores
+        if not any(c in literal_text for c in OPERATOR_CHARS) and (
+            "floor" not in literal_text
+        ):
+            return None
+
+        variables = {}
+        source = self.literals[0]
+        for i, literal in enumerate(self.literals[1:]):
+            name = f"_v{i}"
+            variables[name] = i
+            source += name + literal
+        try:
+            tree = ast.parse(source.strip(), mode="eval")
+            return _compile_node(tree.body, variables)
+        except (SyntaxError, Unsupported):
+            return None
+
+    def is_reference(self) -> bool:
+        """A fórmula é só uma referência, ex: "{properties.level}"."""
+        return len(self.paths) == 1 and self.literals == ["", ""]
+
+    def evaluate(self, values: Sequence[Any]) -> Any:
+        if self.is_reference():
+            value = values[0]
+            if value is None:
+                return 0
+            if type(value) is int or (type(value) is float and math.isfinite(value)):
+                return value
+        elif self.expression is not None and all(
+            value is None or _is_number(value) for value in values
+        ):
+            try:
+                return self.expression([0 if v is None else v for v in values])
+            except Exception:
+                pass
+        return self.evaluate_text(values)
+
+    def evaluate_text(self, values: Sequence[Any]) -> Any:
+        """Avaliação textual: substitui os valores no texto e avalia com eval."""
+        parts = [self.literals[0]]
+        for value, literal in zip(values, self.literals[1:]):
+            parts.append("0" if value is None else str(value))
+            parts.append(literal)
+        interpolated = "".join(parts)
+
+        if any(c in interpolated for c in OPERATOR_CHARS) or "floor" in interpolated:
+            try:
+                return eval(interpolated, {"__builtins__": None}, dict(SAFE_FUNCTIONS))
+            except Exception:
+                pass
+        return _parse_number(interpolated)
+
+
+@lru_cache(maxsize=MAX_FORMULAS)
+def compile_formula(text: str) -> CompiledFormula:
+    return CompiledFormula(text)
@@ -0,0 +1,83 @@
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+from .utils import get_path
+
+# Caminhos indexados ao carregar um arquivo de módulo
+INDEXED_PATHS = (
+    "metadata.classes",
+    "metadata.level",
+    "metadata.school",
+    "metadata.type",
+)
+
+
+class FileIndex:
+    """
+    Índices invertidos de um arquivo de módulo (ex: spells.json).
+
+    Para cada caminho indexado guarda duas tabelas:
+    - `equals`: str(valor do campo) -> chaves (responde `path == valor`)
+    - `contains`: item do campo -> chaves (responde `valor in path`)
+    """
+
+    def __init__(self, data: Dict[str, Any], paths: Iterable[str] = INDEXED_PATHS):
+        self.position: Dict[str, int] = {}
+        self.equals: Dict[str, Dict[str, Set[str]]] = {}
+        self.contains: Dict[str, Dict[str, Set[str]]] = {}
+
+        split_paths: List[Tuple[str, Tuple[str, ...]]] = [
+            (path, tuple(path.split("."))) for path in paths
+        ]
+        for path, _ in split_paths:
+            self.equals[path] = {}
+            self.contains[path] = {}
+
+        for position, (key, record) in enumerate(data.items()):
+            self.position[key] = position
+            for path, keys in split_paths:
+                field = get_path(record, keys)
+                self.equals[path].setdefault(str(field), set()).add(key)
+                for item in _contained_items(field):
+                    self.contains[path].setdefault(item, set()).add(key)
+
+    def lookup(self, predicate: Any) -> Set[str] | None:
+        """Chaves que satisfazem o predicado, ou None se o caminho não é indexado."""
+        table = self.contains if predicate.kind == "in" else self.equals
+        values = table.get(predicate.path)
+        if values is None:
+            return None
+        return values.get(predicate.value, set())
+
+    def ordered(self, keys: Set[str]) -> List[str]:
+        """Devolve as chaves na ordem original do arquivo."""
+        return sorted(keys, key=self.position.__getitem__)
+
+
+def _contained_items(field: Any) -> Iterable[str]:
+    # Mesmas regras do operador `in` (query.check_in)
+    if not field:
+        return ()
+    if isinstance(field, list):
+        items = []
+        for item in field:
+            if isinstance(item, dict):
+                name = item.get("name")
+                if isinstance(name, str):
+                    items.append(name)
+            elif isinstance(item, str):
+                items.append(item)
+        return items
+    if isinstance(field, str):
+        return (field,)
+    return ()
+
+
+class CatalogFile:
+    """Conteúdo parseado de um arquivo de módulo junto com seus índices."""
+
+    def __init__(self, data: Dict[str, Any]):
+        self.data = data
+        self.index = FileIndex(data) if isinstance(data, dict) else None
+
+    def __bool__(self) -> bool:
+        return bool(self.data)
@@ -1,7 +1,8 @@
-import json
-from typing import TYPE_CHECKING, Any, Dict, List
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple
 
-from .utils import get_nested, interpolate_and_eval, resolve_value, set_nested
+from .computed import Formula, Increment, ProficiencyBonus
+from .templates import expand_template
+from .utils import get_nested, interpolate_and_eval
 
 if TYPE_CHECKING:
     from .character import Character  # Import apenas para tipagem estática
@@ -30,7 +31,7 @@ class InputOperation(Operation):
             return {"label": self.property, "options": None, "type": "input"}
 
         valor = decisions[n]
-        set_nested(self.personagem.data, self.property, valor)
+        self.personagem.set_stat(self.property, valor)
         self.personagem.n += 1
         return 1
 
@@ -68,14 +69,8 @@ class ChooseMapOperation(Operation):
         # Se n > 1, espera-se que a escolha seja uma lista de n itens
         itens_escolhidos = escolha if isinstance(escolha, list) else [escolha]
 
-        novas_ops = []
-        for item in itens_escolhidos:
-            for op_template in self.operations:
-                op_str = json.dumps(op_template).replace("{THIS}", str(item))
-                novas_ops.append(json.loads(op_str))
-
-        for op in reversed(novas_ops):
-            self.personagem.ficha.insert(0, op)
+        novas_ops = expand_template(self.operations, itens_escolhidos)
+        self.personagem.prepend_ops(novas_ops)
         self.personagem.n += 1
         return 1
 
@@ -100,8 +95,7 @@ class ChooseOperationsOperation(Operation):
 
         if chosen_opt:
             novas_ops = chosen_opt.get("operations", [])
-            for op in reversed(novas_ops):
-                self.personagem.ficha.insert(0, op)
+            self.personagem.prepend_ops(novas_ops)
         self.personagem.n += 1
         return 1
 
@@ -116,36 +110,26 @@ class SetOperation(Operation):
     def run(self):
         if self.type == "value":
             if self.formula is not None:
-                formula_str = self.formula
-
-                def computed_property(context):
-                    return interpolate_and_eval(formula_str, context)
-
-                set_nested(self.personagem.data, self.property, computed_property)
+                self.personagem.set_stat(self.property, Formula(self.formula))
             else:
-                set_nested(self.personagem.data, self.property, self.value)
+                self.personagem.set_stat(self.property, self.value)
         elif self.type == "counter":
             _used = f"{self.property}_used"
             _recover = f"{self.property}_recover"
-            set_nested(self.personagem.data, _recover, self.recoversOn)
+            self.personagem.set_stat(_recover, self.recoversOn)
             if self.formula is not None:
-                formula_str = self.formula
-
-                def computed_property(context):
-                    return interpolate_and_eval(formula_str, context)
-
-                set_nested(self.personagem.data, _used, 0)
-                set_nested(self.personagem.data, self.property, computed_property)
+                self.personagem.set_stat(_used, 0)
+                self.personagem.set_stat(self.property, Formula(self.formula))
             else:
-                set_nested(self.personagem.data, _used, 0)
-                set_nested(self.personagem.data, self.property, self.value)
+                self.personagem.set_stat(_used, 0)
+                self.personagem.set_stat(self.property, self.value)
         elif self.type == "list":
             # Lógica de lista corrigida: append/extend seguro
             current_val = get_nested(self.personagem.data, self.property)
             lista_atual = current_val if isinstance(current_val, list) else []
             novos_valores = self.value if isinstance(self.value, list) else [self.value]
             lista_atual.extend(novos_valores)
-            set_nested(self.personagem.data, self.property, lista_atual)
+            self.personagem.set_stat(self.property, lista_atual)
 
         return 1
 
@@ -166,7 +150,7 @@ class IncrementOperation(Operation):
             # Se não tem tipo definido, assume valor simples (0) + incremento
             if self.type == "":
                 # Caso de uso: incremento de valor bruto que não existia (ex: atributos se não iniciados)
-                set_nested(self.personagem.data, self.property, self.value)
+                self.personagem.set_stat(self.property, self.value)
             else:
                 # Caso de uso: criar lista ou counter
                 op = SetOperation(
@@ -183,7 +167,7 @@ class IncrementOperation(Operation):
             if not callable(curr_obj) and self.formula is None:
                 if isinstance(curr_obj, (int, float)):
                     new_val = curr_obj + self.value
-                    set_nested(self.personagem.data, self.property, new_val)
+                    self.personagem.set_stat(self.property, new_val)
                 elif isinstance(curr_obj, list):
                     # Incremento em lista = adicionar item
                     op = SetOperation(
@@ -194,29 +178,11 @@ class IncrementOperation(Operation):
                     )
                     op.run()
 
-            elif callable(curr_obj) and self.formula is None:
-
-                def computed_property(context):
-                    return curr_obj(context) + self.value
-
-                set_nested(self.personagem.data, self.property, computed_property)
-
-            elif not callable(curr_obj) and self.formula is not None:
-                formula_str = self.formula
-
-                def computed_property(context):
-                    return curr_obj + interpolate_and_eval(formula_str, context)
-
-                set_nested(self.personagem.data, self.property, computed_property)
             else:
-                formula_str = self.formula
-
-                def computed_property(context):
-                    return curr_obj(context) + interpolate_and_eval(
-                        formula_str, context
-                    )
-
-                set_nested(self.personagem.data, self.property, computed_property)
+                # Valor calculado e/ou fórmula: a soma vira uma propriedade
+                # calculada sobre o valor atual
+                computed_property = Increment(curr_obj, self.value, self.formula)
+                self.personagem.set_stat(self.property, computed_property)
 
         return 1
 
@@ -250,14 +216,8 @@ class ForEachOperation(Operation):
             if not isinstance(items, list):
                 items = []
 
-        novas_ops = []
-        for item in items:
-            for op_template in self.operations:
-                op_str = json.dumps(op_template).replace("{THIS}", str(item))
-                novas_ops.append(json.loads(op_str))
-
-        for op in reversed(novas_ops):
-            self.personagem.ficha.insert(0, op)
+        novas_ops = expand_template(self.operations, items)
+        self.personagem.prepend_ops(novas_ops)
         return 1
 
 
@@ -277,39 +237,13 @@ class InitProficiencyOperation(Operation):
             "multiplier": self.multiplier,
             "roll": self.roll,
         }
-        set_nested(self.personagem.data, path, prof_data)
-
-        cat_cap = self.category
-        name_cap = nome
-
-        # Função reativa para calcular o bônus
-        def computed_bonus(context):
-            # 1. Recupera o objeto da perícia atual do contexto (para pegar multiplier atualizado)
-            p_data = get_nested(context, f"proficiency.{cat_cap}.{name_cap}")
-            if not p_data:
-                return 0
-
-            # 2. Descobre qual atributo usar e qual o multiplicador atual
-            attr_key = p_data.get("attribute")
-            mult = p_data.get("multiplier", 0)
+        self.personagem.set_stat(path, prof_data)
 
-            # 3. Busca o modificador do atributo (resolvendo recursivamente se for função)
-            attr_mod = 0
-            if attr_key:
-                raw_mod = get_nested(context, f"attributes.{attr_key}.modifier")
-                attr_mod = resolve_value(raw_mod, context)
-
-            # 4. Busca o bônus de proficiência global
-            pb = resolve_value(get_nested(context, "properties.proficiency"), context)
-
-            # 5. Calcula: Mod + (PB * Multiplier)
-            try:
-                return int(int(attr_mod) + (int(pb) * float(mult)))
-            except (ValueError, TypeError):
-                return 0
+        # Propriedade reativa para calcular o bônus
+        computed_bonus = ProficiencyBonus(self.category, nome)
 
         # Salva a função de bônus no caminho .bonus
-        set_nested(self.personagem.data, f"{path}.bonus", computed_bonus)
+        self.personagem.set_stat(f"{path}.bonus", computed_bonus)
 
         return 1
 
@@ -358,15 +292,14 @@ class AddItemOperation(Operation):
         if "operations" in inventory_item:
             del inventory_item["operations"]
 
-        set_nested(self.personagem.data, path, inventory_item)
+        self.personagem.set_stat(path, inventory_item)
 
         # 4. Injeta as Operações do Item na Fila
         # Agora item_data está correto, então ele vai encontrar as operations
         if "operations" in item_data:
             ops = item_data["operations"]
-            # Inserimos no início da fila (ordem reversa) para execução imediata
-            for op in reversed(ops):
-                self.personagem.ficha.insert(0, op)
+            # Inserimos no início da fila para execução imediata
+            self.personagem.prepend_ops(ops)
 
         return 1
 
@@ -412,7 +345,7 @@ class AddSpellcastingOperation(Operation):
         # Define slots atuais baseados no nível do personagem (simplificação, idealmente calcula pelo nível da classe)
         # Aqui apenas salvamos a estrutura. O cálculo de slots disponíveis seria derivado.
 
-        set_nested(self.personagem.data, f"spellbooks.{self.name}", spellbook_data)
+        self.personagem.set_stat(f"spellbooks.{self.name}", spellbook_data)
         return 1
 
 
@@ -448,7 +381,7 @@ class AddSpellOperation(Operation):
             current_spells = []
 
         current_spells.append(spell_entry)
-        set_nested(self.personagem.data, f"{spellbook_path}.spells", current_spells)
+        self.personagem.set_stat(f"{spellbook_path}.spells", current_spells)
 
         return 1
 
@@ -476,7 +409,7 @@ class AddActionOperation(Operation):
             current_actions = []
 
         current_actions.append(action_data)
-        set_nested(self.personagem.data, path, current_actions)
+        self.personagem.set_stat(path, current_actions)
         return 1
 
 
@@ -498,12 +431,11 @@ class AddFeatureOperation(Operation):
         if not isinstance(current_features, list):
             current_features = []
         current_features.append(feature_data)
-        set_nested(self.personagem.data, path, current_features)
+        self.personagem.set_stat(path, current_features)
 
         # 2. Executa operações aninhadas (ex: Feature que dá Action ou Bonus)
         if self.operations:
-            for op in reversed(self.operations):
-                self.personagem.ficha.insert(0, op)
+            self.personagem.prepend_ops(self.operations)
 
         return 1
 
@@ -511,8 +443,7 @@ class AddFeatureOperation(Operation):
 class AbilityScoreImprovementOperation(Operation):
     def run(self):
         # Injeta a lógica de decisão no topo da fila de processamento
-        self.personagem.ficha.insert(
-            0,
+        self.personagem.ficha.appendleft(
             {
                 "action": "CHOOSE_OPERATIONS",
                 "n": 1,
@@ -592,3 +523,57 @@ operations = {
     "ADD_FEATURE": AddFeatureOperation,
     "Ability_Score_Improvement": AbilityScoreImprovementOperation,
 }
+
+
+def required_fields(op_class: type) -> set:
+    """Campos anotados sem valor padrão: sem eles a operação quebra no run."""
+    return {
+        name
+        for cls in op_class.__mro__
+        for name in getattr(cls, "__annotations__", {})
+        if not hasattr(op_class, name)
+    }
+
+
+def validate_operations(data: Any, path: str = "") -> Tuple[List[str], List[str]]:
+    """
+    Confere todas as listas de "operations" de um arquivo de módulo: cada
+    operação precisa ser um dicionário e, se a "action" for conhecida, ter os
+    campos obrigatórios dela. Ações desconhecidas são ignoradas pelo motor, então
+    viram avisos. Retorna (erros, avisos), vazios se estiver tudo certo.
+    """
+    errors = []
+    warnings = []
+
+    def merge(value, value_path):
+        found = validate_operations(value, value_path)
+        errors.extend(found[0])
+        warnings.extend(found[1])
+
+    if isinstance(data, dict):
+        for key, value in data.items():
+            key_path = f"{path}/{key}" if path else str(key)
+            if key != "operations" or not isinstance(value, list):
+                merge(value, key_path)
+                continue
+            for i, op in enumerate(value):
+                op_path = f"{key_path}[{i}]"
+                if not isinstance(op, dict):
+                    errors.append(f"{op_path}: operação deve ser um objeto")
+                    continue
+                op_class = operations.get(op.get("action"))
+                if not op_class:
+                    warnings.append(
+                        f"{op_path}: ação desconhecida {op.get('action')!r} (ignorada)"
+                    )
+                else:
+                    missing = sorted(required_fields(op_class) - op.keys())
+                    if missing:
+                        errors.append(
+                            f"{op_path}: {op['action']} sem {', '.join(missing)}"
+                        )
+                merge(op, op_path)
+    elif isinstance(data, list):
+        for i, item in enumerate(data):
+            merge(item, f"{path}[{i}]")
+    return errors, warnings
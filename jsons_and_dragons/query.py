@@ -0,0 +1,185 @@
+from functools import lru_cache
+from typing import Any, Dict, List
+
+from .utils import get_path
+
+# Compilador da linguagem de queries do banco.
+# Uma query como "spells/Clérigo in metadata.classes AND metadata.level == 3/keys"
+# é parseada uma única vez em um QueryPlan (caminhos já separados e predicados
+# tipados) e o plano fica em cache; as execuções seguintes só percorrem os dados.
+
+MAX_PLANS = 1024
+
+
+def check_in(target_value: Any, expected_value: str) -> bool:
+    """Regra do operador `in`: lista de nomes/objetos com 'name' ou string igual."""
+    if not target_value:
+        return False
+    if isinstance(target_value, list):
+        return any(
+            (isinstance(item, dict) and item.get("name") == expected_value)
+            or (isinstance(item, str) and item == expected_value)
+            for item in target_value
+        )
+    if isinstance(target_value, str):
+        return target_value == expected_value
+    return False
+
+
+class EqualsPredicate:
+    """`path == valor`: compara a representação em texto do campo."""
+
+    kind = "=="
+
+    def __init__(self, path: str, value: str):
+        self.path = path
+        self.keys = tuple(path.split("."))
+        self.value = value
+        # Versão inteira do valor esperado, para evitar str() em campos numéricos
+        self.int_value = int(value) if value.lstrip("-").isdigit() else None
+        if self.int_value is not None and str(self.int_value) != value:
+            self.int_value = None
+
+    def match(self, record: Any) -> bool:
+        field = get_path(record, self.keys)
+        if isinstance(field, str):
+            return field == self.value
+        if type(field) is int and self.int_value is not None:
+            return field == self.int_value
+        return str(field) == self.value
+
+
+class InPredicate:
+    """`valor in path`: o campo (lista ou string) contém o valor."""
+
+    kind = "in"
+
+    def __init__(self, path: str, value: str):
+        self.path = path
+        self.keys = tuple(path.split("."))
+        self.value = value
+
+    def match(self, record: Any) -> bool:
+        return check_in(get_path(record, self.keys), self.value)
+
+
+class FilterStep:
+    """Aplica uma sequência de predicados (unidos por AND) aos registros."""
+
+    def __init__(self, predicates: List[Any]):
+        self.predicates = predicates
+
+    def apply(self, data: Any, index: Any = None) -> Any:
+        if not isinstance(data, dict):
+            return {}
+        if not self.predicates:
+            return data
+        if index is not None:
+            return self._apply_indexed(data, index)
+        predicates = self.predicates
+        return {
+            key: value
+            for key, value in data.items()
+            if all(predicate.match(value) for predicate in predicates)
+        }
+
+    def _apply_indexed(self, data: Dict[str, Any], index: Any) -> Dict[str, Any]:
+        # Predicados indexados viram interseção de conjuntos; o resto é
+        # verificado só nos candidatos que sobraram
+        candidates = None
+        remaining = []
+        for predicate in self.predicates:
+            keys = index.lookup(predicate)
+            if keys is None:
+                remaining.append(predicate)
+            elif candidates is None:
+                candidates = set(keys)
+            else:
+                candidates &= keys
+
+        if candidates is None:
+            return self.apply(data)
+        return {
+            key: data[key]
+            for key in index.ordered(candidates)
+            if all(predicate.match(data[key]) for predicate in remaining)
+        }
+
+
+class GetStep:
+    """Desce um nível no dicionário (`classes/Paladino`)."""
+
+    def __init__(self, key: str):
+        self.key = key
+
+    def apply(self, data: Any) -> Any:
+        if not isinstance(data, dict):
+            return {}
+        return data.get(self.key, {})
+
+
+class QueryPlan:
+    def __init__(self, query: str, filename: str, steps: list, keys: bool):
+        self.query = query
+        self.filename = filename
+        self.steps = steps
+        self.keys = keys
+        # Entidade buscada diretamente no 1º passo (ex: "spells/Bola de Fogo")
+        self.entity = steps[0].key if steps and isinstance(steps[0], GetStep) else None
+
+    def run(self, data: Dict[str, Any], index: Any = None) -> Any:
+        """
+        Executa o plano sobre o conteúdo já carregado do arquivo. Se o
+        índice do arquivo for passado, um filtro logo na raiz usa o índice
+        em vez de percorrer todos os registros.
+        """
+        current = data
+        last = len(self.steps) - 1
+        for i, step in enumerate(self.steps):
+            if i == 0 and index is not None and isinstance(step, FilterStep):
+                current = step.apply(current, index)
+            else:
+                current = step.apply(current)
+            if not current and (i < last or self.keys):
+                return {}
+        if self.keys:
+            return list(current.keys()) if isinstance(current, dict) else []
+        return current if isinstance(current, dict) else {}
+
+
+def _compile_predicate(filter_str: str) -> Any:
+    if " == " in filter_str:
+        path, expected_value_raw = filter_str.split(" == ", 1)
+        return EqualsPredicate(path.strip(), expected_value_raw.strip().strip("'"))
+    if " in " in filter_str:
+        expected_value_raw, path_raw = filter_str.split(" in ", 1)
+        return InPredicate(path_raw.strip(), expected_value_raw.strip().strip("'"))
+    # Sem operador reconhecido: o filtro não restringe nada
+    return None
+
+
+@lru_cache(maxsize=MAX_PLANS)
+def compile_filter(filter_str: str) -> FilterStep:
+    subparts = filter_str.split(" AND ") if " AND " in filter_str else [filter_str]
+    predicates = [_compile_predicate(subpart.strip()) for subpart in subparts]
+    return FilterStep([p for p in predicates if p is not None])
+
+
+@lru_cache(maxsize=MAX_PLANS)
+def compile_step(part: str) -> Any:
+    if "==" in part or " in " in part:
+        return compile_filter(part)
+    return GetStep(part)
+
+
+@lru_cache(maxsize=MAX_PLANS)
+def compile_query(query: str) -> QueryPlan:
+    parts = query.split("/")
+    steps = []
+    keys = False
+    for part in parts[1:]:
+        if part == "keys":
+            keys = True
+            break
+        steps.append(compile_step(part))
+    return QueryPlan(query, f"{parts[0]}.json", steps, keys)
@@ -0,0 +1,68 @@
+import marshal
+from functools import lru_cache
+from typing import Any, Callable, List
+
+# Templates de operações com {THIS} (CHOOSE_MAP e FOR_EACH).
+# Em vez de json.dumps + replace + json.loads para cada item, a lista de
+# operações é compilada uma vez em funções que remontam a estrutura trocando
+# {THIS} só nos textos que o contêm. Cada instância é uma cópia nova (nada é
+# compartilhado entre instâncias nem com o template original).
+# O cache é pelo conteúdo (bytes do marshal), então vale entre personagens
+# mesmo que cada consulta ao banco devolva objetos novos.
+
+PLACEHOLDER = "{THIS}"
+MAX_TEMPLATES = 1024
+# Versão 2 do marshal não grava referências nem marca textos internados, então
+# conteúdos iguais geram sempre os mesmos bytes
+MARSHAL_VERSION = 2
+
+Builder = Callable[[str], Any]
+
+
+def _compile_node(node: Any) -> Builder:
+    if isinstance(node, str):
+        if PLACEHOLDER not in node:
+            return lambda item: node
+        parts = node.split(PLACEHOLDER)
+        return lambda item: item.join(parts)
+
+    if isinstance(node, dict):
+        fields = [(_compile_node(k), _compile_node(v)) for k, v in node.items()]
+        return lambda item: {key(item): value(item) for key, value in fields}
+
+    if isinstance(node, list):
+        items = [_compile_node(v) for v in node]
+        return lambda item: [build(item) for build in items]
+
+    # Números, booleanos e None são imutáveis
+    return lambda item: node
+
+
+class OperationTemplate:
+    """Lista de operações compilada; `instantiate(item)` gera as operações."""
+
+    def __init__(self, operations: List[dict]):
+        self.builders = [_compile_node(op) for op in operations]
+
+    def instantiate(self, item: Any) -> List[dict]:
+        text = str(item)
+        return [build(text) for build in self.builders]
+
+
+@lru_cache(maxsize=MAX_TEMPLATES)
+def _compile_serialized(serialized: bytes) -> OperationTemplate:
+    return OperationTemplate(marshal.loads(serialized))
+
+
+def compile_template(operations: List[dict]) -> OperationTemplate:
+    """Compila (ou reaproveita do cache) a lista de operações do template."""
+    return _compile_serialized(marshal.dumps(operations, MARSHAL_VERSION))
+
+
+def expand_template(operations: List[dict], items: List[Any]) -> List[dict]:
+    """Operações do template para cada item, na ordem item x operação."""
+    template = compile_template(operations)
+    expanded = []
+    for item in items:
+        expanded.extend(template.instantiate(item))
+    return expanded
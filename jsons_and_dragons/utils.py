@@ -1,10 +1,14 @@
-import math
-import re
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List, Sequence
+
+from .formula import compile_formula
 
 
 def get_nested(data: Dict, path: str, default: Any = None) -> Any:
-    keys = path.split(".")
+    return get_path(data, path.split("."), default)
+
+
+def get_path(data: Dict, keys: Sequence[str], default: Any = None) -> Any:
+    """Igual ao get_nested, mas recebe o caminho já separado em chaves."""
     curr = data
     try:
         for key in keys:
@@ -32,43 +36,28 @@ def set_nested(data: Dict, path: str, value: Any) -> None:
 
 
 def resolve_value(value: Any, context: Dict) -> Any:
+    # Ciclos entre stats são tratados (e avisados) pelo StatGraph
     if callable(value):
-        try:
-            return value(context)
-        except RecursionError:
-            return 0
+        return value(context)
     return value
 
 
-def interpolate_and_eval(text: str, context: Dict) -> Any:
+def interpolate_and_eval(
+    text: str, context: Dict, resolve: Callable[[str], Any] = None
+) -> Any:
+    """
+    Substitui as referências {caminho} e avalia a expressão. `resolve`, se
+    passado, é quem busca o valor de cada caminho (ex: o grafo de stats).
+    A fórmula é compilada uma vez (ver formula.py) e reaproveitada.
+    """
     if not isinstance(text, str):
         return resolve_value(text, context)
-    pattern = re.compile(
-        r"\{([^}]+)\}"
-    )  # pattern = re.compile(r'\{([a-zA-Z0-9_.]+)\}')
-
-    def replacer(match):
-        path = match.group(1)
-        raw_val = get_nested(context, path)
-        val = resolve_value(raw_val, context)
-        return "0" if val is None else str(val)
-
-    interpolated = pattern.sub(replacer, text)
-    if any(c in interpolated for c in "+-*/") or "floor" in interpolated:
-        try:
-            safe_dict = {
-                "floor": math.floor,
-                "ceil": math.ceil,
-                "max": max,
-                "min": min,
-                "abs": abs,
-            }
-            return eval(interpolated, {"__builtins__": None}, safe_dict)
-        except Exception:
-            pass
-    try:
-        if "." in interpolated:
-            return float(interpolated)
-        return int(interpolated)
-    except ValueError:
-        return interpolated
+    formula = compile_formula(text)
+
+    if resolve is not None:
+        values = [resolve(path) for path in formula.paths]
+    else:
+        values = [
+            resolve_value(get_path(context, keys), context) for keys in formula.keys
+        ]
+    return formula.evaluate(values)
@@ -1,6 +1,18 @@
+import json
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
 import pytest
 
-from jsons_and_dragons import db_handler
+from Api.gdrive import register_user
+from jsons_and_dragons import db_handler, db_homebrew
+from jsons_and_dragons.cache import module_cache
+from jsons_and_dragons.compiled import artifact_path, load_compiled, write_artifact
+from jsons_and_dragons.data import HandlerRegistry
+from jsons_and_dragons.operations import validate_operations
+from jsons_and_dragons.query import compile_query
+
+BD_LOCAL = Path(__file__).resolve().parents[1] / "BD"
 
 
 # Fixture: Prepara o ambiente antes do teste (instancia o DB)
@@ -34,3 +46,232 @@ def test_deve_retornar_vazio_para_caminho_invalido(db_local):
     resultado = db_local.query("arquivo_inexistente/keys")
     # Baseado na sua implementação, deve retornar dict ou lista vazia
     assert not resultado
+
+
+def test_cache_parseia_o_arquivo_uma_vez(db_local):
+    """
+    Várias queries no mesmo arquivo devem reaproveitar o conteúdo parseado
+    do cache compartilhado em vez de reler o JSON.
+    """
+    module_cache.clear()
+
+    for _ in range(100):
+        db_local.query("spells/metadata.level == 3/keys")
+
+    stats = module_cache.stats()
+    # Um miss por módulo (dnd_2014, tasha_cauldron, xanatar_guide)
+    assert stats["misses"] == len(db_local.db_list)
+    assert stats["hits"] == 99 * len(db_local.db_list)
+
+
+def test_resultado_alterado_nao_corrompe_o_cache(db_local):
+    """O resultado de uma query é uma cópia; alterá-lo não afeta o cache."""
+    paladino = db_local.query("classes/Paladino")
+    paladino["hitDiceValue"] = 999
+    paladino["level_1"]["operations"].clear()
+
+    novo = db_local.query("classes/Paladino")
+    assert novo["hitDiceValue"] != 999
+    assert novo["level_1"]["operations"]
+
+
+def test_query_compilada_uma_vez_e_filtra_magias(db_local):
+    """
+    O plano da query é compilado uma vez e reaproveitado; o filtro com AND
+    retorna apenas magias da classe e nível pedidos.
+    """
+    query = "spells/Clérigo in metadata.classes AND metadata.level == 3/keys"
+    assert compile_query(query) is compile_query(query)
+
+    resultado = db_local.query(query)
+    magias = db_local.query("spells/Clérigo in metadata.classes")
+
+    assert resultado
+    for nome in resultado:
+        assert magias[nome]["metadata"]["level"] == 3
+
+
+def test_indice_reconstruido_quando_arquivo_muda(tmp_path, monkeypatch):
+    """
+    Os índices de spells.json acompanham a versão do arquivo: ao alterar o
+    arquivo, a mesma query passa a refletir o novo conteúdo.
+    """
+    modulo = tmp_path / "BD" / "homebrew_teste"
+    modulo.mkdir(parents=True)
+    arquivo = modulo / "spells.json"
+    monkeypatch.chdir(tmp_path)
+
+    def magia(nivel):
+        return {"metadata": {"level": nivel, "classes": ["Mago"]}}
+
+    arquivo.write_text(json.dumps({"Raio": magia(1)}), encoding="utf-8")
+    db = db_homebrew("homebrew_teste", use_local=True)
+    query = "spells/Mago in metadata.classes AND metadata.level == 1/keys"
+    assert db.query(query) == ["Raio"]
+
+    arquivo.write_text(
+        json.dumps({"Raio": magia(2), "Luz Eterna": magia(1)}), encoding="utf-8"
+    )
+    assert db.query(query) == ["Luz Eterna"]
+
+
+def test_catalogo_mesclado():
+    """
+    No modo mesclado cada categoria é unida uma vez entre os módulos: as
+    chaves não se repetem e o módulo mais recente sobrescreve o anterior.
+    """
+    db = db_handler(use_local=True, merged=True)
+
+    magias = db.query("spells/keys")
+    assert len(magias) == len(set(magias))
+
+    # Tasha redefine "Invocar Feérico" como magia de 3º nível
+    assert db.query("spells/Invocar Feérico")["metadata"]["level"] == 3
+
+    # As operações do personagem continuam concatenadas entre os módulos
+    operacoes = db.query("metadata/character")["operations"]
+    assert (
+        operacoes
+        == db_handler(use_local=True).query("metadata/character")["operations"]
+    )
+
+
+def test_artefato_compilado_invalidado_pelo_hash(tmp_path):
+    """
+    O artefato pré-compilado só é usado se o hash bater com o JSON atual;
+    caso contrário o loader deve voltar ao JSON.
+    """
+    modulo = tmp_path / "homebrew_teste"
+    modulo.mkdir()
+    conteudo = json.dumps({"Raio": {"metadata": {"level": 1}}}).encode("utf-8")
+    (modulo / "spells.json").write_bytes(conteudo)
+
+    destino = artifact_path(str(tmp_path), "homebrew_teste")
+    write_artifact(str(modulo), destino)
+
+    assert load_compiled(destino, "spells.json", conteudo) == json.loads(conteudo)
+    assert load_compiled(destino, "spells.json", conteudo + b" ") is None
+    assert load_compiled(destino, "feats.json", conteudo) is None
+
+
+def test_busca_de_entidade_usa_indice_de_offsets(db_local):
+    """
+    Buscar uma única magia decodifica só o trecho dela (índice de offsets),
+    sem carregar o arquivo inteiro no cache, e o resultado é o mesmo.
+    """
+    module_cache.clear()
+
+    magia = db_local.query("spells/Bola de Fogo")
+    assert magia["metadata"]["level"] == 3
+    assert module_cache.stats()["entries"] == 0
+
+    # Com o arquivo já em cache, o resultado continua igual
+    db_local.query("spells/keys")
+    assert db_local.query("spells/Bola de Fogo") == magia
+
+
+@patch("jsons_and_dragons.data.get_file_content")
+@patch("jsons_and_dragons.data.list_folder_files")
+def test_modo_drive_lista_a_pasta_uma_vez(mock_list, mock_get):
+    """
+    No modo Drive a pasta do módulo é listada uma vez (nome -> id/md5) e
+    cada arquivo só precisa do download, que também fica em cache.
+    """
+    module_cache.clear()
+    mock_list.return_value = {
+        "spells.json": {"id": "id-spells", "md5Checksum": "abc", "size": "10"},
+        "feats.json": {"id": "id-feats", "md5Checksum": "def", "size": "10"},
+    }
+    mock_get.side_effect = lambda token, file_id: {
+        "id-spells": {"Raio": {"metadata": {"level": 1}}},
+        "id-feats": {"Agarrador": {"operations": []}},
+    }[file_id]
+
+    db = db_homebrew("homebrew_teste", "token", folder_id="pasta")
+    assert db.query("spells/keys") == ["Raio"]
+    assert db.query("spells/Raio")["metadata"]["level"] == 1
+    assert db.query("feats/keys") == ["Agarrador"]
+
+    assert mock_list.call_count == 1
+    assert [c.kwargs["file_id"] for c in mock_get.call_args_list] == [
+        "id-spells",
+        "id-feats",
+    ]
+
+
+@patch("jsons_and_dragons.data.db_handler")
+def test_registro_reaproveita_o_handler_do_usuario(mock_handler):
+    """
+    O handler montado para um usuário é reaproveitado (com o token novo,
+    se ele mudou) até expirar ou ser invalidado por um upload de homebrew.
+    """
+    mock_handler.side_effect = lambda token, use_local=False: MagicMock(token=token)
+    register_user("token-1", "jogador@exemplo.com")
+    register_user("token-2", "jogador@exemplo.com")
+    registro = HandlerRegistry(ttl=60)
+
+    handler = registro.get("token-1")
+    assert registro.get("token-2") is handler
+    handler.update_token.assert_called_once_with("token-2")
+    assert registro.get("token-de-outro-usuario") is not handler
+
+    registro.invalidate("token-2")
+    assert registro.get("token-1") is not handler
+
+    expirado = HandlerRegistry(ttl=-1)
+    assert expirado.get("token-1") is not expirado.get("token-1")
+    assert mock_handler.call_count == 5
+
+
+@patch("jsons_and_dragons.data.get_file_content")
+@patch("jsons_and_dragons.data.list_folder_files")
+@patch("jsons_and_dragons.data.ensure_path", return_value="bd")
+def test_modulos_oficiais_vem_do_catalogo_local(mock_path, mock_list, mock_get):
+    """
+    No modo Drive só a homebrew do usuário é baixada; os módulos oficiais
+    saem do BD/ local, com uma instância compartilhada entre usuários.
+    """
+    module_cache.clear()
+    pastas = {
+        "metadata.json": {"id": "id-meta"},
+        "dnd_2014": {"id": "id-dnd"},
+        "minha_homebrew": {"id": "id-homebrew"},
+    }
+    mock_list.side_effect = lambda token, folder_id: {
+        "bd": pastas,
+        "id-homebrew": {"classes.json": {"id": "id-classes", "md5Checksum": "1"}},
+    }[folder_id]
+    mock_get.side_effect = lambda token, file_id: {
+        "id-meta": {"modules": ["dnd_2014", "minha_homebrew"]},
+        "id-classes": {"Artífice Sombrio": {"operations": []}},
+    }[file_id]
+
+    db = db_handler("token-a")
+    oficial, homebrew = db.db_list
+    assert oficial is db_handler("token-b").db_list[0]
+    assert oficial.use_local and not homebrew.use_local
+
+    classes = db.query("classes/keys")
+    assert "Paladino" in classes and "Artífice Sombrio" in classes
+    assert [c.kwargs["file_id"] for c in mock_get.call_args_list] == [
+        "id-meta",
+        "id-meta",
+        "id-classes",
+    ]
+
+
+def test_validador_aceita_os_modulos_oficiais():
+    """Os JSONs do BD distribuído passam no validador de homebrew."""
+    avisos = []
+    for arquivo in sorted(BD_LOCAL.glob("*/*.json")):
+        erros, avisos_arquivo = validate_operations(
+            json.loads(arquivo.read_text(encoding="utf-8"))
+        )
+        assert erros == [], arquivo.name
+        avisos += [f"{arquivo.parent.name}/{arquivo.name}: {a}" for a in avisos_arquivo]
+
+    # INIT não está registrada e o motor a ignora: vira aviso, não erro
+    assert avisos == [
+        "dnd_2014/classes.json: Paladino/level_3/operations[2]/operations[0]: "
+        "ação desconhecida 'INIT' (ignorada)"
+    ]
@@ -0,0 +1,298 @@
+import json
+
+import pytest
+
+from jsons_and_dragons import Character
+from jsons_and_dragons.character import STATE_VERSION
+from jsons_and_dragons.computed import (
+    Formula,
+    Increment,
+    StatGraph,
+    decode_state,
+    encode_state,
+)
+from jsons_and_dragons.formula import compile_formula
+from jsons_and_dragons.templates import compile_template, expand_template
+from jsons_and_dragons.utils import interpolate_and_eval
+
+DECISOES = ["Tony", 15, 12, 14, 8, 8, 14, "Raça", "Anão", "Anão da Colina"]
+
+
+@pytest.fixture
+def personagem():
+    character = Character(1, None, list(DECISOES), use_local=True)
+    character.add_race()
+    return character
+
+
+def test_estado_restaura_propriedades_calculadas(personagem):
+    state_str = personagem.to_state_string()
+    restaurado = Character.from_state_string(state_str, "novo_token")
+
+    assert restaurado.to_state_string() == state_str
+    assert restaurado.access_token == "novo_token"
+    assert restaurado.ficha == personagem.ficha
+    for path in ("attributes.con.modifier", "proficiency.skill.Atletismo.bonus"):
+        assert restaurado.get_stat(path) == personagem.get_stat(path)
+
+
+def test_estado_guarda_apenas_dados_simples(personagem):
+    state = json.loads(personagem.to_state_string())
+
+    assert state["version"] == STATE_VERSION
+    assert state["data"]["attributes"]["str"]["modifier"] == {
+        "$computed": "formula",
+        "source": personagem.data["attributes"]["str"]["modifier"].source,
+    }
+
+
+def test_estado_guarda_valores_calculados(personagem):
+    state = json.loads(personagem.to_state_string())
+    carregado = Character.from_state(state, None)
+    modifier = state["stats"]["attributes.str.modifier"]
+
+    assert carregado.snapshot() == personagem.snapshot()
+    # Os valores salvos valem sem reavaliar as fórmulas até a primeira escrita
+    carregado.data["attributes"]["str"]["modifier"].source = "99"
+    assert carregado.get_stat("attributes.str.modifier") == modifier
+    carregado.set_stat("attributes.str.score", 20)
+    assert carregado.get_stat("attributes.str.modifier") == 99
+
+
+def test_estado_de_outra_versao_e_recusado(personagem):
+    state = personagem.to_state()
+    state["version"] = 0
+
+    with pytest.raises(ValueError):
+        Character.from_state(state, None)
+
+
+def test_encode_state_recusa_closures():
+    assert decode_state(encode_state({"a": Formula("{b} + 1")}))["a"]({"b": 2}) == 3
+    with pytest.raises(TypeError):
+        encode_state({"a": lambda context: 1})
+
+
+def test_rewind_parte_do_checkpoint_e_equivale_a_refazer():
+    character = Character(1, None, list(DECISOES[:-1]), use_local=True)
+    character.add_race()  # Pausa pedindo a sub-raça
+    assert character.checkpoints[-1]["n"] == len(DECISOES) - 1
+
+    character.data["decisions"].append(DECISOES[-1])
+    character.process_queue()
+
+    decisoes = DECISOES[:-1]
+    assert character.rewind(decisoes)
+
+    refeito = Character(1, None, list(decisoes), use_local=True)
+    refeito.process_decisions()
+
+    assert character.to_state()["data"] == refeito.to_state()["data"]
+    assert character.ficha == refeito.ficha
+    assert character.required_decision == refeito.required_decision
+
+
+def test_rewind_sem_os_checkpoints_do_estado_refaz_do_zero():
+    character = Character(1, None, list(DECISOES[:-1]), use_local=True)
+    character.add_race()  # Pausa pedindo a sub-raça
+    guardados = character.checkpoints_state()
+    restaurado = Character.from_state_string(character.to_state_string(), None)
+
+    # Sem carregar os checkpoints o rewind não tenta; com um arquivo que não é
+    # o do estado, eles são descartados
+    assert not restaurado.rewind(DECISOES[:-1])
+    guardados["checkpoints"] = guardados["checkpoints"][:-1]
+    restaurado.load_checkpoints(guardados)
+    assert restaurado.checkpoints_loaded and restaurado.checkpoints == []
+    assert not restaurado.rewind(DECISOES[:-1])
+
+
+def test_template_substitui_this_sem_compartilhar_objetos():
+    operations = [
+        {
+            "action": "SET",
+            "property": "proficiency.skill.{THIS}.multiplier",
+            "value": [1, {"{THIS}": "{THIS} e {THIS}"}],
+        }
+    ]
+    esperado = [
+        json.loads(json.dumps(op).replace("{THIS}", str(item)))
+        for item in ("Élfico", 3)
+        for op in operations
+    ]
+
+    expandido = expand_template(operations, ["Élfico", 3])
+
+    assert expandido == esperado
+    expandido[0]["value"].append(2)
+    assert expand_template(operations, ["Élfico"])[0]["value"] == [
+        1,
+        {"Élfico": "Élfico e Élfico"},
+    ]
+    # Cache pelo conteúdo: uma cópia do template reaproveita a compilação
+    assert compile_template(json.loads(json.dumps(operations))) is compile_template(
+        operations
+    )
+
+
+def test_stat_graph_memoriza_e_invalida_dependentes():
+    data = {"a": 1, "b": Formula("{a} + 1"), "c": Increment(Formula("{b} * 2"), 1)}
+    graph = StatGraph()
+
+    assert graph.get(data, "c") == 5
+    assert graph.dependents["b"] == {"c"}
+
+    data["b"].source = "{a} + 100"  # Sem escrita registrada, o cache vale
+    assert graph.get(data, "c") == 5
+
+    data["a"] = 2
+    graph.invalidate("a")
+    assert graph.get(data, "c") == 205
+
+
+def test_stat_graph_interrompe_ciclos(capsys):
+    data = {"a": Formula("{b} + 1"), "b": Formula("{a} + 1")}
+
+    assert StatGraph().get(data, "a") == 2
+    assert "Referência circular entre stats" in capsys.readouterr().out
+    # Fora do grafo o ciclo não vira um valor silencioso
+    with pytest.raises(RecursionError):
+        data["a"](data)
+
+
+@pytest.mark.parametrize(
+    "texto, valores, esperado",
+    [
+        ("max(1, {a} + floor({b} / 2))", {"a": -1, "b": 5}, 1),
+        ("2 + floor(({a} - 1)/ 4)", {"a": 9}, 4),
+        ("10 - {a}", {"a": -3}, 13),
+        ("{a} * 2", {"a": None}, 0),
+        ("{a}", {"a": 2.5}, 2.5),
+        ("{a}", {"a": True}, "True"),
+        ("1d8 + {a}", {"a": 3}, "1d8 + 3"),
+        ("{a} / {b}", {"a": 1, "b": 0}, "1 / 0"),
+    ],
+)
+def test_formula_compilada_equivale_a_avaliacao_textual(texto, valores, esperado):
+    formula = compile_formula(texto)
+    resultado = interpolate_and_eval(texto, valores)
+
+    assert resultado == esperado and type(resultado) is type(esperado)
+    assert formula.evaluate_text([valores[p] for p in formula.paths]) == resultado
+    assert compile_formula(texto) is formula
+
+
+def test_snapshot_e_somente_leitura_e_acompanha_escritas(personagem):
+    path = "proficiency.skill.Atletismo.bonus"
+    snapshot = personagem.snapshot()
+
+    assert snapshot[path] == personagem.get_stat(path)
+    assert personagem.snapshot() is snapshot
+    with pytest.raises(TypeError):
+        snapshot[path] = 0
+
+    personagem.set_stat("proficiency.skill.Atletismo.multiplier", 1)
+    assert personagem.read_stat(path) == snapshot[path] + personagem.get_stat(
+        "properties.proficiency"
+    )
+
+
+def test_set_stat_atualiza_bonus_de_pericia(personagem):
+    antes = personagem.get_stat("proficiency.skill.Atletismo.bonus")
+    pb = personagem.get_stat("properties.proficiency")
+
+    personagem.set_stat("proficiency.skill.Atletismo.multiplier", 1)
+
+    assert personagem.get_stat("proficiency.skill.Atletismo.bonus") == antes + pb
+
+
+# Passos da API: marcadores vêm junto com o que eles pedem
+PASSOS_PALADINO = [
+    ["Raça", "Anão"],
+    ["Ferramentas de Ferreiro"],
+    ["Anão da Colina"],
+    ["Background", "Acólito"],
+    [["Comum", "Elfico"]],
+    ["Livro de Orações"],
+    ["Classe", "Paladino", 0],
+    [["Atletismo", "Intimidação"]],
+    ["Escudo e Arma Marcial"],
+    ["Espada Longa"],
+    ["Cinco Azagaias"],
+    ["Pacote de Sacerdote"],
+]
+
+
+def test_checkpoints_guardam_diferencas_e_voltam_varias_decisoes():
+    # Um passo por vez, salvando e carregando como a API faz: os checkpoints
+    # ficam em um arquivo à parte, lido só para juntar as pausas novas
+    character = Character(1, None, DECISOES[:7], use_local=True)
+    guardados = None
+    for passo in PASSOS_PALADINO:
+        character.load_checkpoints(guardados)
+        guardados = character.checkpoints_state()
+        character = Character.from_state_string(character.to_state_string(), None)
+        character.use_local = True
+        character.data["decisions"] += passo
+        if character.required_decision:
+            character.process_queue()
+        character.process_decisions()
+
+    assert "changes" not in character.to_state_string()
+    assert not character.checkpoints_loaded
+    character.load_checkpoints(guardados)
+    primeiro, *resto = character.checkpoints
+    assert list(primeiro["changes"]) == [""] and len(resto) >= 4
+    assert all("" not in checkpoint["changes"] for checkpoint in resto)
+    assert any(checkpoint["appends"] for checkpoint in resto)
+
+    decisoes = character.data["decisions"][:10]
+    assert character.rewind(decisoes)
+    refeito = Character(1, None, list(decisoes), use_local=True)
+    refeito.process_decisions()
+
+    assert character.to_state()["data"] == refeito.to_state()["data"]
+    assert character.ficha == refeito.ficha
+    assert character.required_decision == refeito.required_decision
+
+
+def test_rewind_mantem_a_ordem_da_ficha_refeita():
+    character = Character(1, None, DECISOES[:7], use_local=True)
+    niveis = [
+        ["Classe", "Paladino", 1],
+        ["Classe", "Paladino", 2],
+        [1],
+        ["Combate com Armas Grandes"],
+        ["Classe", "Paladino", 3],
+        [1],
+        ["Juramento de Devoção"],
+    ]
+    for passo in PASSOS_PALADINO + niveis:
+        character.data["decisions"] += passo
+        if character.required_decision:
+            character.process_queue()
+        character.process_decisions()
+    estado = character.to_state_string()
+    guardados = character.checkpoints_state()
+
+    # Voltar para cada pausa: a ficha (e o get_all, depois da classe) sai na
+    # mesma ordem (inventário, equipamento) de uma ficha feita do zero
+    decisoes = character.data["decisions"]
+    comparados = 0
+    for checkpoint in character.checkpoints:
+        voltou = Character.from_state_string(estado, None)
+        voltou.use_local = True
+        voltou.load_checkpoints(guardados)
+        assert voltou.rewind(decisoes[: checkpoint["n"]])
+        refeito = Character(1, None, decisoes[: checkpoint["n"]], use_local=True)
+        refeito.process_decisions()
+
+        assert json.dumps(voltou.to_state()["data"]) == json.dumps(
+            refeito.to_state()["data"]
+        )
+        if "classes" in refeito.data["properties"]:
+            comparados += 1
+            assert json.dumps(voltou.get_all(), default=list) == json.dumps(
+                refeito.get_all(), default=list
+            )
+    assert comparados >= 3
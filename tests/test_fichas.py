@@ -0,0 +1,186 @@
+import asyncio
+import json
+from collections import OrderedDict
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from fastapi.testclient import TestClient
+
+from Api.main import app
+
+client = TestClient(app)
+HEADERS = {"Authorization": "Bearer jwt"}
+
+
+def _personagem(char_id):
+    character = MagicMock()
+    character.get_basic_infos.return_value = {"id": char_id, "name": f"P{char_id}"}
+    return character
+
+
+class DriveFalso:
+    """Simula 3 fichas no Drive; as de `ids_com_erro` falham ao carregar."""
+
+    def __init__(self, ids_com_erro=(), indice=None):
+        self.ids_com_erro = ids_com_erro
+        self.indice = indice
+        self.carregados = []
+        self.em_andamento = []
+        self.simultaneos = []
+        self.salvar_indice = AsyncMock()
+
+    async def carregar(self, access_token, char_id):
+        self.carregados.append(char_id)
+        self.em_andamento.append(char_id)
+        self.simultaneos.append(len(self.em_andamento))
+        await asyncio.sleep(0.01)
+        self.em_andamento.remove(char_id)
+        if char_id in self.ids_com_erro:
+            raise ValueError("arquivo corrompido")
+        return _personagem(char_id), "pasta"
+
+    def get(self, url):
+        pastas = [{"id": f"f{i}", "name": str(i)} for i in (3, 1, 2)]
+        modulo = "Api.routes.pegar_ficha"
+        with (
+            patch(f"{modulo}.get_access_token", return_value="token"),
+            patch(f"{modulo}.ensure_path", AsyncMock(return_value="root")),
+            patch(f"{modulo}.list_folders_in_parent", AsyncMock(return_value=pastas)),
+            patch(f"{modulo}.load_character_state", side_effect=self.carregar),
+            patch(
+                f"{modulo}.load_character_index", AsyncMock(return_value=self.indice)
+            ),
+            patch(f"{modulo}.save_character_index", self.salvar_indice),
+        ):
+            return client.get(url, headers=HEADERS)
+
+
+def test_listar_fichas_carrega_em_paralelo_e_ignora_erros():
+    drive = DriveFalso(ids_com_erro={2})
+    response = drive.get("/pegar/fichas/")
+
+    assert response.status_code == 200
+    assert [f["id"] for f in response.json()] == [1, 3]
+    assert max(drive.simultaneos) == 3
+    # Sem índice: ele é reconstruído com as fichas que carregaram
+    indice = drive.salvar_indice.await_args.args[1]
+    assert set(indice["characters"]) == {"1", "3"}
+
+
+def test_listar_fichas_stream_envia_ndjson_com_erros():
+    drive = DriveFalso(ids_com_erro={2})
+    response = drive.get("/pegar/fichas/stream")
+
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    linhas = [json.loads(linha) for linha in response.text.splitlines()]
+    assert linhas[-1] == {"fim": True, "total": 3, "erros": 1}
+    erros = [linha for linha in linhas[:-1] if "erro" in linha]
+    assert erros == [{"id": 2, "erro": "arquivo corrompido"}]
+
+
+def test_listar_fichas_usa_o_indice():
+    resumos = {str(i): {"id": i, "name": f"P{i}"} for i in (1, 2, 3)}
+    drive = DriveFalso(indice={"version": 1, "characters": resumos})
+
+    response = drive.get("/pegar/fichas/")
+
+    assert [f["id"] for f in response.json()] == [1, 2, 3]
+    assert drive.carregados == []
+    drive.salvar_indice.assert_not_awaited()
+
+
+def test_listar_fichas_completa_indice_desatualizado():
+    # Ficha 2 falta no índice e a 9 já foi apagada do Drive
+    resumos = {str(i): {"id": i, "name": f"P{i}"} for i in (1, 3, 9)}
+    drive = DriveFalso(indice={"version": 1, "characters": resumos})
+
+    response = drive.get("/pegar/fichas/")
+
+    assert [f["id"] for f in response.json()] == [1, 2, 3]
+    assert drive.carregados == [2]
+    indice = drive.salvar_indice.await_args.args[1]
+    assert set(indice["characters"]) == {"1", "2", "3"}
+
+
+class PastaFalsa:
+    """Pasta de uma ficha com character_state.json (md5 "v2") e sheet.json."""
+
+    def __init__(self, versao_da_folha):
+        self.arquivos = {
+            "character_state.json": {"id": "estado", "md5Checksum": "v2"},
+            "sheet.json": {"id": "folha", "md5Checksum": "x"},
+        }
+        self.folha = {"version": 1, "state": versao_da_folha, "sheet": {"id": 5}}
+        self.baixar = AsyncMock(return_value=self.folha)
+        personagem = _personagem(5)
+        personagem.get_all.return_value = {"id": 5, "nova": True}
+        self.carregar = AsyncMock(return_value=(personagem, False))
+        self.upload = AsyncMock()
+        self.cache = OrderedDict()
+
+    def get(self, url):
+        modulo = "Api.routes.pegar_ficha"
+        with (
+            patch(f"{modulo}.get_access_token", return_value="token"),
+            patch(f"{modulo}.get_character_folder_id", AsyncMock(return_value="p")),
+            patch(f"{modulo}.list_folder_files", AsyncMock(return_value=self.arquivos)),
+            patch(f"{modulo}.get_file_content", self.baixar),
+            patch(f"{modulo}.read_character", self.carregar),
+            patch("Api.routes.criar_ficha.upload_or_update", self.upload),
+            patch("Api.routes.criar_ficha._sheet_cache", self.cache),
+        ):
+            return client.get(url, headers=HEADERS)
+
+
+def test_pegar_ficha_serve_a_ficha_renderizada_e_o_cache():
+    pasta = PastaFalsa(versao_da_folha="v2")
+
+    assert pasta.get("/pegar/fichas/5").json() == {"id": 5}
+    assert pasta.get("/pegar/fichas/5").json() == {"id": 5}
+
+    # Um download só (a segunda leitura sai do cache) e nenhum personagem restaurado
+    pasta.baixar.assert_awaited_once()
+    pasta.carregar.assert_not_awaited()
+
+
+def test_pegar_ficha_renderiza_de_novo_se_a_folha_for_de_outro_estado():
+    pasta = PastaFalsa(versao_da_folha="v1")
+
+    assert pasta.get("/pegar/fichas/5").json() == {"id": 5, "nova": True}
+    assert pasta.get("/pegar/fichas/5").json() == {"id": 5, "nova": True}
+    # Renderiza uma vez (depois sai do cache) e a leitura não grava no Drive
+    pasta.carregar.assert_awaited_once_with("token", 5, "p")
+    pasta.upload.assert_not_awaited()
+
+
+def test_indice_serializa_por_usuario_e_libera_o_lock():
+    from Api.routes import criar_ficha
+
+    salvos, simultaneos, em_andamento = {}, [], []
+
+    async def carregar(access_token):
+        em_andamento.append(1)
+        simultaneos.append(len(em_andamento))
+        await asyncio.sleep(0.01)
+        em_andamento.pop()
+        return {"version": criar_ficha.INDEX_VERSION, "characters": dict(salvos)}
+
+    async def salvar(access_token, index):
+        salvos.update(index["characters"])
+
+    async def salvar_duas():
+        await asyncio.gather(
+            criar_ficha.update_character_index("token", 1, {"name": "A"}),
+            criar_ficha.update_character_index("token", 2, {"name": "B"}),
+        )
+
+    modulo = "Api.routes.criar_ficha"
+    with (
+        patch(f"{modulo}.load_character_index", side_effect=carregar),
+        patch(f"{modulo}.save_character_index", side_effect=salvar),
+    ):
+        asyncio.run(salvar_duas())
+
+    # Uma escrita por vez, nenhuma entrada perdida e nenhum lock sobrando
+    assert max(simultaneos) == 1
+    assert salvos == {"1": {"name": "A"}, "2": {"name": "B"}}
+    assert len(criar_ficha._index_locks) == 0
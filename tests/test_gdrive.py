@@ -0,0 +1,478 @@
+import asyncio
+import hashlib
+import io
+import json
+import threading
+import time
+import zipfile
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+import pytest
+import requests
+
+from Api.gdrive import (
+    FOLDER_MIME,
+    DriveClient,
+    _run_setup_job,
+    ensure_path,
+    find_file_by_name,
+    folder_cache,
+    register_user,
+    setup_drive_structure,
+    setup_status,
+    upload_many,
+)
+from Api.gdrive_async import AsyncDriveClient
+from Api.routes.criar_ficha import save_character_state
+from Api.routes.homebrew import upload_extracted_files, validate_homebrew_zip
+from jsons_and_dragons import Character
+from jsons_and_dragons.cache import ModuleCache
+from jsons_and_dragons.data import preload_drive_file
+
+
+def _resposta(status, payload=None, headers=None):
+    r = MagicMock()
+    r.status_code = status
+    r.headers = headers or {}
+    r.json.return_value = payload or {}
+    return r
+
+
+@patch("Api.gdrive.time.sleep")
+def test_repete_em_429_e_5xx_com_backoff(mock_sleep):
+    client = DriveClient(max_retries=3)
+    client.session.request = MagicMock(
+        side_effect=[
+            _resposta(503),
+            _resposta(429, headers={"Retry-After": "2"}),
+            _resposta(200, {"files": []}),
+        ]
+    )
+
+    r = client.get("https://exemplo", "token", operation="find")
+
+    assert r.status_code == 200
+    assert client.session.request.call_count == 3
+    # O Retry-After do 429 é respeitado
+    assert mock_sleep.call_args_list[1].args[0] == 2.0
+
+    stats = client.stats()["find"]
+    assert stats["calls"] == 3
+    assert stats["errors"] == 2
+    assert stats["retries"] == 2
+
+
+@patch("Api.gdrive.time.sleep")
+def test_desiste_apos_limite_de_tentativas(mock_sleep):
+    client = DriveClient(max_retries=2)
+    client.session.request = MagicMock(return_value=_resposta(500))
+
+    r = client.get("https://exemplo", "token")
+
+    assert r.status_code == 500
+    assert client.session.request.call_count == 3
+
+
+@patch("Api.gdrive.time.sleep")
+def test_post_nao_repete_em_erro_de_conexao(mock_sleep):
+    client = DriveClient(max_retries=3)
+    client.session.request = MagicMock(side_effect=requests.ConnectionError())
+
+    with pytest.raises(requests.ConnectionError):
+        client.post("https://exemplo", "token")
+    assert client.session.request.call_count == 1
+
+
+def test_helpers_usam_o_cliente_compartilhado():
+    with patch("Api.gdrive.drive.session.request") as mock_request:
+        mock_request.return_value = _resposta(200, {"files": [{"id": "abc"}]})
+
+        assert find_file_by_name("token", "spells.json", parent_id="pai") == "abc"
+
+        _, kwargs = mock_request.call_args
+        assert kwargs["headers"]["Authorization"] == "Bearer token"
+        assert "'pai' in parents" in kwargs["params"]["q"]
+
+
+def test_ensure_path_usa_cache_de_pastas():
+    folder_cache.clear()
+    with patch("Api.gdrive.find_file_by_name") as mock_find:
+        mock_find.side_effect = ["root", "chars", "ficha"]
+
+        caminho = ["JSONs_and_Dragons", "Characters", "1"]
+        assert ensure_path("token", caminho) == "ficha"
+        assert ensure_path("token", caminho) == "ficha"
+        assert mock_find.call_count == 3
+
+        # Um caminho vizinho reaproveita o prefixo já resolvido
+        mock_find.side_effect = ["outra"]
+        assert ensure_path("token", ["JSONs_and_Dragons", "Characters", "2"]) == "outra"
+        assert mock_find.call_count == 4
+
+
+def test_cache_de_pastas_invalida_em_404():
+    folder_cache.clear()
+    folder_cache.put("usuario", ("JSONs_and_Dragons",), "root")
+    folder_cache.put("usuario", ("JSONs_and_Dragons", "Characters"), "chars")
+
+    with patch("Api.gdrive.drive.session.request") as mock_request:
+        mock_request.return_value = _resposta(404)
+        find_file_by_name("token", "1", parent_id="chars")
+
+    assert folder_cache.get("usuario", ("JSONs_and_Dragons",)) == "root"
+    assert folder_cache.get("usuario", ("JSONs_and_Dragons", "Characters")) is None
+
+
+def test_cache_de_pastas_segue_o_email_apos_troca_de_token():
+    folder_cache.clear()
+    register_user("token-antigo", "teste@gmail.com")
+    register_user("token-novo", "teste@gmail.com")
+
+    with patch("Api.gdrive.find_file_by_name", return_value="root") as mock_find:
+        ensure_path("token-antigo", ["JSONs_and_Dragons"])
+        ensure_path("token-novo", ["JSONs_and_Dragons"])
+        assert mock_find.call_count == 1
+
+
+@patch("Api.gdrive_async.asyncio.sleep", new_callable=AsyncMock)
+def test_cliente_assincrono_repete_em_5xx(mock_sleep):
+    respostas = iter([httpx.Response(503), httpx.Response(200, json={"files": []})])
+    transport = httpx.MockTransport(lambda request: next(respostas))
+    client = AsyncDriveClient(max_retries=2)
+    client._get_client = AsyncMock(return_value=httpx.AsyncClient(transport=transport))
+
+    r = asyncio.run(client.get("https://exemplo", "token", operation="find"))
+
+    assert r.status_code == 200
+    assert mock_sleep.await_count == 1
+    assert client.stats()["find"]["retries"] == 1
+
+
+class TransporteLento(httpx.MockTransport):
+    """Fechar o transporte suspende a corrotina, como um pool de verdade."""
+
+    async def aclose(self):
+        await asyncio.sleep(0)
+
+
+def test_cliente_assincrono_fecha_o_cliente_do_loop_anterior():
+    transport = TransporteLento(lambda request: httpx.Response(200))
+    criados = []
+    cliente_real = httpx.AsyncClient
+
+    def novo_cliente(**kwargs):
+        criados.append(cliente_real(transport=transport))
+        return criados[-1]
+
+    async def duas_chamadas():
+        await asyncio.gather(
+            client.get("https://exemplo", "token"),
+            client.get("https://exemplo", "token"),
+        )
+
+    client = AsyncDriveClient()
+    with patch("Api.gdrive_async.httpx.AsyncClient", side_effect=novo_cliente):
+        # Cada asyncio.run é um event loop novo, como entre testes ou workers
+        asyncio.run(client.get("https://exemplo", "token"))
+        # Duas chamadas chegando juntas no loop novo usam um cliente só
+        asyncio.run(duas_chamadas())
+        asyncio.run(client.aclose())
+
+    assert len(criados) == 2
+    assert all(c.is_closed for c in criados)
+
+
+def test_save_character_state_envia_os_arquivos_em_paralelo():
+    em_andamento = []
+    simultaneos = []
+
+    async def upload(access_token, filename, content, parent_id=None):
+        em_andamento.append(filename)
+        simultaneos.append(len(em_andamento))
+        await asyncio.sleep(0.01)
+        em_andamento.remove(filename)
+
+    character = MagicMock()
+    character.to_json.return_value = "[]"
+    character.to_state_string.return_value = "{}"
+    character.checkpoints_loaded = True
+    character.checkpoints_state.return_value = {"checkpoints": []}
+
+    character.id = 7
+    character.get_basic_infos.return_value = {"id": 7, "name": "Teste"}
+    character.get_all.return_value = {"header": {"id": 7}}
+
+    with (
+        patch("Api.routes.criar_ficha.upload_or_update", side_effect=upload) as mock,
+        patch(
+            "Api.routes.criar_ficha.update_character_index", new_callable=AsyncMock
+        ) as mock_indice,
+    ):
+        sheet = asyncio.run(save_character_state("token", "pasta", character))
+
+    enviados = {c.args[1]: c.args[2] for c in mock.call_args_list}
+    assert set(enviados) == {
+        "decisions.json",
+        "character_state.json",
+        "sheet.json",
+        "checkpoints.json",
+    }
+    assert max(simultaneos) == 3
+    # O estado só sobe depois da ficha renderizada e dos checkpoints dele
+    ordem = [c.args[1] for c in mock.call_args_list]
+    assert ordem.index("sheet.json") < ordem.index("character_state.json")
+    assert ordem.index("checkpoints.json") < ordem.index("character_state.json")
+    # A ficha renderizada leva a versão (md5) do estado de onde saiu
+    assert sheet == {"header": {"id": 7}}
+    assert json.loads(enviados["sheet.json"]) == {
+        "version": 1,
+        "state": hashlib.md5(b"{}").hexdigest(),
+        "sheet": sheet,
+    }
+    mock_indice.assert_awaited_once_with("token", 7, {"id": 7, "name": "Teste"})
+
+
+def test_save_character_state_junta_pausas_novas_aos_checkpoints_guardados():
+    decisoes = ["Tony", 15, 12, 14, 8, 8, 14, "Raça", "Anão"]
+    character = Character(1, None, decisoes, use_local=True)
+    character.process_decisions()  # Pausa pedindo as ferramentas
+    guardados = character.checkpoints_state()
+    character = Character.from_state_string(character.to_state_string(), None)
+    character.use_local = True
+    character.data["decisions"].append("Ferramentas de Ferreiro")
+    character.process_queue()  # Pausa nova, pedindo a sub-raça
+
+    baixar = AsyncMock(return_value=guardados)
+    with (
+        patch("Api.routes.criar_ficha.get_file_content", baixar),
+        patch(
+            "Api.routes.criar_ficha.upload_or_update", new_callable=AsyncMock
+        ) as mock,
+        patch("Api.routes.criar_ficha.update_character_index", new_callable=AsyncMock),
+        # Sem classe ainda não há ficha renderizada
+        patch("Api.routes.criar_ficha.render_sheet", return_value={}),
+        patch("Api.routes.criar_ficha.character_summary", return_value={}),
+    ):
+        asyncio.run(save_character_state("token", "pasta", character))
+
+    # Os checkpoints só são baixados para juntar as pausas novas e sobem inteiros
+    baixar.assert_awaited_once_with(
+        "token", filename="checkpoints.json", parent_id="pasta"
+    )
+    enviados = {c.args[1]: json.loads(c.args[2]) for c in mock.call_args_list}
+    assert [c["n"] for c in enviados["checkpoints.json"]["checkpoints"]] == [9, 10]
+    assert enviados["character_state.json"]["checkpoints"] == {"count": 2, "n": 10}
+
+
+def test_setup_lista_cada_pasta_uma_vez_e_envia_em_paralelo(tmp_path):
+    (tmp_path / "metadata.json").write_text('{"modules": ["dnd_2014"]}')
+    modulo = tmp_path / "dnd_2014"
+    (modulo / "extra").mkdir(parents=True)
+    for nome in ("classes.json", "spells.json", "extra/feats.json"):
+        (modulo / nome).write_text("{}")
+
+    pastas = {
+        "bd": {"dnd_2014": {"id": "dnd", "mimeType": FOLDER_MIME}},
+        "dnd": {"classes.json": {"id": "id-classes"}},
+        "nova": {},
+    }
+    em_andamento = []
+    simultaneos = []
+
+    def upload(access_token, filename, content, parent_id=None, existing=None):
+        em_andamento.append(filename)
+        simultaneos.append(len(em_andamento))
+        time.sleep(0.02)
+        em_andamento.remove(filename)
+        return {"status": "created", "uploaded_bytes": 2, "skipped_bytes": 0}
+
+    with (
+        patch("Api.gdrive.list_folder_files", side_effect=lambda t, p: pastas[p]),
+        patch("Api.gdrive.create_folder", return_value="nova") as mock_pasta,
+        patch("Api.gdrive.upload_content", side_effect=upload) as mock_upload,
+        patch("Api.gdrive.find_file_by_name") as mock_find,
+    ):
+        _run_setup_job("token-setup", str(tmp_path), "bd")
+
+    # Uma listagem por pasta, nenhuma busca por arquivo e só a subpasta nova criada
+    mock_find.assert_not_called()
+    mock_pasta.assert_called_once_with("token-setup", "extra", "dnd")
+    destinos = {c.args[1]: (c.args[3], c.args[4]) for c in mock_upload.call_args_list}
+    assert destinos == {
+        "metadata.json": ("bd", None),
+        "classes.json": ("dnd", {"id": "id-classes"}),
+        "spells.json": ("dnd", None),
+        "feats.json": ("nova", None),
+    }
+    assert max(simultaneos) > 1
+    assert setup_status("token-setup") == {
+        "state": "done",
+        "total": 4,
+        "done": 4,
+        "errors": [],
+    }
+
+
+def test_setup_em_segundo_plano_reaproveita_o_job_em_andamento():
+    listagem = MagicMock()
+    listagem.json.return_value = {"files": [{"id": "bd", "name": "BD"}]}
+
+    with (
+        patch("Api.gdrive.find_or_create_folder", return_value="pasta"),
+        patch("Api.gdrive.drive.get", return_value=listagem),
+        patch("Api.gdrive.threading.Thread") as mock_thread,
+    ):
+        setup_drive_structure("token-repetido", background=True)
+        setup_drive_structure("token-repetido", background=True)
+        # Só uma thread para os dois logins, e o progresso é o do primeiro
+        assert mock_thread.call_count == 1
+        job = mock_thread.call_args.kwargs["args"][-1]
+        assert setup_status("token-repetido")["state"] == "running"
+
+        # Terminado o envio, um login novo pode iniciar outro setup
+        job["state"] = "done"
+        setup_drive_structure("token-repetido", background=True)
+        assert mock_thread.call_count == 2
+
+
+def test_upload_pula_arquivo_igual_ao_do_drive(tmp_path):
+    iguais = tmp_path / "iguais.json"
+    iguais.write_text('{"a": 1}')
+    mudou = tmp_path / "mudou.json"
+    mudou.write_text('{"a": 2}')
+    md5 = hashlib.md5(b'{"a": 1}').hexdigest()
+    uploads = [
+        (str(iguais), "iguais.json", "pasta", {"id": "f1", "md5Checksum": md5}),
+        (str(mudou), "mudou.json", "pasta", {"id": "f2", "md5Checksum": md5}),
+    ]
+
+    with patch("Api.gdrive.drive") as mock_drive:
+        resultado = upload_many("token", uploads)
+
+    # Só o arquivo alterado é reenviado
+    mock_drive.patch.assert_called_once()
+    assert mock_drive.patch.call_args.args[0].endswith("/f2")
+    assert resultado == {
+        "uploaded": 1,
+        "skipped": 1,
+        "uploaded_bytes": 8,
+        "skipped_bytes": 8,
+        "errors": [],
+    }
+
+
+def _zip(arquivos):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zip_ref:
+        for nome, conteudo in arquivos.items():
+            zip_ref.writestr(nome, conteudo)
+    buffer.seek(0)
+    return buffer
+
+
+def _zip_aberto(arquivos):
+    return zipfile.ZipFile(_zip(arquivos))
+
+
+def test_homebrew_valida_operacoes_antes_de_enviar():
+    erros, avisos = validate_homebrew_zip(
+        _zip_aberto(
+            {
+                "ok.json": '{"X": {"operations": [{"action": "SET", "property": "a"}]}}',
+                "quebrado.json": "{",
+                "feats.json": '{"X": {"operations": [{"action": "SETT"}, {"action": "IMPORT"}]}}',
+            }
+        )
+    )
+
+    assert erros[0].startswith("quebrado.json: JSON inválido")
+    assert erros[1:] == [
+        "feats.json: X/operations[1]: IMPORT sem query",
+    ]
+    # Ações desconhecidas o motor ignora: só avisam
+    assert avisos == [
+        "feats.json: X/operations[0]: ação desconhecida 'SETT' (ignorada)"
+    ]
+
+
+def test_homebrew_com_nome_de_modulo_oficial_e_recusada():
+    arquivo = {"feats.json": '{"X": {"operations": []}}'}
+
+    erros, _ = validate_homebrew_zip(_zip_aberto(arquivo), "dnd_2014")
+    assert erros == ["'dnd_2014' é o nome de um módulo oficial: escolha outro nome"]
+    assert validate_homebrew_zip(_zip_aberto(arquivo), "minha_homebrew") == ([], [])
+
+
+def test_homebrew_cria_pastas_uma_vez_envia_e_aquece_o_cache():
+    classes = b'{"Mago": {"operations": []}}'
+    feats = b'{"Alerta": {"operations": []}}'
+    arquivo = _zip(
+        {
+            "classes.json": classes,
+            "feats.json": feats,
+            "extra/a.json": "{}",
+            "extra/sub/b.json": "{}",
+            "extra/sub/c.json": "{}",
+        }
+    )
+    pastas = {
+        "mod": {
+            "classes.json": {
+                "id": "c1",
+                "md5Checksum": hashlib.md5(classes).hexdigest(),
+            },
+            "extra": {"id": "ex", "mimeType": FOLDER_MIME},
+        },
+        "ex": {},
+    }
+    cache = ModuleCache()
+    mock_drive = MagicMock()
+    em_andamento = []
+    simultaneos = []
+
+    async def post(*args, **kwargs):
+        em_andamento.append(1)
+        simultaneos.append(len(em_andamento))
+        await asyncio.sleep(0.01)
+        em_andamento.pop()
+        return _resposta(200, {"id": "novo"})
+
+    mock_drive.post = AsyncMock(side_effect=post)
+    threads = []
+
+    def preload(*args):
+        threads.append(threading.current_thread())
+        return preload_drive_file(*args)
+
+    with (
+        patch(
+            "Api.routes.homebrew.list_folder_files",
+            AsyncMock(side_effect=lambda t, p: pastas[p]),
+        ) as mock_lista,
+        patch(
+            "Api.routes.homebrew.create_folder", AsyncMock(return_value="sub")
+        ) as mock_pasta,
+        patch("Api.gdrive_async.drive", mock_drive),
+        patch("jsons_and_dragons.data.module_cache", cache),
+        patch("Api.routes.homebrew.UPLOAD_CONCURRENCY", 2),
+        patch("Api.routes.homebrew.preload_drive_file", side_effect=preload),
+        zipfile.ZipFile(arquivo) as zip_ref,
+    ):
+        resultado = asyncio.run(upload_extracted_files("token", "mod", "mod", zip_ref))
+
+    assert [c.args[1] for c in mock_lista.call_args_list] == ["mod", "ex"]
+    mock_pasta.assert_called_once_with("token", "sub", "ex")
+    # classes.json já está igual no Drive; os outros 4 são criados
+    assert mock_drive.post.call_count == 4
+    # No máximo UPLOAD_CONCURRENCY arquivos lidos e enviando ao mesmo tempo
+    assert max(simultaneos) == 2
+    assert resultado["uploaded"] == 4 and resultado["skipped"] == 1
+    assert resultado["skipped_bytes"] == len(classes)
+    chave = ("novo", "mod", "feats.json", hashlib.md5(feats).hexdigest())
+    assert cache.peek(chave).data == {"Alerta": {"operations": []}}
+    assert cache.peek(
+        ("c1", "mod", "classes.json", pastas["mod"]["classes.json"]["md5Checksum"])
+    )
+    # Os índices são montados fora do event loop
+    assert len(threads) == 2 and threading.main_thread() not in threads